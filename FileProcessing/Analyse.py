@@ -0,0 +1,270 @@
+# Analyse
+#
+# One command line entry point for the analyses. Nothing heavy is imported to
+# start- each subcommand imports what it needs (pandas and this folder's
+# modules, scipy for the tests, seaborn/matplotlib for the figures) when it runs,
+# so a quick descriptive summary doesn't wait seconds for plotting and
+# statistics libraries it never uses.
+#
+# Subcommands-
+#   describe  : descriptives with the propagated SEM and the outlier counts
+#   tests     : ANOVA and pairwise t-tests (HypothesisTests, needs scipy)
+#   bootstrap : bootstrap intervals or contrasts (Resampling)
+#   figures   : FigurePipeline.py with the same options (needs seaborn)
+#   batch     : BatchAnalysis.py with the same options
+#   imports   : import time of each subcommand (python -X importtime, best
+#               of --repeats fresh interpreters). --save-baseline keeps the
+#               times in ImportBaseline.json (per machine, not committed),
+#               later runs flag subcommands more than --threshold slower to
+#               start and exit with an error
+#
+# describe/tests/bootstrap load every participant's sessions (or just -p),
+# subtract their RT baseline and reject outliers as BatchAnalysis does, then
+# print the table (and write it with -o).
+#
+# Run from the FileProcessing folder-
+#   python Analyse.py describe -d ./Data -e TW -p RH MS
+#   python Analyse.py tests -d ./Data -e HF --correction fdr_bh -o HFTests.csv
+#   python Analyse.py bootstrap -d ./Data -e TW --stat median --contrasts --reps 100000
+#   python Analyse.py figures -d ./Data -p RH -f png pdf
+#   python Analyse.py imports --save-baseline
+
+import os
+import re
+import sys
+import json
+import argparse
+import platform
+import importlib
+import subprocess
+
+DefaultBaseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ImportBaseline.json")
+
+# What each subcommand imports (third party modules listed too, so the import
+# report times them even where the module only imports them when called)
+Commands = {
+    "startup": (),
+    "describe": ("LoadSessions", "RTBaseline", "BaselineCorrection", "OutlierRejection", "BatchAnalysis"),
+    "tests": ("LoadSessions", "RTBaseline", "BatchAnalysis", "HypothesisTests", "scipy.stats"),
+    "bootstrap": ("LoadSessions", "RTBaseline", "BatchAnalysis", "Resampling"),
+    "figures": ("FigurePipeline",),
+    "batch": ("BatchAnalysis", "scipy.stats"),
+}
+
+def load(Command):
+    """
+    load - imports the modules a subcommand needs (only when it runs)
+
+    Returns
+    -------
+    List of modules, in the order of Commands[Command]
+
+    """
+    return [importlib.import_module(x) for x in Commands[Command]]
+
+def loadData(Args, Command):
+    """
+    loadData - every participant's sessions, baseline corrected with their
+               outliers rejected
+
+    Returns
+    -------
+    AllData : Pandas Dataframe
+    Condition : String
+    Baselines : Pandas Dataframe
+        Rows of the participants that were loaded.
+
+    """
+    Modules = dict(zip(Commands[Command], load(Command)))
+    LoadSessions, RTBaseline, BatchAnalysis = (Modules[x] for x in ("LoadSessions", "RTBaseline",
+                                                                   "BatchAnalysis"))
+    Participants = Args.participants or BatchAnalysis.findParticipants(Args.data, [Args.experiment])
+    Baselines = RTBaseline.baselineTable(Args.rt_data or Args.data, Participants)
+    Missing = list(Baselines.index[Baselines["N"] == 0])
+    if Missing:
+        print(f"No reaction time sessions for {', '.join(Missing)}, left out")
+    Baselines = Baselines[Baselines["N"] > 0]
+    AllData = LoadSessions.loadSessions(Args.data, Args.experiment, list(Baselines.index))
+    if AllData.empty:
+        sys.exit(f"No {Args.experiment} sessions found in {Args.data}")
+    AllData, Condition = BatchAnalysis.prepare(AllData, Baselines, BatchAnalysis.Analyses[Args.experiment])
+    return AllData, Condition, Baselines
+
+def show(Table, Output=None):
+    """
+    show - prints a result table in full and writes it as csv with -o
+    """
+    import pandas as pd
+    with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+        print(Table)
+    if Output:
+        Table.to_csv(Output)
+        print(f"Wrote {Output}")
+
+def describeCommand(Args):
+    BaselineCorrection, OutlierRejection = load("describe")[2:4]
+    AllData, Condition, Baselines = loadData(Args, "describe")
+    Correct = AllData[AllData["Direction"] == "right"]
+    show(BaselineCorrection.propagatedError(Correct, Condition, Baselines), Args.output)
+    print()
+    show(OutlierRejection.summary(AllData, ["ParticipantID", Condition]))
+
+def testsCommand(Args):
+    HypothesisTests = load("tests")[3]
+    AllData, Condition, Baselines = loadData(Args, "tests")
+    Correct = AllData[AllData["Direction"] == "right"]
+    show(HypothesisTests.compare(Correct, Condition, EqualVar=not Args.welch, Correction=Args.correction,
+                                 Alpha=Args.alpha), Args.output)
+
+def bootstrapCommand(Args):
+    Resampling = load("bootstrap")[3]
+    AllData, Condition, Baselines = loadData(Args, "bootstrap")
+    if Args.stat == "proportion":
+        Data = AllData.assign(Triggered=AllData["Direction"] == "right")
+        Column = "Triggered"
+    else:
+        Data = AllData[AllData["Direction"] == "right"]
+        Column = "ResponseTime"
+    if Args.contrasts:
+        Table = Resampling.contrasts(Data, Condition, Column=Column, Stat=Args.stat, Reps=Args.reps,
+                                     Seed=Args.seed, Level=Args.level, Chunk=Args.chunk)
+    else:
+        Table = Resampling.bootstrap(Data, ["ParticipantID", Condition], Column, [Args.stat], Args.reps,
+                                     Args.seed, Args.level, Args.chunk)
+    show(Table, Args.output)
+
+def figuresCommand(Args):
+    FigurePipeline = load("figures")[0]
+    FigurePipeline.main(FigurePipeline.parseArgs(Args.options))
+
+def batchCommand(Args):
+    BatchAnalysis = load("batch")[0]
+    BatchAnalysis.main(BatchAnalysis.parseArgs(Args.options))
+
+def importTimes(Command, Repeats=3):
+    """
+    importTimes - how long a subcommand's imports take in a fresh
+                  interpreter (best of Repeats runs)
+
+    Returns
+    -------
+    Time : Float
+        Seconds.
+    Packages : Dict of {top level import: seconds}, slowest first
+
+    """
+    Code = f"import Analyse; Analyse.load({Command!r})"
+    Folder = os.path.dirname(os.path.abspath(__file__))
+    Best = None
+    for Repeat in range(Repeats):
+        Run = subprocess.run([sys.executable, "-X", "importtime", "-c", Code], cwd=Folder,
+                             capture_output=True, text=True, check=True)
+        # "import time: self [us] | cumulative | name", nested imports indented
+        Packages = {x[1]: int(x[0]) / 1e6 for x in
+                    re.findall(r"^import time:\s+\d+ \|\s+(\d+) \| (\S.*)$", Run.stderr, re.MULTILINE)}
+        Time = sum(Packages.values())
+        if Best is None or Time < Best[0]:
+            Best = (Time, dict(sorted(Packages.items(), key=lambda x: -x[1])))
+    return Best
+
+def loadBaseline(FileName):
+    try:
+        with open(FileName) as File:
+            return json.load(File).get("times")
+    except (OSError, ValueError):
+        return None
+
+def saveBaseline(FileName, Times):
+    with open(FileName, "w") as File:
+        json.dump({"times": Times, "python": platform.python_version(), "machine": platform.node()},
+                  File, indent=1, sort_keys=True)
+
+def importsCommand(Args, MinDelta=0.05):
+    Baseline = loadBaseline(Args.baseline) or {}
+    Times = {}
+    Regressions = []
+    print(f"{'command':<10} {'time (s)':>9} {'baseline':>9} {'change':>8}  slowest imports")
+    for Command in Commands:
+        Times[Command], Packages = importTimes(Command, Args.repeats)
+        Slowest = ", ".join(f"{x} {y:.2f}" for x, y in list(Packages.items())[:3])
+        Base = Baseline.get(Command)
+        if Base is None:
+            print(f"{Command:<10} {Times[Command]:>9.3f} {'-':>9} {'-':>8}  {Slowest}")
+            continue
+        Change = Times[Command] / Base - 1
+        Flag = ""
+        if Change > Args.threshold and Times[Command] - Base > MinDelta:
+            Regressions.append(Command)
+            Flag = "  REGRESSION"
+        print(f"{Command:<10} {Times[Command]:>9.3f} {Base:>9.3f} {Change:>+7.0%}  {Slowest}{Flag}")
+    if Args.save_baseline:
+        saveBaseline(Args.baseline, Times)
+        print(f"Saved baseline to {Args.baseline}")
+    if Regressions:
+        sys.exit(f"{len(Regressions)} command(s) slower to start than the baseline by more than "
+                 f"{Args.threshold:.0%}")
+
+def dataArguments(Parser):
+    """
+    dataArguments - options shared by describe, tests and bootstrap
+    """
+    Parser.add_argument("-d", "--data", required=True, help="folder with the tidy csv files")
+    Parser.add_argument("--rt-data", default=None,
+                        help="folder with the RT files (default: the data folder)")
+    Parser.add_argument("-e", "--experiment", choices=["TW", "HF"], default="TW")
+    Parser.add_argument("-p", "--participants", nargs="+", default=None,
+                        help="participant initials (default: everyone)")
+    Parser.add_argument("-o", "--output", default=None, help="also write the table to this csv file")
+
+def parseArgs(Args=None):
+    Parser = argparse.ArgumentParser(description="Run the analyses (heavy libraries are only imported "
+                                                 "by the subcommands that use them).")
+    Subparsers = Parser.add_subparsers(dest="command", required=True)
+
+    Describe = Subparsers.add_parser("describe", help="descriptives with the propagated SEM")
+    dataArguments(Describe)
+    Describe.set_defaults(run=describeCommand)
+
+    Tests = Subparsers.add_parser("tests", help="ANOVA and pairwise t-tests")
+    dataArguments(Tests)
+    Tests.add_argument("--welch", action="store_true", help="Welch's t-tests instead of Student's")
+    Tests.add_argument("--correction", choices=["holm", "bonferroni", "fdr_bh", "none"], default="holm")
+    Tests.add_argument("--alpha", type=float, default=0.05)
+    Tests.set_defaults(run=testsCommand)
+
+    Bootstrap = Subparsers.add_parser("bootstrap", help="bootstrap intervals or contrasts")
+    dataArguments(Bootstrap)
+    Bootstrap.add_argument("--stat", choices=["mean", "median", "proportion"], default="mean",
+                           help="proportion = trigger rate")
+    Bootstrap.add_argument("--contrasts", action="store_true",
+                           help="differences between the conditions with permutation p values")
+    Bootstrap.add_argument("--reps", type=int, default=10000)
+    Bootstrap.add_argument("--seed", type=int, default=0)
+    Bootstrap.add_argument("--level", type=float, default=0.95)
+    Bootstrap.add_argument("--chunk", type=int, default=None, help="replicates drawn at once")
+    Bootstrap.set_defaults(run=bootstrapCommand)
+
+    for Name, Run, Help in (("figures", figuresCommand, "FigurePipeline.py"),
+                            ("batch", batchCommand, "BatchAnalysis.py")):
+        # Every option is passed on to the script's own parser
+        Subparsers.add_parser(Name, help=f"{Help} (same options)", add_help=False).set_defaults(run=Run,
+                                                                                            delegate=True)
+
+    Imports = Subparsers.add_parser("imports", help="import time of each subcommand")
+    Imports.add_argument("--repeats", type=int, default=3)
+    Imports.add_argument("--baseline", default=DefaultBaseline, help="baseline json file")
+    Imports.add_argument("--save-baseline", action="store_true",
+                         help="save these times as the baseline")
+    Imports.add_argument("--threshold", type=float, default=0.2,
+                         help="fraction slower than the baseline that counts as a regression")
+    Imports.set_defaults(run=importsCommand)
+    Args, Options = Parser.parse_known_args(Args)
+    if Options and not getattr(Args, "delegate", False):
+        Parser.error(f"unrecognized arguments: {' '.join(Options)}")
+    Args.options = Options
+    return Args
+
+# %%
+if __name__ == "__main__":
+    Args = parseArgs()
+    Args.run(Args)
@@ -0,0 +1,142 @@
+# Baseline Correction
+#
+# Subtracts the reaction time baseline (see RTBaseline.py) from the response
+# times to estimate the true wave travel time, and propagates its error.
+#
+# correct looks every trial's baseline up by its participant (or participant
+# and day, for per-session baselines) and subtracts the whole column in one
+# go, instead of a python call per trial through Series.apply. It also adds
+# the baseline SEM of each trial as a column. propagatedError describes every
+# participant x condition group at once and adds the propagated SEM,
+#   sqrt(condition SEM ** 2 + RT SEM ** 2)
+# for all of them, instead of a math.sqrt per condition.
+#
+# From an analysis script-
+#   Baselines = RTBaseline.baselineTable(DataLocation, [PartInitials])
+#   AllData = BaselineCorrection.correct(AllData, Baselines)
+#   Errors = BaselineCorrection.propagatedError(AllData, "ContrastLevel", Baselines)
+# Per session (each session corrected with the RT sessions ran the same day)-
+#   Baselines = RTBaseline.sessionTable(DataLocation, [PartInitials])
+
+import numpy as np
+import pandas as pd
+
+import RTBaseline
+
+def addKeys(Data, Keys):
+    """
+    addKeys - adds the Date column (from Session) if the baselines are per
+              day and the data doesn't have one yet
+    """
+    if "Date" in Keys and "Date" not in Data:
+        Data["Date"] = RTBaseline.sessionDates(Data["Session"])
+    return Data
+
+def baselineRows(Keys, Baselines):
+    """
+    baselineRows - row of Baselines for each row of Keys (-1 if there isn't
+                   one). Categorical keys are only looked up once per category.
+
+    Parameters
+    ----------
+    Keys : Pandas Dataframe
+        The key columns, named as Baselines' index levels.
+    Baselines : Pandas Dataframe
+        Indexed by the key columns.
+
+    Returns
+    -------
+    Numpy array of ints
+
+    """
+    if Keys.shape[1] == 1:
+        Key = Keys.iloc[:, 0]
+        if isinstance(Key.dtype, pd.CategoricalDtype):
+            Lookup = np.append(Baselines.index.get_indexer(Key.cat.categories), -1)
+            return Lookup[Key.cat.codes.to_numpy()]
+        return Baselines.index.get_indexer(Key)
+    return Baselines.index.get_indexer(pd.MultiIndex.from_frame(Keys.astype(object)))
+
+def checkRows(Rows, Keys):
+    """
+    checkRows - raises a KeyError listing the keys that have no baseline
+    """
+    if "Date" in Keys and len(Rows) and (Rows < 0).all():
+        raise KeyError(f"No session date {sorted(Keys['Date'].astype(str).unique())} matches a reaction "
+                       f"time session date, check the session names")
+    if (Rows < 0).any():
+        Missing = Keys[Rows < 0].drop_duplicates().astype(object).to_numpy().tolist()
+        raise KeyError(f"No reaction time baseline for {Missing}")
+
+def correct(Data, Baselines, Column="ResponseTime", ErrorColumn="BaselineSEM"):
+    """
+    correct - subtracts the baseline from a column of the tidy data (in place,
+              the frame is also returned)
+
+    Parameters
+    ----------
+    Data : Pandas Dataframe
+        Tidy data with the baseline key columns (ParticipantID, and Session
+        for per day baselines).
+    Baselines : Pandas Dataframe
+        From RTBaseline.baselineTable or RTBaseline.sessionTable, the index
+        levels say what to match on.
+    Column : String
+        Column to correct.
+    ErrorColumn : String or None
+        Column to put each trial's baseline SEM in, None to leave it out.
+
+    Returns
+    -------
+    Data : Pandas Dataframe
+
+    Raises
+    ------
+    KeyError
+        If any trial has no baseline (or, for per day baselines, no session's
+        date matches any RT session's).
+
+    """
+    Keys = list(Baselines.index.names)
+    addKeys(Data, Keys)
+    Rows = baselineRows(Data[Keys], Baselines)
+    checkRows(Rows, Data[Keys])
+    Data[Column] = Data[Column].to_numpy(dtype=float) - Baselines["Mean"].to_numpy(dtype=float)[Rows]
+    if ErrorColumn is not None:
+        Data[ErrorColumn] = Baselines["SEM"].to_numpy(dtype=float)[Rows]
+    return Data
+
+def propagatedError(Data, Conditions, Baselines, Column="ResponseTime"):
+    """
+    propagatedError - descriptives of every baseline key (participant, or
+                      participant and day) x condition group, with the
+                      baseline SEM added in quadrature
+
+    Parameters
+    ----------
+    Data : Pandas Dataframe
+        Tidy data (corrected or not, the SEM is the same).
+    Conditions : String or list of strings
+        Condition column(s), e.g. "ContrastLevel".
+    Baselines : Pandas Dataframe
+        As for correct.
+    Column : String
+        Column to describe.
+
+    Returns
+    -------
+    Errors : Pandas Dataframe
+        One row per group, columns Mean, SEM, SD, N, RTSEM and PropagatedSEM.
+
+    """
+    if isinstance(Conditions, str):
+        Conditions = [Conditions]
+    Keys = list(Baselines.index.names)
+    addKeys(Data, Keys)
+    Errors = RTBaseline.describeGroups(Data, Keys + list(Conditions), Column)
+    GroupKeys = Errors.index.to_frame(index=False)[Keys]
+    Rows = baselineRows(GroupKeys, Baselines)
+    checkRows(Rows, GroupKeys)
+    Errors["RTSEM"] = Baselines["SEM"].to_numpy(dtype=float)[Rows]
+    Errors["PropagatedSEM"] = np.hypot(Errors["SEM"], Errors["RTSEM"])
+    return Errors
@@ -0,0 +1,356 @@
+# Batch Analysis
+#
+# Runs the analyses for every participant in a data folder and combines them
+# into group tables, instead of editing PartInitials/DataLocation in each
+# analysis script and re-running it per person.
+#
+# Analyses (see Analyses below)-
+#   TW       : contrast triggers, descriptives of each contrast level
+#   HF       : hemifield, descriptives of each visible hemifield
+#   TWTime   : contrast triggers over time, each contrast level by trial
+# Each one loads the participant's sessions (LoadSessions), subtracts their
+# reaction time baseline (RTBaseline/BaselineCorrection), rejects outliers
+# (OutlierRejection) and keeps a few small tables- descriptives with the
+# propagated SEM, key press counts, outlier counts, the ANOVA and pairwise
+# t-tests of the condition (HypothesisTests), bootstrap intervals of the
+# mean/median response time and trigger rate (Resampling) or the over time
+# table.
+#
+# Participants are analysed in a process pool. Each participant x analysis
+# result is pickled into a cache folder along with a key made from their
+# session/RT files (names, sizes, mtimes), their RT baseline and the
+# analysis settings, so a rerun only redoes participants whose data changed
+# and just reads the rest back. The results are then concatenated into group
+# tables (one row per participant x condition) and a group summary (the mean
+# and SEM of the participant means) and written as csv files.
+#
+# Run from the FileProcessing folder-
+#   python BatchAnalysis.py -d ./Data
+#   python BatchAnalysis.py -d ./Data -a TW TWTime -p RH MS -w 4 -o ./GroupResults
+
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import LoadSessions
+import TrialLayouts
+import RTBaseline
+import BaselineCorrection
+import OutlierRejection
+import HypothesisTests
+import Resampling
+
+# Bump when the analysis code changes so every cached result is redone
+BatchVersion = 5
+CacheFolder = ".batch_cache"
+IndexName = "index.json"
+CountTables = ("KeyPresses", "Outliers")
+
+Analyses = {
+    "TW": {"Experiment": "TW", "NumSD": 2, "OverTime": False, "Reps": 10000},
+    "HF": {"Experiment": "HF", "NumSD": 3, "OverTime": False, "Reps": 10000},
+    "TWTime": {"Experiment": "TW", "NumSD": 2, "OverTime": True},
+}
+
+def findParticipants(DataLocation, Experiments, Source="csv"):
+    """
+    findParticipants - initials of everyone with sessions for any of the
+                       experiments, in order
+    """
+    Files = []
+    for Experiment in Experiments:
+        Files += LoadSessions.sessionFiles(DataLocation, Experiment, Source=Source)
+    return sorted({os.path.basename(x).split("_")[1] for x in Files})
+
+def jobKey(Analysis, Files, Baseline):
+    """
+    jobKey - hash of everything a participant's result depends on
+
+    Parameters
+    ----------
+    Analysis : String
+        Name in Analyses.
+    Files : List of strings
+        The participant's session files.
+    Baseline : Dict
+        Their RT baseline (Mean and SEM are used).
+
+    Returns
+    -------
+    String
+
+    """
+    Stats = [(os.path.basename(x), os.stat(x).st_size, os.stat(x).st_mtime_ns) for x in Files]
+    Description = {"version": BatchVersion, "analysis": Analyses[Analysis], "files": Stats,
+                   "baseline": [Baseline["Mean"], Baseline["SEM"]]}
+    return hashlib.sha256(json.dumps(Description, sort_keys=True).encode()).hexdigest()
+
+def prepare(AllData, Baselines, Settings):
+    """
+    prepare - subtracts the participant's RT baseline and rejects outliers
+
+    Parameters
+    ----------
+    AllData : Pandas Dataframe
+        From LoadSessions.loadSessions.
+    Baselines : Pandas Dataframe
+        Their row of RTBaseline.baselineTable.
+    Settings : Dict
+        Entry of Analyses.
+
+    Returns
+    -------
+    AllData : Pandas Dataframe
+    Condition : String
+        The experiment's condition column.
+
+    """
+    Condition = TrialLayouts.getLayout(Settings["Experiment"])["Condition"]
+    Levels = AllData[Condition].cat.categories
+    if pd.api.types.is_float_dtype(Levels):
+        # Contrast levels were saved as float32 (0.899999976158 -> 0.9)
+        AllData[Condition] = AllData[Condition].cat.rename_categories(np.round(Levels, 6))
+    BaselineCorrection.correct(AllData, Baselines)
+    OutlierRejection.reject(AllData, ["ParticipantID", Condition], "sd", Settings["NumSD"],
+                            Reference=AllData["Direction"] == "right")
+    return AllData, Condition
+
+def analyse(AllData, Baselines, Settings):
+    """
+    analyse - one participant's analysis on their loaded sessions
+
+    Parameters
+    ----------
+    See prepare.
+
+    Returns
+    -------
+    Tables : Dict of {table name: Pandas Dataframe}
+
+    """
+    AllData, Condition = prepare(AllData, Baselines, Settings)
+    if Settings["OverTime"]:
+        # Trial = the nth presentation of that condition in the session,
+        # numbered before the missed triggers are dropped
+        AllData["Trial"] = AllData.groupby(["Session", Condition], observed=True).cumcount()
+    Correct = AllData[AllData["Direction"] == "right"]
+    if Settings["OverTime"]:
+        return {"OverTime": RTBaseline.describeGroups(Correct, ["ParticipantID", Condition, "Trial"])}
+    Keys = AllData.groupby(["ParticipantID", Condition, "Direction"], observed=True).size()
+    Triggers = AllData.assign(Triggered=AllData["Direction"] == "right")
+    Intervals = [Resampling.bootstrap(Correct, ["ParticipantID", Condition], Reps=Settings["Reps"]),
+                 Resampling.bootstrap(Triggers, ["ParticipantID", Condition], "Triggered", ["proportion"],
+                                      Reps=Settings["Reps"])]
+    return {"Descriptives": BaselineCorrection.propagatedError(Correct, Condition, Baselines),
+            "KeyPresses": Keys.unstack("Direction", fill_value=0),
+            "Outliers": OutlierRejection.summary(AllData, ["ParticipantID", Condition]),
+            "Tests": HypothesisTests.compare(Correct, Condition),
+            "Bootstrap": pd.concat(Intervals)}
+
+def runJob(Job):
+    """
+    runJob - loads and analyses one participant (runs in the pool)
+
+    Parameters
+    ----------
+    Job : Tuple
+        (analysis name, participant initials, session files, their row of
+        the baseline table)
+
+    Returns
+    -------
+    Tables : Dict of {table name: Pandas Dataframe}
+
+    """
+    Analysis, PartInitials, Files, Baselines = Job
+    Settings = Analyses[Analysis]
+    if not Baselines["N"].iloc[0]:
+        raise ValueError(f"No reaction time sessions for {PartInitials}")
+    AllData = LoadSessions.loadSessions(None, Settings["Experiment"], Files=Files)
+    return analyse(AllData, Baselines, Settings)
+
+def loadIndex(CachePath):
+    try:
+        with open(os.path.join(CachePath, IndexName)) as File:
+            return json.load(File)
+    except (OSError, ValueError):
+        return {}
+
+def saveIndex(CachePath, Index):
+    IndexPath = os.path.join(CachePath, IndexName)
+    with open(IndexPath + ".tmp", "w") as File:
+        json.dump(Index, File, indent=1, sort_keys=True)
+    os.replace(IndexPath + ".tmp", IndexPath)
+
+def runBatch(DataLocation, Names=tuple(Analyses), Participants=None, RTLocation=None, Workers=None,
+             CachePath=None, Force=False):
+    """
+    runBatch - analyses every participant, only redoing the ones whose data
+               changed since the last run
+
+    Parameters
+    ----------
+    DataLocation : String
+        Folder with the tidy csv files.
+    Names : Iterable of strings
+        Analyses to run (names in Analyses).
+    Participants : List of strings or None
+        Participant initials, None finds everyone.
+    RTLocation : String or None
+        Folder with the RT files (default DataLocation).
+    Workers : Int or None
+        Processes in the pool (None = every core).
+    CachePath : String or None
+        Cache folder (default .batch_cache in DataLocation).
+    Force : Bool
+        Redo everyone.
+
+    Returns
+    -------
+    Results : Dict of {analysis: {participant: {table name: Pandas Dataframe}}}
+    Failed : List of (analysis, participant, error message)
+
+    """
+    RTLocation = RTLocation or DataLocation
+    CachePath = CachePath or os.path.join(DataLocation, CacheFolder)
+    os.makedirs(CachePath, exist_ok=True)
+    Index = loadIndex(CachePath)
+    if Participants is None:
+        Participants = findParticipants(DataLocation, {Analyses[x]["Experiment"] for x in Names})
+    # Baselines are worked out here, not in the pool, as they share one cache file
+    Baselines = RTBaseline.baselineTable(RTLocation, Participants)
+
+    Results = {x: {} for x in Names}
+    Jobs = {}
+    for Analysis in Names:
+        Experiment = Analyses[Analysis]["Experiment"]
+        for PartInitials in Participants:
+            Files = LoadSessions.sessionFiles(DataLocation, Experiment, PartInitials)
+            if not Files:
+                continue
+            Name = f"{Analysis}_{PartInitials}"
+            Key = jobKey(Analysis, Files, Baselines.loc[PartInitials])
+            Cached = os.path.join(CachePath, Name + ".pkl")
+            if not Force and Index.get(Name) == Key and os.path.exists(Cached):
+                with open(Cached, "rb") as File:
+                    Results[Analysis][PartInitials] = pickle.load(File)
+                continue
+            Jobs[(Analysis, PartInitials)] = (Key, (Analysis, PartInitials, Files,
+                                                    Baselines.loc[[PartInitials]]))
+
+    Failed = []
+    print(f"{sum(len(x) for x in Results.values())} cached, {len(Jobs)} to run")
+    if Jobs:
+        with ProcessPoolExecutor(max_workers=Workers) as Pool:
+            Futures = {Id: Pool.submit(runJob, Job) for Id, (Key, Job) in Jobs.items()}
+            for (Analysis, PartInitials), Future in Futures.items():
+                Name = f"{Analysis}_{PartInitials}"
+                try:
+                    Tables = Future.result()
+                except Exception as Error:
+                    Failed.append((Analysis, PartInitials, repr(Error)))
+                    Index.pop(Name, None)
+                    print(f"FAILED {Name}: {Error!r}")
+                    continue
+                with open(os.path.join(CachePath, Name + ".pkl"), "wb") as File:
+                    pickle.dump(Tables, File, protocol=pickle.HIGHEST_PROTOCOL)
+                Index[Name] = Jobs[(Analysis, PartInitials)][0]
+                Results[Analysis][PartInitials] = Tables
+                print(f"Done {Name}")
+        saveIndex(CachePath, Index)
+    return Results, Failed
+
+def groupTables(Results):
+    """
+    groupTables - every participant's tables of each analysis in one table
+
+    Returns
+    -------
+    Tables : Dict of {analysis_table name: Pandas Dataframe}
+
+    """
+    Tables = {}
+    for Analysis, Participants in Results.items():
+        Names = dict.fromkeys(x for Tables in Participants.values() for x in Tables)
+        for Name in Names:
+            Frames = [Participants[x][Name] for x in sorted(Participants) if Name in Participants[x]]
+            Table = pd.concat(Frames)
+            if Name in CountTables:
+                # Keys/reasons a participant never had are missing from their table
+                Table = Table.fillna(0).astype(int)
+            Tables[f"{Analysis}_{Name}"] = Table
+    return Tables
+
+def groupSummary(Descriptives):
+    """
+    groupSummary - mean and SEM of the participant means at each condition
+
+    Parameters
+    ----------
+    Descriptives : Pandas Dataframe
+        Group descriptives table (index ParticipantID, condition).
+
+    Returns
+    -------
+    Pandas Dataframe
+        One row per condition, columns Mean, SEM, SD and N (participants).
+
+    """
+    Means = Descriptives["Mean"].reset_index()
+    Condition = [x for x in Means.columns if x not in ("ParticipantID", "Mean")]
+    return RTBaseline.describeGroups(Means, Condition, "Mean")
+
+def saveTables(Tables, OutputFolder):
+    """
+    saveTables - writes each group table (and the group summaries) as csv
+    """
+    os.makedirs(OutputFolder, exist_ok=True)
+    Written = []
+    for Name, Table in Tables.items():
+        Written.append(os.path.join(OutputFolder, Name + ".csv"))
+        Table.to_csv(Written[-1])
+        if Name.endswith("_Descriptives"):
+            Written.append(os.path.join(OutputFolder, Name.replace("_Descriptives", "_Group") + ".csv"))
+            groupSummary(Table).to_csv(Written[-1])
+    return Written
+
+def parseArgs(Args=None):
+    Parser = argparse.ArgumentParser(
+        description="Analyse every participant and write group tables.")
+    Parser.add_argument("-d", "--data", required=True,
+                        help="folder with the tidy csv files")
+    Parser.add_argument("--rt-data", default=None,
+                        help="folder with the RT files (default: the data folder)")
+    Parser.add_argument("-a", "--analyses", nargs="+", choices=list(Analyses), default=list(Analyses))
+    Parser.add_argument("-p", "--participants", nargs="+", default=None,
+                        help="participant initials (default: everyone)")
+    Parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of participants analysed at once (default: all cores)")
+    Parser.add_argument("-o", "--output", default=None,
+                        help="folder for the group tables (default: Group in the data folder)")
+    Parser.add_argument("--cache", default=None,
+                        help="cache folder (default: .batch_cache in the data folder)")
+    Parser.add_argument("--force", action="store_true",
+                        help="redo every participant, even unchanged ones")
+    return Parser.parse_args(Args)
+
+def main(Args):
+    Start = time.perf_counter()
+    Results, Failed = runBatch(Args.data, Args.analyses, Args.participants, Args.rt_data, Args.workers,
+                               Args.cache, Args.force)
+    Written = saveTables(groupTables(Results), Args.output or os.path.join(Args.data, "Group"))
+    print(f"Wrote {len(Written)} tables in {time.perf_counter() - Start:.1f}s")
+    if Failed:
+        sys.exit(1)
+
+# %%
+if __name__ == "__main__":
+    main(parseArgs())
@@ -0,0 +1,222 @@
+# Benchmark Analysis
+#
+# Times each stage of the tidy/analysis pipeline on a synthetic archive
+# (see SyntheticData.py) of N participants x M sessions-
+#   tidy     : MakeTidy.convertAll over the TW and RT workbooks
+#   load     : reading the tidy csv files into one dataframe, as the
+#              analysis scripts do (LoadSessions.loadSessions)
+#   rtsub    : subtracting the mean reaction time
+#   outliers : removing slow outliers per condition
+#   stats    : descriptives, ANOVA and t-tests
+#   plots    : the seaborn figures (drawn with the Agg backend, not shown)
+# for the TW (contrast level) and HF (visible hemifield) experiments.
+#
+# The best time of each stage can be saved as a baseline json. Later runs
+# with the same settings are compared against it and anything more than
+# --threshold slower is flagged as a regression (exit code 1), so it can be
+# ran before and after a change. Baselines are per machine, so they are kept
+# in BenchmarkBaseline.json next to this script and not committed.
+#
+# Run from the FileProcessing folder-
+#   python BenchmarkAnalysis.py -n 10 -m 20 --save-baseline
+#   python BenchmarkAnalysis.py -n 10 -m 20 --threshold 0.25
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+import MakeTidy
+import LoadSessions
+import OutlierRejection
+import HypothesisTests
+import SyntheticData
+
+DefaultBaseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), "BenchmarkBaseline.json")
+
+Conditions = {"TW": "ContrastLevel", "HF": "VisibleHemifield"}
+
+def fresh(Data):
+    """
+    fresh - copies the frames a stage is given, so every repeat starts from
+            the same data (the stages change frames in place like the scripts)
+    """
+    if isinstance(Data, (pd.DataFrame, pd.Series)):
+        return Data.copy()
+    if isinstance(Data, tuple):
+        return tuple(fresh(x) for x in Data)
+    return Data
+
+def timeStage(Func, Data, Repeats):
+    """
+    timeStage - best time of Repeats runs of a stage, and what it returned
+    """
+    Best = np.inf
+    for x in range(Repeats):
+        Input = fresh(Data)
+        Start = time.perf_counter()
+        Result = Func(Input)
+        Best = min(Best, time.perf_counter() - Start)
+    return Best, Result
+
+def tidyStage(Folder):
+    Jobs = MakeTidy.findFiles([Folder], ["TW", "RT"], ["*"])
+    with contextlib.redirect_stdout(io.StringIO()):
+        Converted, Failed = MakeTidy.convertAll(Jobs, Workers=1, Threads=True)
+    if Failed:
+        raise RuntimeError(f"Tidy stage failed on {Failed}")
+    return Folder
+
+def loadStage(Folder, Prefix):
+    """
+    loadStage - reads every tidy csv for an experiment into one dataframe
+                with LoadSessions, as the analysis scripts do
+    """
+    return LoadSessions.loadSessions(Folder, Prefix)
+
+def rtSubStage(Data):
+    AllData, RTAll = Data
+    RTMean = RTAll["ResponseTime"].mean()
+    AllData["ResponseTime"] = AllData["ResponseTime"].apply(lambda x: x - RTMean)
+    return AllData
+
+def outlierStage(AllData, Condition, NumSD=2):
+    """
+    outlierStage - the scripts' outlier rejection (OutlierRejection.reject
+                   per participant and condition)
+    """
+    return OutlierRejection.reject(AllData, ["ParticipantID", Condition], "sd", NumSD,
+                                   Reference=AllData["Direction"] == "right")
+
+def statsStage(AllData, Condition):
+    AllCorrect = AllData[AllData["Direction"] == "right"]
+    Descriptives = AllCorrect.groupby([Condition])["ResponseTime"].describe()
+    return Descriptives, HypothesisTests.compare(AllData, Condition)
+
+def plotStage(AllData, Condition):
+    sns.set_theme()
+    AllData = AllData.reset_index(drop=True)
+    Right = AllData[AllData.Direction == "right"]
+    sns.displot(data=Right, x="ResponseTime", hue=Condition, kind="kde", palette="pastel")
+    sns.catplot(data=Right, kind="violin", x=Condition, y="ResponseTime", hue=Condition,
+                palette="pastel", legend=False)
+    sns.catplot(data=Right, kind="box", x=Condition, y="ResponseTime", hue=Condition,
+                palette="pastel", legend=False)
+    for Cond in Right[Condition].dropna().unique():
+        sns.lmplot(data=Right[Right[Condition] == Cond], x="TrialNumber", y="ResponseTime",
+                   x_estimator=np.mean)
+    for Figure in plt.get_fignums():
+        plt.figure(Figure).canvas.draw()
+    plt.close("all")
+    return AllData
+
+def runBenchmark(NumParticipants, NumSessions, Seed, Repeats, Folder):
+    """
+    runBenchmark - writes the archive and times every stage
+
+    Returns
+    -------
+    Times : Dict of {stage name: best time (s)}
+
+    """
+    SyntheticData.makeArchive(Folder, NumParticipants, NumSessions, Seed, TidyCSV=False)
+    Times = {}
+    # Tidy writes the csv files every run, so it is always ran on the same workbooks
+    Times["tidy"], _ = timeStage(tidyStage, Folder, Repeats)
+    Times["RT load"], RTAll = timeStage(lambda x: loadStage(x, "RT"), Folder, Repeats)
+    for Experiment, Condition in Conditions.items():
+        Times[f"{Experiment} load"], AllData = timeStage(lambda x: loadStage(x, Experiment), Folder, Repeats)
+        Times[f"{Experiment} rtsub"], AllData = timeStage(rtSubStage, (AllData, RTAll), Repeats)
+        Times[f"{Experiment} outliers"], AllData = timeStage(lambda x: outlierStage(x, Condition),
+                                                            AllData, Repeats)
+        Times[f"{Experiment} stats"], _ = timeStage(lambda x: statsStage(x, Condition), AllData, Repeats)
+        Times[f"{Experiment} plots"], _ = timeStage(lambda x: plotStage(x, Condition), AllData, Repeats)
+    return Times
+
+def compare(Times, Baseline, Threshold, MinDelta=0.005):
+    """
+    compare - prints each stage against the baseline. Stages have to be
+              MinDelta (s) slower as well, so timer noise on the very quick
+              stages isn't flagged.
+
+    Returns
+    -------
+    Regressions : List of stage names more than Threshold slower
+
+    """
+    Regressions = []
+    print(f"{'stage':<14} {'time (s)':>9} {'baseline':>9} {'change':>8}")
+    for Stage, Time in Times.items():
+        Base = Baseline.get(Stage) if Baseline else None
+        if Base is None:
+            print(f"{Stage:<14} {Time:>9.3f} {'-':>9} {'-':>8}")
+            continue
+        Change = Time / Base - 1
+        Flag = ""
+        if Change > Threshold and Time - Base > MinDelta:
+            Regressions.append(Stage)
+            Flag = "  REGRESSION"
+        print(f"{Stage:<14} {Time:>9.3f} {Base:>9.3f} {Change:>+7.0%}{Flag}")
+    return Regressions
+
+def loadBaseline(FileName, Settings):
+    """
+    loadBaseline - the saved stage times for these settings, None if there
+                   aren't any
+    """
+    try:
+        with open(FileName) as File:
+            Baselines = json.load(File)
+    except (OSError, ValueError):
+        return None
+    return Baselines.get(settingsKey(Settings), {}).get("times")
+
+def saveBaseline(FileName, Settings, Times):
+    try:
+        with open(FileName) as File:
+            Baselines = json.load(File)
+    except (OSError, ValueError):
+        Baselines = {}
+    Baselines[settingsKey(Settings)] = {"settings": Settings, "times": Times,
+                                        "python": platform.python_version(),
+                                        "pandas": pd.__version__,
+                                        "machine": platform.node()}
+    with open(FileName, "w") as File:
+        json.dump(Baselines, File, indent=1, sort_keys=True)
+
+def settingsKey(Settings):
+    return "n{participants}_m{sessions}_seed{seed}".format(**Settings)
+
+if __name__ == "__main__":
+    Parser = argparse.ArgumentParser(description="Benchmark the tidy/analysis pipeline stages")
+    Parser.add_argument("-n", "--participants", type=int, default=4)
+    Parser.add_argument("-m", "--sessions", type=int, default=8, help="sessions per participant")
+    Parser.add_argument("--seed", type=int, default=0)
+    Parser.add_argument("--repeats", type=int, default=3)
+    Parser.add_argument("--baseline", default=DefaultBaseline, help="baseline json file")
+    Parser.add_argument("--save-baseline", action="store_true",
+                        help="save these times as the baseline for these settings")
+    Parser.add_argument("--threshold", type=float, default=0.2,
+                        help="fraction slower than the baseline that counts as a regression")
+    Args = Parser.parse_args()
+
+    Settings = {"participants": Args.participants, "sessions": Args.sessions, "seed": Args.seed}
+    with tempfile.TemporaryDirectory() as Folder:
+        Times = runBenchmark(Args.participants, Args.sessions, Args.seed, Args.repeats, Folder)
+    Regressions = compare(Times, loadBaseline(Args.baseline, Settings), Args.threshold)
+    if Args.save_baseline:
+        saveBaseline(Args.baseline, Settings, Times)
+        print(f"Saved baseline to {Args.baseline}")
+    if Regressions:
+        sys.exit(f"{len(Regressions)} stage(s) slower than the baseline by more than {Args.threshold:.0%}")
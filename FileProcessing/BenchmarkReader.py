@@ -0,0 +1,102 @@
+# Benchmark Reader
+#
+# Times the streaming ReadTrialHandler reader against the old
+# loadExcelData (pd.read_excel + iterrows) path on large synthetic trial
+# handeler exports with extra sheets, and checks both give the same tidy data.
+#
+# Run from the FileProcessing folder-
+#   python BenchmarkReader.py
+#   python BenchmarkReader.py --rows 100 1000 5000 --sheets 4
+
+import os
+import io
+import argparse
+import contextlib
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import openpyxl
+
+import MakeTidy
+import ReadTrialHandler
+import TrialLayouts
+
+Conditions = [0.899999976158, 0.75, 0.600000023842]
+NumTrials = 17
+
+def writeSyntheticWorkbook(FileName, NumRows, NumSheets=1, Seed=0):
+    """
+    writeSyntheticWorkbook - writes a TW style trial handeler export with
+                             NumRows rows on the first sheet and NumSheets-1
+                             extra copies after it
+
+    Parameters
+    ----------
+    FileName : String
+        .xlsx file to write.
+    NumRows : Int
+        Number of trial handeler rows per sheet.
+    NumSheets : Int
+        Total number of sheets.
+    Seed : Int
+        Seed for the random generator.
+
+    Returns
+    -------
+    None.
+
+    """
+    Rng = np.random.default_rng(Seed)
+    Pad = [None] * (NumTrials - 1)
+    Header = (["n", "ContrastLevel_mean", "ContrastLevel_raw"] + Pad + ["ContrastLevel_std",
+              "KeyPressed_raw"] + Pad + ["TravelTime_mean", "TravelTime_raw"] + Pad
+              + ["TravelTime_std"])
+    Workbook = openpyxl.Workbook(write_only=True)
+    for SheetNum in range(NumSheets):
+        Sheet = Workbook.create_sheet("rawData" if SheetNum == 0 else f"rawData{SheetNum}")
+        Sheet.append(Header)
+        Keys = np.where(Rng.random((NumRows, NumTrials)) < 0.7, "['right']", "['left']")
+        Times = Rng.gamma(4, 0.35, (NumRows, NumTrials))
+        for x in range(NumRows):
+            Cont = Conditions[x % len(Conditions)]
+            Sheet.append([NumTrials, Cont, *[Cont] * NumTrials, 0.0, *Keys[x],
+                          float(Times[x].mean()), *Times[x].tolist(), float(Times[x].std())])
+    Workbook.save(FileName)
+
+def oldPath(FileName):
+    with contextlib.redirect_stdout(io.StringIO()):  # loadExcelData prints the name
+        SepSeries = MakeTidy.loadExcelData(FileName, "TW")
+    return MakeTidy.tidyUpSeries(SepSeries, "XX")
+
+def newPath(FileName):
+    Data, Plan = ReadTrialHandler.readLayout(FileName, "TW")
+    return TrialLayouts.tidyFrame("TW", Data, "XX")
+
+def bestTime(Func, FileName, Repeats):
+    Best = np.inf
+    for x in range(Repeats):
+        Start = time.perf_counter()
+        Result = Func(FileName)
+        Best = min(Best, time.perf_counter() - Start)
+    return Best, Result
+
+def runBenchmark(RowCounts, NumSheets, Repeats):
+    print(f"{'rows':>8} {'sheets':>7} {'stream (s)':>11} {'read_excel (s)':>15} {'speed up':>9}")
+    with tempfile.TemporaryDirectory() as Folder:
+        for NumRows in RowCounts:
+            FileName = os.path.join(Folder, f"TW_XX_{NumRows}.xlsx")
+            writeSyntheticWorkbook(FileName, NumRows, NumSheets)
+            NewTime, NewData = bestTime(newPath, FileName, Repeats)
+            OldTime, OldData = bestTime(oldPath, FileName, Repeats)
+            pd.testing.assert_frame_equal(NewData, OldData)
+            print(f"{NumRows:>8} {NumSheets:>7} {NewTime:>11.3f} {OldTime:>15.3f} {OldTime/NewTime:>8.1f}x")
+
+if __name__ == "__main__":
+    Parser = argparse.ArgumentParser(description="Benchmark the streaming trial handeler reader")
+    Parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 5000],
+                        help="trial handeler rows per sheet")
+    Parser.add_argument("--sheets", type=int, default=3, help="sheets per workbook")
+    Parser.add_argument("--repeats", type=int, default=3)
+    Args = Parser.parse_args()
+    runBenchmark(Args.rows, Args.sheets, Args.repeats)
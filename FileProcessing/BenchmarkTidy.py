@@ -0,0 +1,102 @@
+# Benchmark Tidy
+#
+# Times MakeTidy.tidyUpSeries against the old pd.concat loop on synthetic
+# TrialHandler rows (10 to 10,000 rows) and checks both give the same frame.
+#
+# Run from the FileProcessing folder-
+#   python BenchmarkTidy.py
+#   python BenchmarkTidy.py --rows 10 100 1000 --legacy-max 1000
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+import MakeTidy
+
+Conditions = [0.899999976158, 0.75, 0.600000023842]
+NumTrials = 17
+
+def makeSyntheticRows(NumRows, Seed=0):
+    """
+    makeSyntheticRows - builds rows that look like the output of loadExcelData
+                        for the TW experiment (n, 17 contrasts, 17 key
+                        presses, 17 response times).
+
+    Parameters
+    ----------
+    NumRows : Int
+        Number of TrialHandler rows to make.
+    Seed : Int
+        Seed for the random generator.
+
+    Returns
+    -------
+    SepSeries : List of pandas Series
+
+    """
+    Rng = np.random.default_rng(Seed)
+    Keys = np.where(Rng.random((NumRows, NumTrials)) < 0.7, "['right']", "['left']")
+    Times = Rng.gamma(4, 0.35, (NumRows, NumTrials))
+    SepSeries = []
+    for x in range(NumRows):
+        Row = [NumTrials]
+        Row += [Conditions[x % len(Conditions)]] * NumTrials
+        Row += list(Keys[x])
+        Row += list(Times[x])
+        SepSeries.append(pd.Series(Row, dtype=object))
+    return SepSeries
+
+def legacyTidyUpSeries(SepSeries, PartInitials):
+    """
+    legacyTidyUpSeries - the original pd.concat implementation, kept here as
+                         the reference for timing and correctness.
+    """
+    ContLevel = pd.Series(name = "Contrast Level")
+    ButtonPress = pd.Series(name = "Button_Pressed")
+    ResponseTime = pd.Series(name = "Response_Time")
+    for x in SepSeries:
+        ContLevel = pd.concat([ContLevel, x.iloc[1:18]])
+        ButtonPress = pd.concat([ButtonPress, x.iloc[18:35]])
+        ResponseTime = pd.concat([ResponseTime, x.iloc[35:52]])
+    ContLevel = ContLevel.to_numpy()
+    ButtonPress = ButtonPress.to_numpy()
+    ResponseTime = ResponseTime.to_numpy()
+    PartInits = np.full(len(ContLevel), PartInitials)
+    return pd.DataFrame({"ParticipantID" : PartInits,
+                         "ContrastLevel" : ContLevel,
+                         "Direction" : ButtonPress,
+                         "ResponseTime" : ResponseTime})
+
+def timeIt(Func, *args, Repeats=3):
+    """
+    timeIt - best wall time (s) of Repeats calls to Func
+    """
+    Best = np.inf
+    for x in range(Repeats):
+        Start = time.perf_counter()
+        Result = Func(*args)
+        Best = min(Best, time.perf_counter() - Start)
+    return Best, Result
+
+def runBenchmark(RowCounts, LegacyMax, Repeats):
+    print(f"{'rows':>8} {'new (s)':>10} {'legacy (s)':>11} {'speed up':>9}")
+    for NumRows in RowCounts:
+        SepSeries = makeSyntheticRows(NumRows)
+        NewTime, NewData = timeIt(MakeTidy.tidyUpSeries, SepSeries, "XX", Repeats=Repeats)
+        if NumRows <= LegacyMax:
+            OldTime, OldData = timeIt(legacyTidyUpSeries, SepSeries, "XX", Repeats=1)
+            pd.testing.assert_frame_equal(NewData, OldData, check_dtype=False)
+            print(f"{NumRows:>8} {NewTime:>10.4f} {OldTime:>11.4f} {OldTime/NewTime:>8.1f}x")
+        else:
+            print(f"{NumRows:>8} {NewTime:>10.4f} {'skipped':>11} {'':>9}")
+
+if __name__ == "__main__":
+    Parser = argparse.ArgumentParser(description="Benchmark MakeTidy.tidyUpSeries")
+    Parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="numbers of TrialHandler rows to time")
+    Parser.add_argument("--legacy-max", type=int, default=3000,
+                        help="largest row count to also time the old concat loop on")
+    Parser.add_argument("--repeats", type=int, default=3)
+    Args = Parser.parse_args()
+    runBenchmark(Args.rows, Args.legacy_max, Args.repeats)
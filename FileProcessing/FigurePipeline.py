@@ -0,0 +1,314 @@
+# Figure Pipeline
+#
+# Draws the analysis figures headless (Agg backend) in worker processes and
+# saves them as png/svg/pdf, instead of drawing a dozen seaborn figures one
+# after another on screen every time something changes.
+#
+# A figure is described by a small dict (see figure)- its name, the seaborn
+# function that draws it, the slice of data it needs (only the columns it
+# plots) and its plotting parameters. The figure's key is a hash of all of
+# that, and the rendered file is kept in a cache folder under its key
+# (content addressed), then copied to the output folder under its name. A
+# figure whose data slice and parameters haven't changed is never drawn
+# again, and going back to an earlier version of a figure reuses its old
+# render.
+#
+# analysisFigures gives the analysis scripts' figures (KDE, violin, box, trend
+# over trials for each condition, violins over trial number and pause
+# interval, trigger counts) for a participant's tidy data.
+#
+# Run from the FileProcessing folder-
+#   python FigurePipeline.py -d ./Data -e TW HF -p RH MS -o ./Figures -f png pdf
+
+import os
+import json
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+import LoadSessions
+import RTBaseline
+import BatchAnalysis
+import TrialSchedule
+
+# Bump when the drawing code changes so every cached figure is drawn again
+FigureVersion = 1
+CacheFolder = ".figure_cache"
+Formats = ("png", "svg", "pdf")
+
+def countBar(data, x, hue, **Params):
+    """
+    countBar - bar chart of the number of trials of each x/hue pair (e.g. key
+               presses at each contrast level)
+    """
+    Counts = data.groupby([x, hue], observed=True).size().reset_index(name="Count")
+    return sns.catplot(data=Counts, x=x, y="Count", hue=hue, kind="bar", **Params)
+
+Plotters = {"displot": sns.displot,
+            "catplot": sns.catplot,
+            "lmplot": sns.lmplot,
+            "countbar": countBar}
+
+def figure(Name, Plotter, Data, Labels=None, Title=None, Limits=None, **Params):
+    """
+    figure - describes one figure
+
+    Parameters
+    ----------
+    Name : String
+        File name (no extension) in the output folder.
+    Plotter : String
+        Key of Plotters (seaborn figure level function).
+    Data : Pandas Dataframe
+        Data to plot, only the columns named in Params are kept.
+    Labels : (String, String) or None
+        x and y axis labels.
+    Title : String or None
+        Figure title.
+    Limits : (Number, Number) or None
+        y axis limits.
+    **Params :
+        Passed to the plotter (strings, numbers and lists only, so they can
+        be hashed). x_estimator is given by name, e.g. "mean".
+
+    Returns
+    -------
+    Spec : Dict
+
+    """
+    Columns = [x for x in dict.fromkeys(Params.values()) if isinstance(x, str) and x in Data]
+    return {"Name": Name, "Plotter": Plotter, "Data": Data[Columns].reset_index(drop=True),
+            "Params": Params, "Labels": Labels, "Title": Title, "Limits": Limits}
+
+def figureKey(Spec, Format, Dpi):
+    """
+    figureKey - hash of a figure's data slice, parameters and output settings
+    """
+    Data = Spec["Data"]
+    Hash = hashlib.sha256()
+    Hash.update(pd.util.hash_pandas_object(Data, index=False).to_numpy().tobytes())
+    Settings = {x: Spec[x] for x in ("Plotter", "Params", "Labels", "Title", "Limits")}
+    Settings.update({"columns": list(Data.columns), "dtypes": [str(x) for x in Data.dtypes],
+                     "format": Format, "dpi": Dpi, "version": FigureVersion,
+                     "seaborn": sns.__version__, "matplotlib": matplotlib.__version__})
+    Hash.update(json.dumps(Settings, sort_keys=True, default=str).encode())
+    return Hash.hexdigest()
+
+def drawFigure(Spec):
+    """
+    drawFigure - draws a figure from its spec, returns the matplotlib figure
+    """
+    Params = dict(Spec["Params"])
+    if isinstance(Params.get("x_estimator"), str):
+        Params["x_estimator"] = getattr(np, Params["x_estimator"])
+    Grid = Plotters[Spec["Plotter"]](data=Spec["Data"], **Params)
+    if Spec["Labels"]:
+        Grid.set_axis_labels(*Spec["Labels"])
+    if Spec["Limits"]:
+        Grid.set(ylim=tuple(Spec["Limits"]))
+    if Spec["Title"]:
+        Grid.figure.suptitle(Spec["Title"], fontsize=20, fontweight="bold")
+        Grid.figure.subplots_adjust(top=0.95)
+    return Grid.figure
+
+def renderFigure(Spec, Paths, Dpi=100):
+    """
+    renderFigure - draws a figure and saves it in each format (runs in the
+                   pool)
+
+    Parameters
+    ----------
+    Spec : Dict
+        From figure.
+    Paths : Dict of {format: file name}
+        Where to save each format.
+    Dpi : Int
+        Resolution of the png.
+
+    Returns
+    -------
+    Paths : Dict of {format: file name}
+
+    """
+    sns.set_theme()
+    Figure = drawFigure(Spec)
+    try:
+        for Format, Path in Paths.items():
+            # Written under a temp name so an interrupted render never looks cached
+            Figure.savefig(Path + ".tmp", format=Format, dpi=Dpi)
+            os.replace(Path + ".tmp", Path)
+    finally:
+        plt.close(Figure)
+    return Paths
+
+def render(Specs, OutputFolder, Formats=("png",), Workers=None, CachePath=None, Dpi=100):
+    """
+    render - draws every figure that isn't already in the cache and copies
+             them all into the output folder
+
+    Parameters
+    ----------
+    Specs : List of dicts
+        From figure (or analysisFigures).
+    OutputFolder : String
+        Where to put the figures (Name.format).
+    Formats : Tuple of strings
+        Some of png, svg and pdf.
+    Workers : Int or None
+        Processes drawing at once (None = every core, 0 = draw here).
+    CachePath : String or None
+        Cache folder (default .figure_cache in the output folder).
+    Dpi : Int
+        Resolution of the pngs.
+
+    Returns
+    -------
+    Written : List of strings
+        Every figure file in the output folder.
+    Drawn : Int
+        Number of figures that had to be drawn.
+
+    """
+    CachePath = CachePath or os.path.join(OutputFolder, CacheFolder)
+    os.makedirs(CachePath, exist_ok=True)
+    os.makedirs(OutputFolder, exist_ok=True)
+    ToDraw = []
+    Copies = []
+    for Spec in Specs:
+        Missing = {}
+        for Format in Formats:
+            Cached = os.path.join(CachePath, figureKey(Spec, Format, Dpi) + "." + Format)
+            Copies.append((Cached, os.path.join(OutputFolder, Spec["Name"] + "." + Format)))
+            if not os.path.exists(Cached):
+                Missing[Format] = Cached
+        if Missing:
+            ToDraw.append((Spec, Missing))
+
+    if Workers == 0:
+        for Spec, Missing in ToDraw:
+            renderFigure(Spec, Missing, Dpi)
+    elif ToDraw:
+        with ProcessPoolExecutor(max_workers=Workers) as Pool:
+            Futures = [Pool.submit(renderFigure, Spec, Missing, Dpi) for Spec, Missing in ToDraw]
+            for Future in Futures:
+                Future.result()
+
+    for Cached, Output in Copies:
+        shutil.copyfile(Cached, Output)
+    return [x[1] for x in Copies], len(ToDraw)
+
+def analysisFigures(AllData, Condition, Prefix="", Conditions=None):
+    """
+    analysisFigures - the analysis scripts' figures for one experiment
+
+    Parameters
+    ----------
+    AllData : Pandas Dataframe
+        Tidy data (baseline corrected, outliers rejected).
+    Condition : String
+        Condition column, e.g. "ContrastLevel".
+    Prefix : String
+        Start of every figure name, e.g. "TW_RH_".
+    Conditions : List or None
+        Conditions to draw the trend over trials for (default all of them).
+
+    Returns
+    -------
+    Specs : List of dicts
+
+    """
+    Right = AllData[AllData["Direction"] == "right"]
+    if Conditions is None:
+        Conditions = list(Right[Condition].dropna().unique())
+    Labels = ("Trial Number", "Response Time (s)")
+    Specs = [figure(Prefix + "KDE", "displot", Right, x="ResponseTime", hue=Condition, kind="kde",
+                    palette="pastel"),
+             figure(Prefix + "Violin", "catplot", Right, kind="violin", x=Condition, y="ResponseTime",
+                    hue=Condition, palette="pastel", legend=False),
+             figure(Prefix + "Box", "catplot", Right, kind="box", x=Condition, y="ResponseTime",
+                    hue=Condition, palette="pastel", legend=False)]
+    for Cond in Conditions:
+        Specs.append(figure(f"{Prefix}Trend_{Cond}", "lmplot", Right[Right[Condition] == Cond], Labels=Labels,
+                            Title=str(Cond), x="TrialNumber", y="ResponseTime", x_estimator="mean",
+                            height=8.27, aspect=15 / 8.27))
+    Specs.append(figure(Prefix + "TrialViolin", "catplot", AllData, Labels=Labels, x="TrialNumber",
+                        y="ResponseTime", kind="violin", height=8.27, aspect=15 / 8.27, col=Condition))
+    if "PauseInt" in AllData:
+        Specs.append(figure(Prefix + "PauseViolin", "catplot", AllData, Labels=Labels, x="PauseInt",
+                            y="ResponseTime", kind="violin", height=8.27, aspect=15 / 8.27, col=Condition))
+    Specs.append(figure(Prefix + "TriggerCounts", "countbar", AllData, Labels=(Condition, "Number of trials"),
+                        x=Condition, hue="Direction"))
+    return Specs
+
+def participantFigures(DataLocation, Experiments=("TW", "HF"), Participants=None, RTLocation=None):
+    """
+    participantFigures - analysisFigures for every participant in a data
+                         folder
+
+    Parameters
+    ----------
+    DataLocation : String
+        Folder with the tidy csv files.
+    Experiments : Iterable of strings
+        Some of "TW" and "HF".
+    Participants : List of strings or None
+        Participant initials, None finds everyone.
+    RTLocation : String or None
+        Folder with the RT files (default DataLocation).
+
+    Returns
+    -------
+    Specs : List of dicts
+
+    """
+    Participants = Participants or BatchAnalysis.findParticipants(DataLocation, Experiments)
+    Baselines = RTBaseline.baselineTable(RTLocation or DataLocation, Participants)
+    Specs = []
+    for Experiment in Experiments:
+        Settings = BatchAnalysis.Analyses[Experiment]
+        for PartInitials in Participants:
+            AllData = LoadSessions.loadSessions(DataLocation, Experiment, PartInitials)
+            if AllData.empty or not Baselines.loc[PartInitials, "N"]:
+                continue
+            try:
+                AllData = TrialSchedule.annotate(AllData, Experiment)
+            except ValueError as Error:
+                print(f"No pause figure for {Experiment} {PartInitials}: {Error}")
+            AllData, Condition = BatchAnalysis.prepare(AllData, Baselines.loc[[PartInitials]], Settings)
+            Specs += analysisFigures(AllData, Condition, f"{Experiment}_{PartInitials}_")
+    return Specs
+
+def parseArgs(Args=None):
+    Parser = argparse.ArgumentParser(description="Draw the analysis figures for every participant.")
+    Parser.add_argument("-d", "--data", required=True, help="folder with the tidy csv files")
+    Parser.add_argument("--rt-data", default=None,
+                        help="folder with the RT files (default: the data folder)")
+    Parser.add_argument("-e", "--experiments", nargs="+", choices=["TW", "HF"], default=["TW", "HF"])
+    Parser.add_argument("-p", "--participants", nargs="+", default=None,
+                        help="participant initials (default: everyone)")
+    Parser.add_argument("-o", "--output", default=None,
+                        help="folder for the figures (default: Figures in the data folder)")
+    Parser.add_argument("-f", "--formats", nargs="+", choices=Formats, default=["png"])
+    Parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="figures drawn at once (default: all cores)")
+    Parser.add_argument("--dpi", type=int, default=100)
+    return Parser.parse_args(Args)
+
+def main(Args):
+    Specs = participantFigures(Args.data, Args.experiments, Args.participants, Args.rt_data)
+    Output = Args.output or os.path.join(Args.data, "Figures")
+    Written, Drawn = render(Specs, Output, tuple(Args.formats), Args.workers, Dpi=Args.dpi)
+    print(f"{len(Specs)} figures, {Drawn} drawn, {len(Specs) - Drawn} from the cache,"
+          f" {len(Written)} files in {Output}")
+
+# %%
+if __name__ == "__main__":
+    main(parseArgs())
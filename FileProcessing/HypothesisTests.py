@@ -0,0 +1,196 @@
+# Hypothesis Tests
+#
+# Omnibus and all pairwise tests of a factor (contrast level, visible
+# hemifield...) for every participant at once, with the pairwise p values
+# corrected for multiple comparisons, in one results table. Replaces the
+# f_oneway and hand-written ttest_ind calls on hard coded groups in the
+# analysis scripts.
+#
+# The data is only passed over once, for the count, mean and variance of
+# every group (groupby). The tests are then worked out from those, each
+# family (e.g. participant) and pair in one array operation-
+#   "anova" : one-way ANOVA of the factor (same F and p as f_oneway)
+#   "t"     : Student's t test of each pair of levels (same as ttest_ind)
+#   "welch" : Welch's t test of each pair (ttest_ind(..., equal_var=False))
+# so testing the whole lab costs about the same as one groupby.
+#
+# Corrections (applied within each family, over its pairwise tests)-
+#   "holm", "bonferroni", "fdr_bh" (Benjamini-Hochberg) or "none"
+#
+# From an analysis script-
+#   Tests = HypothesisTests.compare(AllData, "ContrastLevel")
+#   print(Tests)
+
+import numpy as np
+import pandas as pd
+
+Corrections = ("holm", "bonferroni", "fdr_bh", "none")
+
+def groupStats(Data, Factor, By, Column):
+    """
+    groupStats - count, mean and variance (ddof 1) of each family x level,
+                 NaN values left out
+    """
+    Values = Data[Column].astype(float)
+    Keep = Values.notna().to_numpy()
+    Keys = [Data[x][Keep] for x in By + [Factor]]
+    Stats = Values[Keep].groupby(Keys, observed=True).agg(["count", "mean", "var"])
+    return Stats.reset_index()
+
+def familyCodes(Table, By):
+    """
+    familyCodes - int code of each row's family (0 for everything if By is
+                  empty)
+    """
+    if not By:
+        return np.zeros(len(Table), dtype=np.intp)
+    return Table.groupby(By, sort=False, observed=True).ngroup().to_numpy()
+
+def adjust(P, Families, Method="holm"):
+    """
+    adjust - corrects p values for multiple comparisons within each family
+
+    Parameters
+    ----------
+    P : Numpy array
+        p values, NaN ones are left out (and stay NaN).
+    Families : Numpy array of ints
+        Family of each p value.
+    Method : String
+        "holm", "bonferroni", "fdr_bh" or "none".
+
+    Returns
+    -------
+    Numpy array of adjusted p values
+
+    """
+    if Method not in Corrections:
+        raise ValueError(f"Unknown correction {Method}, use one of {Corrections}")
+    P = np.asarray(P, dtype=float)
+    if Method == "none" or not len(P):
+        return P.copy()
+    Valid = ~np.isnan(P)
+    Tests = np.bincount(Families, weights=Valid)[Families]
+    if Method == "bonferroni":
+        return np.minimum(P * Tests, 1)
+
+    # Smallest p first within each family (NaN last)
+    Order = np.lexsort((np.where(Valid, P, np.inf), Families))
+    Sorted = pd.Series(P[Order])
+    Family = Families[Order]
+    Starts = np.flatnonzero(np.diff(Family, prepend=-1))
+    Rank = np.arange(len(P)) - np.repeat(Starts, np.diff(np.append(Starts, len(P))))
+    if Method == "holm":
+        Adjusted = (Sorted * (Tests[Order] - Rank)).groupby(Family).cummax()
+    else:
+        # Step up- running minimum from the largest p down
+        Scaled = Sorted * Tests[Order] / (Rank + 1)
+        Adjusted = Scaled[::-1].groupby(Family[::-1]).cummin()[::-1]
+    Result = np.empty(len(P))
+    Result[Order] = np.minimum(Adjusted.to_numpy(), 1)
+    return Result
+
+def omnibus(Stats, By):
+    """
+    omnibus - one-way ANOVA of each family from its group stats
+    """
+    # scipy.stats is slow to import, so it is only loaded when a test runs
+    from scipy import stats
+    Family = familyCodes(Stats, By)
+    N, Mean, Var = (Stats[x].to_numpy(dtype=float) for x in ("count", "mean", "var"))
+    Levels = np.bincount(Family)
+    Total = np.bincount(Family, weights=N)
+    GrandMean = np.bincount(Family, weights=N * Mean) / Total
+    Between = np.bincount(Family, weights=N * (Mean - GrandMean[Family]) ** 2)
+    Within = np.bincount(Family, weights=(N - 1) * np.nan_to_num(Var))
+    DF1 = Levels - 1
+    DF2 = Total - Levels
+    with np.errstate(divide="ignore", invalid="ignore"):
+        F = (Between / DF1) / (Within / DF2)
+    First = np.flatnonzero(np.diff(Family, prepend=-1))
+    Table = Stats.iloc[First][By].reset_index(drop=True)
+    Table = Table.assign(Test="anova", A=np.nan, B=np.nan, NA=Total, NB=np.nan, MeanDiff=np.nan,
+                         Statistic=F, DF=DF1.astype(float), DF2=DF2, P=stats.f.sf(F, DF1, DF2))
+    # A family with one level has nothing to compare
+    return Table[DF1 > 0]
+
+def pairwise(Stats, Factor, By, EqualVar=True):
+    """
+    pairwise - t test of every pair of levels within each family from the
+               group stats
+    """
+    from scipy import stats
+    Stats = Stats.assign(Level=Stats.groupby(By, sort=False).cumcount() if By else np.arange(len(Stats)))
+    if By:
+        Pairs = Stats.merge(Stats, on=By, suffixes=("A", "B"))
+    else:
+        Pairs = Stats.merge(Stats, how="cross", suffixes=("A", "B"))
+    Pairs = Pairs[Pairs["LevelA"] < Pairs["LevelB"]].reset_index(drop=True)
+    NA, MeanA, VarA, NB, MeanB, VarB = (Pairs[x + y].to_numpy(dtype=float) for y in ("A", "B")
+                                        for x in ("count", "mean", "var"))
+    Diff = MeanA - MeanB
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if EqualVar:
+            DF = NA + NB - 2
+            Pooled = ((NA - 1) * VarA + (NB - 1) * VarB) / DF
+            SE = np.sqrt(Pooled * (1 / NA + 1 / NB))
+        else:
+            ErrA = VarA / NA
+            ErrB = VarB / NB
+            SE = np.sqrt(ErrA + ErrB)
+            DF = (ErrA + ErrB) ** 2 / (ErrA ** 2 / (NA - 1) + ErrB ** 2 / (NB - 1))
+        T = Diff / SE
+    Table = Pairs[By].assign(Test="t" if EqualVar else "welch", A=Pairs[Factor + "A"], B=Pairs[Factor + "B"],
+                             NA=NA, NB=NB, MeanDiff=Diff, Statistic=T, DF=DF, DF2=np.nan,
+                             P=2 * stats.t.sf(np.abs(T), DF))
+    return Table
+
+def compare(Data, Factor, By="ParticipantID", Column="ResponseTime", EqualVar=True, Correction="holm",
+            Alpha=0.05):
+    """
+    compare - omnibus and all pairwise tests of a factor within each family
+
+    Parameters
+    ----------
+    Data : Pandas Dataframe
+        Tidy data, NaN response times (e.g. rejected outliers) are left out.
+    Factor : String
+        Column whose levels are compared, e.g. "ContrastLevel".
+    By : String, list of strings or None
+        Columns that make the families (tested and corrected separately),
+        e.g. "ParticipantID". None tests all the data as one family.
+    Column : String
+        Column to test.
+    EqualVar : Bool
+        Student's t tests if True, Welch's if False.
+    Correction : String
+        "holm", "bonferroni", "fdr_bh" or "none".
+    Alpha : Float
+        Level for the Significant column.
+
+    Returns
+    -------
+    Pandas Dataframe
+        Index By, Test ("anova", "t" or "welch"), A and B (the levels
+        compared, NaN for the ANOVA). Columns NA and NB (trials, NA = all
+        trials for the ANOVA), MeanDiff (A - B), Statistic (F or t), DF (and
+        DF2 for the ANOVA), P, PAdjusted (P for the ANOVA) and Significant.
+
+    """
+    if By is None:
+        By = []
+    elif isinstance(By, str):
+        By = [By]
+    else:
+        By = list(By)
+    Stats = groupStats(Data, Factor, By, Column)
+    Pairs = pairwise(Stats, Factor, By, EqualVar)
+    Pairs["PAdjusted"] = adjust(Pairs["P"].to_numpy(), familyCodes(Pairs, By), Correction)
+    Omnibus = omnibus(Stats, By)
+    Omnibus["PAdjusted"] = Omnibus["P"]
+
+    Table = pd.concat([Omnibus, Pairs], ignore_index=True)
+    # Each family's ANOVA then its pairs
+    Table = Table.iloc[np.lexsort((Table["Test"] != "anova", familyCodes(Table, By)))]
+    Table["Significant"] = Table["PAdjusted"] < Alpha
+    return Table.set_index(By + ["Test", "A", "B"])
@@ -0,0 +1,152 @@
+# Load Sessions
+#
+# One loader for the analysis scripts, instead of each script globbing the
+# data folder, checking File.split(".")[1] == "csv", reading and
+# reset_index-ing every file and concatenating them.
+#
+# loadSessions finds an experiment's session files (tidy csv files, or the
+# trial handeler workbooks themselves), reads them on a thread pool with the
+# layout's dtypes and only the columns asked for, adds Session (file name)
+# and TrialNumber (row within the session, as reset_index gave) columns and
+# returns one dataframe with the text and condition columns as categories
+# (see TidyCategories.py).
+#
+# Old csv files with the first MakeTidy column names (Participant_Id,
+# Contrast_Level, Button_Pressed, Response_Time, or "0" for reaction times)
+# are renamed on the way in.
+#
+# From an analysis script-
+#   AllData = LoadSessions.loadSessions(DataLocation, "TW", PartInitials)
+#   RTAll = LoadSessions.loadSessions(DataLocation, "RT", PartInitials, Columns=["ResponseTime"])
+
+import os
+import glob
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+import ReadTrialHandler
+import TrialLayouts
+import TidyCategories
+
+Extensions = {"csv": ".csv", "xlsx": ".xlsx"}
+LegacyNames = {"Participant_Id": "ParticipantID", "Contrast_Level": "ContrastLevel",
+               "Button_Pressed": "Direction", "Response_Time": "ResponseTime", "0": "ResponseTime"}
+
+def sessionFiles(DataLocations, Experiment, Participants=None, Source="csv"):
+    """
+    sessionFiles - every session file for an experiment, in name order
+
+    Parameters
+    ----------
+    DataLocations : String or list of strings
+        Folder(s) that hold the data.
+    Experiment : String
+        Layout name (see TrialLayouts.py).
+    Participants : String, list of strings or None
+        Participant initials, None loads everyone.
+    Source : String
+        "csv" for tidy csv files, "xlsx" for trial handeler workbooks.
+
+    Returns
+    -------
+    List of strings
+
+    """
+    if isinstance(DataLocations, str):
+        DataLocations = [DataLocations]
+    if Participants is None:
+        Participants = ["*"]
+    elif isinstance(Participants, str):
+        Participants = [Participants]
+    Prefix = TrialLayouts.getLayout(Experiment)["Prefix"]
+    Files = []
+    for DataLocation in DataLocations:
+        for PartInitials in Participants:
+            SearchTxt = os.path.join(DataLocation, Prefix + "_" + PartInitials + "_*" + Extensions[Source])
+            Files += glob.glob(SearchTxt)
+    return sorted(set(Files))
+
+def columnTypes(Layout):
+    """
+    columnTypes - read_csv dtypes for a layout's numeric columns, under the
+                  old names as well (text columns are left to read_csv and
+                  made categorical after the concat)
+    """
+    Dtypes = {x: Dtype for x, Dtype in Layout["Columns"].items() if Dtype != "str"}
+    Dtypes.update({Old: Dtypes[New] for Old, New in LegacyNames.items() if New in Dtypes})
+    return Dtypes
+
+def readCSV(FileName, Layout, Columns):
+    Wanted = set(Columns)
+    Data = pd.read_csv(FileName, usecols=lambda x: LegacyNames.get(x, x) in Wanted,
+                       dtype=columnTypes(Layout))
+    if not LegacyNames.keys().isdisjoint(Data.columns):
+        Data = Data.rename(columns=LegacyNames)
+    return Data
+
+def readWorkbook(FileName, Layout, Columns):
+    Data, Plan = ReadTrialHandler.readLayout(FileName, Layout)
+    PartInitials = os.path.basename(FileName).split("_")[1]
+    Data = TrialLayouts.tidyFrame(Layout, Data, PartInitials)
+    return Data[[x for x in Data if x in Columns]]
+
+Readers = {"csv": readCSV, "xlsx": readWorkbook}
+
+def readSession(FileName, Layout, Columns, Source="csv"):
+    """
+    readSession - reads one session file into a tidy dataframe
+    """
+    Data = Readers[Source](FileName, Layout, Columns)
+    if "ParticipantID" in Columns and "ParticipantID" not in Data:
+        # Old reaction time files only saved the times
+        Data.insert(0, "ParticipantID", os.path.basename(FileName).split("_")[1])
+    return Data
+
+def loadSessions(DataLocations, Experiment, Participants=None, Columns=None, Source="csv",
+                 Workers=None, Files=None):
+    """
+    loadSessions - reads all of an experiment's sessions into one dataframe
+
+    Parameters
+    ----------
+    DataLocations : String or list of strings
+        Folder(s) that hold the data.
+    Experiment : String
+        Layout name (see TrialLayouts.py).
+    Participants : String, list of strings or None
+        Participant initials, None loads everyone.
+    Columns : List of strings or None
+        Only read these columns (None = all of the layout's columns).
+        Session and TrialNumber are always added.
+    Source : String
+        "csv" for tidy csv files, "xlsx" for trial handeler workbooks.
+    Workers : Int or None
+        Threads to read with (None = the executor's default).
+    Files : List of strings or None
+        Read these files instead of searching DataLocations.
+
+    Returns
+    -------
+    AllData : Pandas Dataframe
+        One row per trial, sessions in file name order.
+
+    """
+    Layout = TrialLayouts.getLayout(Experiment)
+    Columns = list(Columns or Layout["Columns"])
+    if Files is None:
+        Files = sessionFiles(DataLocations, Experiment, Participants, Source)
+
+    with ThreadPoolExecutor(max_workers=Workers) as Pool:
+        DataFrames = list(Pool.map(lambda x: readSession(x, Layout, Columns, Source), Files))
+
+    if not DataFrames:
+        return pd.DataFrame(columns=Columns + ["Session", "TrialNumber"])
+    AllData = pd.concat(DataFrames, ignore_index=True)
+
+    # Session and TrialNumber for every row at once, rather than per file
+    Lengths = np.array([len(x) for x in DataFrames])
+    Sessions = [os.path.splitext(os.path.basename(x))[0] for x in Files]
+    AllData["Session"] = pd.Categorical(np.repeat(Sessions, Lengths))
+    AllData["TrialNumber"] = np.arange(len(AllData)) - np.repeat(np.cumsum(Lengths) - Lengths, Lengths)
+    return TidyCategories.categorize(AllData, Layout)
@@ -3,39 +3,26 @@
 # Temporary script that will turn the default output from 
 # the psychopy trial handeler into tidy data format. 
 # Planning to turn this idea into a module with functions to use in future.
-# Still very janky when switching between reaction time and travelling wave task...
+# Experiments are described by layouts in TrialLayouts.py.
 #
 # Outputs .csv file in tidy data format
+#
+# Usage (converts every participant's TW and RT files in two folders)-
+#   python MakeTidy.py --backed-up -e TW RT -d ./Data ./OldData -w 4
 
+import os
 import sys
+import time
+import argparse
 import pandas as pd
-import glob
 import numpy as np
 
-BackupCheck = input("Is the data backed up elsewhere? yes/no:\n").lower()
-BackupCheck = BackupCheck.lower()
-
-if BackupCheck == "yes":
-    pass
-elif BackupCheck == "no":
-    sys.exit("Then back it up!")
-else:
-    sys.exit("Invalid response, expecting yes or no")
-    
-
-# Asks for the files experiment name and participant initials
-PartInitials = input("Participant initials?\n").upper()
-DataLocation = input("Data location?\n")
-ExperimentName = input("Experiment initials?\n")
+import TidyManifest
+import TidyOutput
+import TidyPipeline
+import TrialLayouts
+import SessionStore
 
-if DataLocation[-1] != "/":
-    DataLocation = DataLocation + "/"
-
-FilePrefix = ExperimentName + "_" + PartInitials + "*"
-Conditions = [0.9, 0.75, 0.6]
-SearchTxt = DataLocation + FilePrefix
-
-# Uses above information to pull list of data
 # %%
 def loadExcelData(filename, ExperimentInitials):
     """
@@ -56,48 +43,71 @@ def loadExcelData(filename, ExperimentInitials):
     else:
         for index, row in df.iterrows(): 
             row.pop("index")
-            row.pop("n")
             row.pop("RT_mean")
             row.pop("RT_std")
             SepSeries.append(row)
     return SepSeries
 
+def stackSeries(SepSeries):
+    """
+    stackSeries - stacks the row series from loadExcelData into one 2d array
+                  with rows = TrialHandler rows, columns = row values
+
+    Parameters
+    ----------
+    SepSeries : List of pandas Series, or 2d numpy array
+        Rows as returned by loadExcelData. Arrays are passed through.
 
+    Returns
+    -------
+    Block : 2d numpy array (object dtype)
     
-def tidyUpSeries(SepSeries, PartInitials):
+    """
+    if isinstance(SepSeries, np.ndarray):
+        return SepSeries
+    if len(SepSeries) == 0:
+        return np.empty((0, 1), dtype=object)
+    return np.array([x.to_numpy() for x in SepSeries], dtype=object)
+
+def seriesHeader(SepSeries):
+    """
+    seriesHeader - the sheet headings of loadExcelData's rows (unnamed columns
+                   as None, as in the sheet), None if the rows aren't labelled
+    """
+    if isinstance(SepSeries, np.ndarray) or len(SepSeries) == 0:
+        return None
+    Index = SepSeries[0].index
+    if not any(isinstance(x, str) and x.endswith("_raw") for x in Index):
+        return None
+    return tuple(None if str(x).startswith("Unnamed") else x for x in Index)
+
+def tidyUpSeries(SepSeries, PartInitials, Layout="TW"):
     """
     tidyUpSeries - reorganises the very long 1d series 
                    into a table with rows = trial, columns = variables
 
     used to save out files in tidy format, so we can opt into pandas goodness.
+    All rows are stacked into one array and the blocks are cut out with a 
+    single reshape (see TrialLayouts.tidyFrame), so the cost is linear in the 
+    number of rows. Rows are n followed by the layout's blocks, as given by
+    loadExcelData or ReadTrialHandler.readTrialHandler. Rows from
+    loadExcelData keep their headings, so only the layout's blocks are kept
+    and anything after them is dropped (as RowWidth used to).
+    """
+    Block = stackSeries(SepSeries)
+    Header = seriesHeader(SepSeries)
+    if Header is None:
+        return TrialLayouts.tidyFrame(Layout, Block[:, 1:], PartInitials)
+    Plan = TrialLayouts.compilePlan(Layout, Header)
+    return TrialLayouts.tidyFrame(Layout, Block[:, Plan["SheetColumns"]], PartInitials)
+
+def outputName(FileName, ExperimentName=None, PartInitials=None, Format="csv", OutputRoot=None):
+    """
+    outputName - the file name a source file is saved out as. For csv this is
+                 the same path and name with a new extension, parquet/feather
+                 go into experiment/participant partitions (see TidyOutput.py)
     """
-    # make 3 columns (empty for now)
-    ContLevel = pd.Series(name = "Contrast Level")
-    ButtonPress = pd.Series(name = "Button_Pressed")
-    ResponseTime = pd.Series(name = "Response_Time")
-    # at this point for 1 file... expect x to be 3
-    #assert len(SepSeries) == 3, f"Uhoh size should be 3, but is {len(SepSeries)}"
-    for x in SepSeries:
-        ContLevel = pd.concat([ContLevel, x.iloc[1:18]])
-        ButtonPress = pd.concat([ButtonPress, x.iloc[18:35]])
-        ResponseTime = pd.concat([ResponseTime, x.iloc[35:52]])
-
-    ## Create dataframe with each row being a trial
-    # Issues with duplicate labels so have to change series to np array
-    ContLevel = ContLevel.to_numpy()
-    ButtonPress = ButtonPress.to_numpy()
-    ResponseTime = ResponseTime.to_numpy()
-
-
-    # Create 1d Numpy array of participant intials
-    PartInits = np.full(len(ContLevel), PartInitials)
-
-    # Recombine data into tidy format
-    tidyData = pd.DataFrame({"ParticipantID" : PartInits,
-                             "ContrastLevel" : ContLevel,
-                             "Direction" : ButtonPress, 
-                             "ResponseTime" : ResponseTime});
-    return tidyData 
+    return TidyOutput.outputPath(FileName, ExperimentName, PartInitials, Format, OutputRoot)
 
 def SaveOutCSV(Data, FileName):
     """
@@ -106,7 +116,7 @@ def SaveOutCSV(Data, FileName):
                 
     Parameters
     ----------
-    Data : Pandas Dataframe
+    Data : Pandas Dataframe or Series
         Any dimentions.
     FileName : String
         Name that the file will be saved as. Can also include path.
@@ -116,33 +126,200 @@ def SaveOutCSV(Data, FileName):
     None.
     
     """
-    OutputFormat = ".csv"
-    FileName = FileName.split(".")
-    FileName = FileName[0] + OutputFormat
-    Data.to_csv(FileName, index=False)
-
-# Create list of all file names
-AllFileNames =  []
-for File in glob.glob(SearchTxt):
-    AllFileNames.append(File)
-
-# load in, tidy up, and output datafile
-for CurFile in AllFileNames:
-    CSVCheck = CurFile.split(".")
-    if CSVCheck[1] == "csv":
-        pass
-    else:
-        if ExperimentName != "RT":
-            SepSeries = loadExcelData(CurFile, ExperimentName)
-    #if ExperimentName == "RT":
-    #    SaveOutCSV(SaveOutCSV, CurFile)
-    # else:
-            TidySeries = tidyUpSeries(SepSeries, PartInitials)
-            TidySeries['Direction'] = TidySeries['Direction'].map(lambda x: x.lstrip("['").rstrip("']"))
-            SaveOutCSV(TidySeries, CurFile)
-        else:
-            SepSeries = loadExcelData(CurFile, ExperimentName)
-            SepSeries = SepSeries[0]
-            SepSeries.to_csv(CurFile, index=False)
+    TidyOutput.saveOut(Data, outputName(FileName), "csv")
+
+def findFiles(DataRoots, Experiments, Participants):
+    """
+    findFiles - finds every trial handeler workbook matching
+                ExperimentName_PartInitials* in each of the data roots
+
+    Parameters
+    ----------
+    DataRoots : List of strings
+        Folders to search.
+    Experiments : List of strings
+        Layout names (e.g. TW, RT, HF, see TrialLayouts.py).
+    Participants : List of strings
+        Participant initials, "*" matches everyone.
+
+    Returns
+    -------
+    Jobs : List of (filename, experiment initials, participant initials)
     
+    """
+    return list(TidyPipeline.discover(DataRoots, Experiments, Participants))
+
+def convertFile(CurFile, ExperimentName, PartInitials, Format="csv", OutputRoot=None, Layout=None,
+                KeepData=False):
+    """
+    convertFile - load in, tidy up, and output 1 datafile, running the
+                  TidyPipeline steps one after the other. Returns the file
+                  name, how long it took (s) and (if KeepData) the tidy data.
+                  The layout dict can be passed in for layouts loaded from json.
+    """
+    Job = (CurFile, ExperimentName, PartInitials)
+    Session = TidyPipeline.newSession(Job, Format, OutputRoot)
+    Session["Layout"] = TrialLayouts.getLayout(Layout or ExperimentName)
+    Session["Data"], Session["Time"] = TidyPipeline.readWorkbook(CurFile, Session["Layout"])
+    for Step in (TidyPipeline.reshapeStep, TidyPipeline.cleanStep, TidyPipeline.writeStep):
+        TidyPipeline.runStep(Session, Step)
+        if Session["Error"] is not None:
+            raise RuntimeError(f"{CurFile}: {Session['Error']}")
+    return CurFile, Session["Time"], Session["Tidy"] if KeepData else None
+
+def convertAll(Jobs, Workers=None, Format="csv", OutputRoot=None, Store=None, Replace=False,
+               Threads=False, QueueSize=4):
+    """
+    convertAll - runs the jobs through the conversion pipeline (see
+                 TidyPipeline.py) and prints progress and a timing summary as
+                 files finish. Only a few sessions are held in memory at once.
+
+    Parameters
+    ----------
+    Jobs : Iterable of (filename, experiment initials, participant initials)
+        As returned by findFiles (or a generator of them).
+    Workers : Int or None
+        Number of workbooks read at once, None uses every core.
+    Format : String
+        Output backend, one of csv, parquet, feather.
+    OutputRoot : String or None
+        Where to write the output (see TidyOutput.outputPath).
+    Store : sqlite3 Connection or None
+        Session store to add each converted session to (see SessionStore.py).
+    Replace : Bool
+        Replace sessions that are already in the store.
+    Threads : Bool
+        Read in threads instead of worker processes (better when the data is
+        on a slow network drive rather than the reads being CPU bound).
+    QueueSize : Int
+        Read sessions allowed to wait for the tidy/write stages.
+
+    Returns
+    -------
+    Converted : List of jobs that were converted
+    Failed : List of (filename, error message)
+    
+    """
+    Converted = []
+    Failed = []
+    FileTimes = []
+    Total = f"/{len(Jobs)}" if hasattr(Jobs, "__len__") else ""
+    Start = time.perf_counter()
+    Sessions = TidyPipeline.convert(Jobs, Workers, Threads, Format, OutputRoot, Store, Replace,
+                                    QueueSize)
+    for Done, Session in enumerate(Sessions, start=1):
+        CurFile = Session["File"]
+        if Session["Error"] is not None:
+            Failed.append((CurFile, Session["Error"]))
+            print(f"[{Done}{Total}] FAILED {CurFile}: {Session['Error']}")
+            continue
+        Converted.append(Session["Job"])
+        FileTimes.append(Session["Time"])
+        print(f"[{Done}{Total}] {CurFile} ({Session['Time']:.2f}s)")
+
+    WallTime = time.perf_counter() - Start
+    print("\nSummary")
+    print("-------")
+    print(f"Converted: {len(FileTimes)}  Failed: {len(Failed)}")
+    if FileTimes:
+        print(f"Per file (s): mean {np.mean(FileTimes):.2f}  max {np.max(FileTimes):.2f}"
+              f"  total {np.sum(FileTimes):.2f}")
+    print(f"Wall time (s): {WallTime:.2f}")
+    return Converted, Failed
+
+def skipUnchanged(Jobs, Force=False, Format="csv", OutputRoot=None):
+    """
+    skipUnchanged - drops jobs whose workbook hasn't changed since it was 
+                    last converted (checked against the manifest kept in each
+                    data folder, see TidyManifest.py)
+
+    Parameters
+    ----------
+    Jobs : List of (filename, experiment initials, participant initials)
+        As returned by findFiles.
+    Force : Bool
+        Keep every job (but still load the manifests so they get updated).
+    Format, OutputRoot :
+        Output settings, as for convertAll.
+
+    Returns
+    -------
+    ToConvert : List of jobs that need converting
+    Manifests : Dict of {data folder: manifest}
+    
+    """
+    Manifests = {}
+    ToConvert = list(TidyPipeline.changedOnly(Jobs, Manifests, Force, Format, OutputRoot))
+    return ToConvert, Manifests
+
+def updateManifests(Manifests, Converted, Format="csv", OutputRoot=None):
+    """
+    updateManifests - records the converted jobs and saves each manifest
+    """
+    for Job in Converted:
+        Manifest = Manifests[os.path.dirname(Job[0])]
+        TidyManifest.recordConversion(Manifest, Job[0], outputName(*Job, Format, OutputRoot))
+    for DataLocation, Manifest in Manifests.items():
+        TidyManifest.saveManifest(DataLocation, Manifest)
+
+def parseArgs(Args=None):
+    Parser = argparse.ArgumentParser(
+        description="Convert trial handeler workbooks into tidy csv files.")
+    Parser.add_argument("-p", "--participants", nargs="+", default=["*"],
+                        help="participant initials (default: everyone)")
+    Parser.add_argument("-e", "--experiments", nargs="+", required=True,
+                        help="experiment layouts, e.g. TW RT (see TrialLayouts.py)")
+    Parser.add_argument("--layouts", default=None,
+                        help="json file of extra experiment layouts")
+    Parser.add_argument("-d", "--data-roots", nargs="+", required=True,
+                        help="folders that contain the data")
+    Parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of workbooks read at once (default: all cores)")
+    Parser.add_argument("--threads", action="store_true",
+                        help="read in threads rather than processes (e.g. for network drives)")
+    Parser.add_argument("--queue-size", type=int, default=4,
+                        help="read sessions allowed to wait for tidying/writing (default: 4)")
+    Parser.add_argument("-f", "--format", choices=sorted(TidyOutput.Extensions), default="csv",
+                        help="output backend (parquet/feather need pyarrow)")
+    Parser.add_argument("-o", "--output-root", default=None,
+                        help="where to write the output (default: next to the data, "
+                             "or a tidy/ folder in it for parquet/feather)")
+    Parser.add_argument("-s", "--store", default=None,
+                        help="also add the sessions to this sqlite session store")
+    Parser.add_argument("--force", action="store_true",
+                        help="convert every file, even ones the manifest says are unchanged")
+    Parser.add_argument("--backed-up", action="store_true",
+                        help="confirm the data is backed up elsewhere")
+    return Parser.parse_args(Args)
+
+# %%
+if __name__ == "__main__":
+    Args = parseArgs()
+
+    if not Args.backed_up:
+        sys.exit("Then back it up! (re-run with --backed-up once it is)")
+
+    if Args.format != "csv":
+        try:
+            import pyarrow
+        except ImportError:
+            sys.exit("pyarrow is needed for " + Args.format + " output (conda install pyarrow)")
+
+    if Args.layouts:
+        TrialLayouts.loadLayouts(Args.layouts)
 
+    # Files are found and checked against the manifests as the pipeline runs
+    Manifests = {}
+    Counts = {}
+    Jobs = TidyPipeline.discover(Args.data_roots, Args.experiments, Args.participants)
+    ToConvert = TidyPipeline.changedOnly(Jobs, Manifests, Args.force, Args.format,
+                                         Args.output_root, Counts)
+    Store = SessionStore.connect(Args.store) if Args.store else None
+    # Anything being converted again has changed, so its stored session is replaced
+    Converted, Failed = convertAll(ToConvert, Args.workers, Args.format, Args.output_root,
+                                   Store, Replace=True, Threads=Args.threads,
+                                   QueueSize=Args.queue_size)
+    print(f"Found {Counts.get('Found', 0)} files, {Counts.get('Unchanged', 0)} unchanged")
+    updateManifests(Manifests, Converted, Args.format, Args.output_root)
+    if Failed:
+        sys.exit(1)
@@ -0,0 +1,164 @@
+# Outlier Rejection
+#
+# Rejects outlying response times within each group (condition, or
+# participant x condition) of the tidy data. The limits of every group are
+# worked out with groupby(...).transform, so each trial gets its own group's
+# limits in one pass over the data however many groups there are, and
+# nothing is compared against another group's mean/SD.
+#
+# Rules (Threshold in brackets)-
+#   "sd"         : mean +/- Threshold SDs (2)
+#   "mad"        : median +/- Threshold scaled MADs (3), MAD x 1.4826 so it
+#                  matches the SD for normal data but isn't pulled by the
+#                  outliers themselves
+#   "percentile" : outside the (Lower, Upper) quantiles ((0.025, 0.975))
+# The "sd" rule is one hashed groupby pass (O(n)), the median/quantile rules
+# have to order the values within each group.
+#
+# Rejected trials keep their row- only the response time is set to NaN. The
+# Outlier column flags them and OutlierReason says which limit they broke
+# (e.g. "above mean + 2 SD"). Running reject again with another rule adds to
+# these, trials already rejected keep their first reason.
+#
+# From an analysis script-
+#   AllData = OutlierRejection.reject(AllData, ["ParticipantID", "ContrastLevel"], "sd", 2,
+#                                     Reference=AllData["Direction"] == "right")
+#   print(AllData[AllData["Outlier"]])
+
+import numpy as np
+import pandas as pd
+
+Rules = ("sd", "mad", "percentile")
+DefaultThresholds = {"sd": 2, "mad": 3, "percentile": (0.025, 0.975)}
+MADScale = 1.4826
+
+def groupLimits(Values, Keys, Rule="sd", Threshold=None):
+    """
+    groupLimits - lower and upper limit of each trial's group
+
+    Parameters
+    ----------
+    Values : Pandas Series
+        Values the limits are worked out from, NaN for trials that shouldn't
+        count (e.g. wrong key presses).
+    Keys : List of Pandas Series
+        Group of each trial.
+    Rule : String
+        "sd", "mad" or "percentile".
+    Threshold : Number, (Number, Number) or None
+        See the rules above, None uses the default.
+
+    Returns
+    -------
+    Lower, Upper : Numpy arrays
+        NaN where the group has no values.
+    Labels : (String, String)
+        Names of the lower and upper limits, for the rejection reasons.
+
+    """
+    if Rule not in Rules:
+        raise ValueError(f"Unknown outlier rule {Rule}, use one of {Rules}")
+    if Threshold is None:
+        Threshold = DefaultThresholds[Rule]
+    Groups = Values.groupby(Keys, observed=True, sort=False)
+
+    if Rule == "percentile":
+        Low, High = Threshold
+        Lower = Groups.transform("quantile", Low).to_numpy(dtype=float)
+        Upper = Groups.transform("quantile", High).to_numpy(dtype=float)
+        return Lower, Upper, (f"percentile {Low * 100:g}", f"percentile {High * 100:g}")
+
+    if Rule == "sd":
+        Centre = Groups.transform("mean")
+        Spread = Groups.transform("std") * Threshold
+        Labels = (f"mean - {Threshold:g} SD", f"mean + {Threshold:g} SD")
+    else:
+        Centre = Groups.transform("median")
+        Deviation = (Values - Centre).abs()
+        Spread = Deviation.groupby(Keys, observed=True, sort=False).transform("median") * MADScale * Threshold
+        Labels = (f"median - {Threshold:g} MAD", f"median + {Threshold:g} MAD")
+    Centre = Centre.to_numpy(dtype=float)
+    Spread = Spread.to_numpy(dtype=float)
+    return Centre - Spread, Centre + Spread, Labels
+
+def reject(Data, By, Rule="sd", Threshold=None, Column="ResponseTime", Tail="upper", Reference=None):
+    """
+    reject - rejects the outliers of each group (in place, the frame is also
+             returned)
+
+    Parameters
+    ----------
+    Data : Pandas Dataframe
+        Tidy data.
+    By : String or list of strings
+        Columns that make the groups, e.g. ["ParticipantID", "ContrastLevel"].
+    Rule : String
+        "sd", "mad" or "percentile".
+    Threshold : Number, (Number, Number) or None
+        See the rules above, None uses the default.
+    Column : String
+        Column to check, rejected trials are set to NaN in it.
+    Tail : String
+        "upper" only rejects slow trials (as the analysis scripts always
+        have), "lower" only fast ones, "both" either.
+    Reference : Boolean array like or None
+        Trials the limits are worked out from (e.g. only the "right" key
+        presses), every trial is checked against them. None uses them all.
+
+    Returns
+    -------
+    Data : Pandas Dataframe
+        With Outlier (bool) and OutlierReason (category, NaN if kept) columns.
+
+    """
+    if isinstance(By, str):
+        By = [By]
+    if Tail not in ("upper", "lower", "both"):
+        raise ValueError(f"Tail has to be upper, lower or both, not {Tail}")
+    Values = Data[Column].astype(float)
+    Basis = Values if Reference is None else Values.where(np.asarray(Reference, dtype=bool))
+    Lower, Upper, Labels = groupLimits(Basis, [Data[x] for x in By], Rule, Threshold)
+
+    Values = Values.to_numpy()
+    Low = (Values < Lower) if Tail in ("lower", "both") else np.zeros(len(Values), dtype=bool)
+    High = (Values > Upper) if Tail in ("upper", "both") else np.zeros(len(Values), dtype=bool)
+    # 0 = kept, 1 = below, 2 = above
+    Codes = np.where(High, 2, np.where(Low, 1, 0)).astype(np.int8)
+
+    Reasons = ["below " + Labels[0], "above " + Labels[1]]
+    New = pd.Categorical.from_codes(Codes - 1, Reasons)
+    if "Outlier" in Data:
+        Previous = Data["Outlier"].to_numpy(dtype=bool)
+        Old = Data["OutlierReason"].astype("category")
+        Categories = list(Old.cat.categories) + [x for x in Reasons if x not in Old.cat.categories]
+        Old = Old.cat.set_categories(Categories)
+        New = Old.where(Previous, pd.Categorical(New, categories=Categories))
+        Codes = np.where(Previous, 0, Codes)  # already NaN
+    Data["OutlierReason"] = New
+    Data["Outlier"] = Data["OutlierReason"].notna().to_numpy()
+    Data.loc[Codes > 0, Column] = np.nan
+    return Data
+
+def summary(Data, By):
+    """
+    summary - number of trials rejected for each reason in each group
+
+    Parameters
+    ----------
+    Data : Pandas Dataframe
+        After reject.
+    By : String or list of strings
+        Columns to count within.
+
+    Returns
+    -------
+    Pandas Dataframe
+        One row per group, Trials, Rejected and one column per reason.
+
+    """
+    if isinstance(By, str):
+        By = [By]
+    Groups = Data.groupby(By, observed=True)
+    Table = pd.DataFrame({"Trials": Groups.size(), "Rejected": Groups["Outlier"].sum()})
+    Reasons = pd.crosstab([Data[x] for x in By], Data["OutlierReason"])
+    return Table.join(Reasons).fillna(0).astype(int)
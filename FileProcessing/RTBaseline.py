@@ -0,0 +1,269 @@
+# RT Baseline
+#
+# Each participant's simple reaction time baseline (mean, SEM, SD and N of
+# all their RT sessions, and of each day's RT sessions on their own), which
+# the analysis scripts subtract from the response times
+# (see BaselineCorrection.py). Working it out means reading every RT file, so it is done
+# once and kept in a small json cache in the data folder (.rt_baseline.json).
+#
+# Each cache entry records the RT files it was worked out from (size, mtime
+# and sha256 of each, as TidyManifest does) and a key made from the file
+# names and hashes. The entry is only used while the RT files there now give
+# the same key, so a new/removed/edited RT session recomputes it. Checking is
+# just an os.stat per file- files are only hashed again if their mtime has
+# moved.
+#
+# From an analysis script-
+#   Baseline = RTBaseline.rtBaseline(DataLocation, PartInitials)
+#   RTMean, RTSE = Baseline["Mean"], Baseline["SEM"]
+#   Baselines = RTBaseline.baselineTable(DataLocation, [PartInitials])
+#   Baselines = RTBaseline.sessionTable(DataLocation, [PartInitials])  # per day
+
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+import LoadSessions
+import TidyManifest
+
+CacheName = ".rt_baseline.json"
+CacheVersion = 3
+Stats = ["Mean", "SEM", "SD", "N"]
+
+def fileEntry(FileName):
+    Stat = os.stat(FileName)
+    return {"size": Stat.st_size, "mtime_ns": Stat.st_mtime_ns, "sha256": TidyManifest.fileHash(FileName)}
+
+def filesKey(Entries):
+    """
+    filesKey - one hash for a set of files (their names and sha256s)
+    """
+    Hash = hashlib.sha256()
+    for Name in sorted(Entries):
+        Hash.update(f"{Name}:{Entries[Name]['sha256']}\n".encode())
+    return Hash.hexdigest()
+
+def loadCache(DataLocation):
+    """
+    loadCache - the baseline cache for a data folder, an empty one if it is
+                missing, unreadable or from an older version
+    """
+    try:
+        with open(os.path.join(DataLocation, CacheName)) as File:
+            Cache = json.load(File)
+    except (OSError, ValueError):
+        return {"version": CacheVersion, "baselines": {}}
+    if Cache.get("version") != CacheVersion:
+        return {"version": CacheVersion, "baselines": {}}
+    return Cache
+
+def saveCache(DataLocation, Cache):
+    """
+    saveCache - writes the cache via a temp file (see TidyManifest.saveManifest)
+    """
+    CachePath = os.path.join(DataLocation, CacheName)
+    TmpPath = CachePath + ".tmp"
+    with open(TmpPath, "w") as File:
+        json.dump(Cache, File, indent=1, sort_keys=True)
+    os.replace(TmpPath, CachePath)
+
+def isCurrent(Entry, Files):
+    """
+    isCurrent - checks a cache entry against the RT files there are now
+
+    Parameters
+    ----------
+    Entry : Dict or None
+        Cache entry.
+    Files : List of strings
+        The participant's RT files.
+
+    Returns
+    -------
+    Bool
+        False if a file has been added, removed or changed since the entry
+        was made. Files that were only touched get their new mtime recorded.
+
+    """
+    if Entry is None:
+        return False
+    Current, Touched = {}, {}
+    for FileName in Files:
+        Name = os.path.basename(FileName)
+        Recorded = Entry["files"].get(Name)
+        Stat = os.stat(FileName)
+        if Recorded is None or Stat.st_size != Recorded["size"]:
+            return False
+        if Stat.st_mtime_ns == Recorded["mtime_ns"]:
+            Current[Name] = Recorded
+        else:
+            Current[Name] = {"sha256": TidyManifest.fileHash(FileName)}
+            Touched[Name] = Stat.st_mtime_ns
+    # Same names and hashes (so no file added, removed or edited) gives the same key
+    if filesKey(Current) != Entry["key"]:
+        return False
+    for Name, Mtime in Touched.items():
+        Entry["files"][Name]["mtime_ns"] = Mtime
+    return True
+
+def describe(Times):
+    """
+    describe - mean, SEM, SD (ddof 1, as scipy.stats.sem) and N of the
+               reaction times, missing values are left out
+    """
+    Times = np.asarray(Times, dtype=float)
+    Times = Times[~np.isnan(Times)]
+    N = len(Times)
+    SD = float(np.std(Times, ddof=1)) if N > 1 else np.nan
+    return {"Mean": float(np.mean(Times)) if N else np.nan,
+            "SEM": float(SD / np.sqrt(N)) if N > 1 else np.nan,
+            "SD": SD,
+            "N": N}
+
+def describeGroups(Data, By, Column="ResponseTime"):
+    """
+    describeGroups - describe for every group at once (one groupby)
+
+    Parameters
+    ----------
+    Data : Pandas Dataframe
+        Tidy data.
+    By : String or list of strings
+        Columns to group by.
+    Column : String
+        Column to describe.
+
+    Returns
+    -------
+    Pandas Dataframe
+        One row per group, columns Mean, SEM, SD and N.
+
+    """
+    Table = Data.groupby(By, observed=True)[Column].agg(["mean", "std", "count"])
+    Table.columns = ["Mean", "SD", "N"]
+    Table["SEM"] = Table["SD"] / np.sqrt(Table["N"])
+    return Table[Stats]
+
+def sessionDates(Sessions):
+    """
+    sessionDates - DDMMYY part of session names (TW_RH_060824_1536 and
+                   RT_RH_1_070824_1630 -> 060824 and 070824), so sessions can
+                   be matched to the RT sessions of the same day. Only the
+                   distinct names are parsed.
+
+    Raises
+    ------
+    ValueError
+        If a session name doesn't end in _DDMMYY_HHMM.
+    """
+    Sessions = pd.Categorical(Sessions)
+    Dates = pd.Index(Sessions.categories).str.extract(r"_(\d{6})_\d{4}$", expand=False)
+    if Dates.isna().any():
+        raise ValueError(f"No _DDMMYY_HHMM date in session names {list(Sessions.categories[Dates.isna()])}")
+    Codes, Uniques = pd.factorize(Dates)
+    Codes = np.where(Sessions.codes >= 0, Codes[Sessions.codes], -1)
+    return pd.Categorical.from_codes(Codes, Uniques)
+
+def rtBaseline(DataLocation, PartInitials, Source="csv", Refresh=False):
+    """
+    rtBaseline - a participant's reaction time baseline, from the cache when
+                 their RT files haven't changed
+
+    Parameters
+    ----------
+    DataLocation : String
+        Folder that holds the RT files (the cache is kept here too).
+    PartInitials : String
+        Participant initials.
+    Source : String
+        "csv" for tidy csv files, "xlsx" for trial handeler workbooks.
+    Refresh : Bool
+        Recompute even if the cache is current.
+
+    Returns
+    -------
+    Baseline : Dict
+        Mean, SEM, SD, N, Files (the number of RT sessions) and Dates (the
+        same stats for each day's RT sessions, {DDMMYY: {Mean, ...}}).
+
+    """
+    Files = LoadSessions.sessionFiles(DataLocation, "RT", PartInitials, Source)
+    Cache = loadCache(DataLocation)
+    Name = f"{PartInitials}_{Source}"
+    Entry = Cache["baselines"].get(Name)
+    if not Refresh and Entry is not None:
+        Mtimes = [x["mtime_ns"] for x in Entry["files"].values()]
+        if isCurrent(Entry, Files):
+            if Mtimes != [x["mtime_ns"] for x in Entry["files"].values()]:
+                saveCache(DataLocation, Cache)  # only touched, keep the new mtimes
+            return dict(Entry["baseline"])
+
+    RTAll = LoadSessions.loadSessions(DataLocation, "RT", Columns=["ResponseTime"], Source=Source,
+                                      Files=Files)
+    Baseline = describe(RTAll["ResponseTime"])
+    Baseline["Files"] = len(Files)
+    RTAll["Date"] = sessionDates(RTAll["Session"])
+    Baseline["Dates"] = describeGroups(RTAll, "Date").astype(object).to_dict(orient="index")
+    Entries = {os.path.basename(x): fileEntry(x) for x in Files}
+    Cache["baselines"][Name] = {"files": Entries, "key": filesKey(Entries), "baseline": Baseline}
+    saveCache(DataLocation, Cache)
+    return dict(Baseline)
+
+def rtParticipants(DataLocation, Source="csv"):
+    """
+    rtParticipants - initials of everyone with RT files in DataLocation
+    """
+    Files = LoadSessions.sessionFiles(DataLocation, "RT", Source=Source)
+    return sorted({os.path.basename(x).split("_")[1] for x in Files})
+
+def baselineTable(DataLocation, Participants=None, Source="csv", Refresh=False):
+    """
+    baselineTable - rtBaseline for several participants as a dataframe
+
+    Parameters
+    ----------
+    DataLocation : String
+        Folder that holds the RT files.
+    Participants : List of strings or None
+        Participant initials, None = everyone with RT files.
+    Source, Refresh :
+        See rtBaseline.
+
+    Returns
+    -------
+    Pandas Dataframe
+        One row per participant (index ParticipantID), columns Mean, SEM,
+        SD, N and Files.
+
+    """
+    if Participants is None:
+        Participants = rtParticipants(DataLocation, Source)
+    Baselines = {x: rtBaseline(DataLocation, x, Source, Refresh) for x in Participants}
+    Table = pd.DataFrame.from_dict(Baselines, orient="index", columns=Stats + ["Files"])
+    return Table.rename_axis("ParticipantID")
+
+def sessionTable(DataLocation, Participants=None, Source="csv", Refresh=False):
+    """
+    sessionTable - each day's reaction time baseline, for matching sessions
+                   to the RT sessions ran the same day
+
+    Parameters
+    ----------
+    See baselineTable.
+
+    Returns
+    -------
+    Pandas Dataframe
+        One row per participant and day (index ParticipantID, Date), columns
+        Mean, SEM, SD and N.
+
+    """
+    if Participants is None:
+        Participants = rtParticipants(DataLocation, Source)
+    Rows = {(x, Date): Day for x in Participants
+            for Date, Day in rtBaseline(DataLocation, x, Source, Refresh)["Dates"].items()}
+    Table = pd.DataFrame.from_dict(Rows, orient="index", columns=Stats)
+    Table.index = pd.MultiIndex.from_tuples(Table.index, names=["ParticipantID", "Date"])
+    return Table
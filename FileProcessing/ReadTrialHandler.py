@@ -0,0 +1,123 @@
+# Read Trial Handler
+#
+# Streaming reader for the psychopy trial handeler excel exports. Opens the
+# workbook in openpyxl's read-only mode and pulls only the cells the tidy step
+# uses straight into a numpy array, without building a dataframe or a series
+# per row like loadExcelData does.
+#
+# The *_raw blocks are found from the header row- each one runs from its
+# "<Name>_raw" heading up to the next named heading, so a TW export gives
+# n, ContrastLevel_raw (17), KeyPressed_raw (17), TravelTime_raw (17) and a
+# RT export gives n, RT_raw (30). readLayout reads just the blocks named in a
+# layout (see TrialLayouts.py).
+
+import numpy as np
+
+import TrialLayouts
+
+def rawColumns(Header):
+    """
+    rawColumns - column positions of n and every *_raw block in a header row
+
+    Parameters
+    ----------
+    Header : Tuple
+        First row of the sheet, unnamed cells are None.
+
+    Returns
+    -------
+    Columns : List of ints
+        n first, then each raw block's columns in sheet order.
+    Blocks : List of (name, width)
+
+    """
+    Columns = [Header.index("n")]
+    Blocks = []
+    for Name, (Start, Stop) in TrialLayouts.rawBlocks(Header).items():
+        Columns.extend(range(Start, Stop))
+        Blocks.append((Name, Stop - Start))
+    return Columns, Blocks
+
+def readColumns(FileName, ColumnsFor, SheetName=None):
+    """
+    readColumns - streams the chosen columns of a sheet into a numpy array
+
+    Parameters
+    ----------
+    FileName : String
+        Trial handeler .xlsx export.
+    ColumnsFor : Function
+        Given the header row, returns (columns to read, extra info).
+    SheetName : String or None
+        Sheet to read, None reads the first sheet (same as pd.read_excel).
+
+    Returns
+    -------
+    Data : 2d numpy array (object dtype), columns in the order asked for
+    Info : Whatever ColumnsFor returned alongside the columns
+
+    """
+    # Imported here so loading tidy csv files (LoadSessions) never pays for it
+    import openpyxl
+    Workbook = openpyxl.load_workbook(FileName, read_only=True, data_only=True)
+    try:
+        Sheet = Workbook[SheetName] if SheetName else Workbook.worksheets[0]
+        Header = next(Sheet.iter_rows(max_row=1, values_only=True), None)
+        if Header is None:
+            raise ValueError(f"{FileName} has an empty sheet")
+        Columns, Info = ColumnsFor(Header)
+        Columns = np.asarray(Columns, dtype=int)
+        # Only stream as far right as the last column we need
+        LastCol = int(Columns.max()) + 1
+        Values = [Row for Row in Sheet.iter_rows(min_row=2, max_col=LastCol, values_only=True)
+                  if any(x is not None for x in Row)]
+    finally:
+        Workbook.close()
+
+    Data = np.empty((len(Values), LastCol), dtype=object)
+    for x, Row in enumerate(Values):
+        Data[x, :len(Row)] = Row
+    return Data[:, Columns], Info
+
+def readTrialHandler(FileName, SheetName=None):
+    """
+    readTrialHandler - load n and all the raw trial blocks of 1 excel file
+
+    Returns
+    -------
+    Block : 2d numpy array (object dtype)
+        One row per trial handeler row, columns = n then the raw blocks. The
+        same layout as stacking loadExcelData's rows, so it can go straight
+        into tidyUpSeries.
+    Blocks : List of (name, width)
+        Which raw blocks are in Block, in order.
+
+    """
+    return readColumns(FileName, rawColumns, SheetName)
+
+def readLayout(FileName, Layout, SheetName=None):
+    """
+    readLayout - load just the blocks a layout uses (see TrialLayouts.py)
+
+    Parameters
+    ----------
+    FileName : String
+        Trial handeler .xlsx export.
+    Layout : String or Dict
+        Layout name or layout dict.
+    SheetName : String or None
+        Sheet to read.
+
+    Returns
+    -------
+    Data : 2d numpy array (object dtype)
+        Columns = the layout's blocks one after the other, ready for
+        TrialLayouts.tidyFrame.
+    Plan : Dict
+        The compiled plan (see TrialLayouts.compilePlan).
+
+    """
+    def planColumns(Header):
+        Plan = TrialLayouts.compilePlan(Layout, Header)
+        return Plan["SheetColumns"], Plan
+    return readColumns(FileName, planColumns, SheetName)
@@ -0,0 +1,289 @@
+# Resampling
+#
+# Bootstrap confidence intervals and permutation tests for the response time
+# and trigger rate effects, as the response times are skewed and there are
+# only tens of trials per condition, so the t-tests' assumptions are shaky.
+#
+# All the replicates of a group are drawn at once as one index matrix
+# (replicates x trials) from a seeded numpy Generator, and the statistic is
+# worked out along its rows, so Python only loops over the groups (and pairs
+# of conditions), never over replicates. Values are sorted once per group and
+# the indices point into the sorted values, so a replicate's median is just
+# the middle index of its row (np.partition on small ints, rather than
+# gathering and partitioning floats). Proportions (e.g. trigger rates) are
+# binomial draws, which is what resampling 0/1 trials gives, and their
+# permutations hypergeometric draws.
+#
+# Stats- "mean", "median" and "proportion" (of True, e.g. Direction ==
+# "right").
+#
+# Chunk caps the replicates drawn at once (default enough for about 4 million
+# indices), so memory stays bounded however many replicates are asked for.
+# The same data, seed and chunk size always give the same result.
+#
+# From an analysis script-
+#   Intervals = Resampling.bootstrap(AllCorrect, ["ParticipantID", "ContrastLevel"], Reps=10000)
+#   Effects = Resampling.contrasts(AllCorrect, "ContrastLevel", Stat="median", Reps=10000)
+
+import numpy as np
+import pandas as pd
+
+Stats = ("mean", "median", "proportion")
+MaxIndices = 2 ** 22
+
+def indexType(NumTrials):
+    """
+    indexType - smallest int type that can index NumTrials values
+    """
+    return np.int16 if NumTrials <= np.iinfo(np.int16).max else np.intp
+
+def chunks(Reps, NumTrials, Chunk=None):
+    """
+    chunks - number of replicates to draw at a time, up to Reps in total
+    """
+    Chunk = Chunk or max(1, MaxIndices // max(NumTrials, 1))
+    Done = 0
+    while Done < Reps:
+        yield min(Chunk, Reps - Done)
+        Done += Chunk
+
+def rowStat(Index, Sorted, Stat):
+    """
+    rowStat - the statistic of each row of an index matrix
+
+    Parameters
+    ----------
+    Index : 2d numpy array of ints
+        Replicates x trials, indices into Sorted.
+    Sorted : Numpy array
+        The group's values, sorted.
+    Stat : String
+        "mean", "median" or "proportion".
+
+    Returns
+    -------
+    Numpy array, one value per row
+
+    """
+    if Stat != "median":
+        return Sorted[Index].mean(axis=1)
+    # Sorted values, so the median value is at the median index
+    High = Index.shape[1] // 2
+    Index = np.partition(Index, High, axis=1)
+    Upper = Sorted[Index[:, High]]
+    if Index.shape[1] % 2:
+        return Upper
+    return (Sorted[Index[:, :High].max(axis=1)] + Upper) / 2
+
+def statistic(Values, Stat):
+    """
+    statistic - the statistic of the observed values
+    """
+    if Stat not in Stats:
+        raise ValueError(f"Unknown statistic {Stat}, use one of {Stats}")
+    return float(np.median(Values)) if Stat == "median" else float(np.mean(Values))
+
+def replicates(Values, Stat, Reps, Rng, Chunk=None):
+    """
+    replicates - bootstrap replicates of a group's statistic
+
+    Parameters
+    ----------
+    Values : Numpy array
+        The group's values (no NaN), bools for "proportion".
+    Stat : String
+        "mean", "median" or "proportion".
+    Reps : Int
+        Number of replicates.
+    Rng : Numpy Generator
+    Chunk : Int or None
+        Replicates drawn at once.
+
+    Returns
+    -------
+    Numpy array of Reps values
+
+    """
+    statistic(Values, Stat)
+    NumTrials = len(Values)
+    if not NumTrials:
+        return np.full(Reps, np.nan)
+    if Stat == "proportion":
+        return Rng.binomial(NumTrials, np.mean(Values), Reps) / NumTrials
+    Sorted = np.sort(np.asarray(Values, dtype=float))
+    return np.concatenate([rowStat(Rng.integers(0, NumTrials, (x, NumTrials), dtype=indexType(NumTrials)),
+                                   Sorted, Stat) for x in chunks(Reps, NumTrials, Chunk)])
+
+def permutationNull(ValuesA, ValuesB, Stat, Reps, Rng, Chunk=None):
+    """
+    permutationNull - difference of the statistic (A - B) with the two
+                      groups' trials shuffled between them
+
+    Returns
+    -------
+    Numpy array of Reps differences
+
+    """
+    Pooled = np.concatenate([np.asarray(ValuesA, dtype=float), np.asarray(ValuesB, dtype=float)])
+    Sorted = np.sort(Pooled)
+    NumA = len(ValuesA)
+    NumTrials = len(Pooled)
+    if Stat == "proportion":
+        # Shuffling 0/1 trials puts a hypergeometric number of 1s in group A
+        Total = int(Sorted.sum())
+        HitsA = Rng.hypergeometric(Total, NumTrials - Total, NumA, Reps)
+        return HitsA / NumA - (Total - HitsA) / (NumTrials - NumA)
+    Null = []
+    for Size in chunks(Reps, NumTrials, Chunk):
+        Index = np.tile(np.arange(NumTrials, dtype=indexType(NumTrials)), (Size, 1))
+        Rng.permuted(Index, axis=1, out=Index)
+        if Stat == "median":
+            Null.append(rowStat(Index[:, :NumA], Sorted, Stat) - rowStat(Index[:, NumA:], Sorted, Stat))
+        else:
+            # Group B's sum is what's left of the total
+            SumA = Sorted[Index[:, :NumA]].sum(axis=1)
+            Null.append(SumA / NumA - (Sorted.sum() - SumA) / (NumTrials - NumA))
+    return np.concatenate(Null)
+
+def interval(Replicates, Level):
+    """
+    interval - percentile interval of the replicates
+    """
+    Tail = (1 - Level) / 2
+    if np.isnan(Replicates).all():
+        return np.nan, np.nan
+    return tuple(np.nanquantile(Replicates, [Tail, 1 - Tail]))
+
+def prepareValues(Data, Column, Stat):
+    """
+    prepareValues - the column to resample (bools for "proportion") without
+                    its NaN rows, and which rows were kept
+
+    Raises
+    ------
+    ValueError
+        For "proportion" of a column that isn't bools or 0/1 (e.g. Direction,
+        compare it to "right" first).
+    """
+    Keep = Data[Column].notna().to_numpy()
+    Values = Data[Column][Keep]
+    if Stat != "proportion":
+        return Values.astype(float), Keep
+    if not pd.api.types.is_bool_dtype(Values):
+        if not pd.to_numeric(Values.astype(object), errors="coerce").isin([0, 1]).all():
+            raise ValueError(f"proportion needs {Column} to be bools or 0/1, e.g. Data[{Column!r}] == "
+                             f"\"right\"")
+    return Values.astype(bool), Keep
+
+def bootstrap(Data, By, Column="ResponseTime", Stats=("mean", "median"), Reps=10000, Seed=0, Level=0.95,
+              Chunk=None):
+    """
+    bootstrap - bootstrap SE and percentile interval of each group's
+                statistics
+
+    Parameters
+    ----------
+    Data : Pandas Dataframe
+        Tidy data, NaN values are left out.
+    By : String or list of strings
+        Columns that make the groups, e.g. ["ParticipantID", "ContrastLevel"].
+    Column : String
+        Column to resample (bools, or something that is True for a trigger,
+        for "proportion").
+    Stats : Iterable of strings
+        Some of "mean", "median" and "proportion".
+    Reps : Int
+        Replicates per group.
+    Seed : Int
+        Seed of the Generator.
+    Level : Float
+        Coverage of the interval.
+    Chunk : Int or None
+        Replicates drawn at once (None keeps it to about 4 million indices).
+
+    Returns
+    -------
+    Pandas Dataframe
+        Index By and Stat, columns N, Estimate, SE, Lower and Upper.
+
+    """
+    if isinstance(By, str):
+        By = [By]
+    Rng = np.random.default_rng(Seed)
+    Rows = []
+    for Stat in Stats:
+        Values, Keep = prepareValues(Data, Column, Stat)
+        for Key, Group in Values.groupby([Data[x][Keep] for x in By], observed=True):
+            Group = Group.to_numpy()
+            Boot = replicates(Group, Stat, Reps, Rng, Chunk)
+            Rows.append((*Key, Stat, len(Group), statistic(Group, Stat), np.nanstd(Boot, ddof=1),
+                         *interval(Boot, Level)))
+    Table = pd.DataFrame(Rows, columns=By + ["Stat", "N", "Estimate", "SE", "Lower", "Upper"])
+    return Table.set_index(By + ["Stat"])
+
+def contrasts(Data, Factor, By="ParticipantID", Column="ResponseTime", Stat="mean", Reps=10000, Seed=0,
+              Level=0.95, Permutation=True, Chunk=None):
+    """
+    contrasts - difference in a statistic between every pair of levels of a
+                factor within each family, with a bootstrap interval and a
+                permutation p value
+
+    Parameters
+    ----------
+    Data : Pandas Dataframe
+        Tidy data, NaN values are left out.
+    Factor : String
+        Column whose levels are compared, e.g. "ContrastLevel".
+    By : String, list of strings or None
+        Columns that make the families, None compares across all the data.
+    Column : String
+        Column to resample.
+    Stat : String
+        "mean", "median" or "proportion".
+    Reps : Int
+        Bootstrap replicates per level and permutations per pair.
+    Seed : Int
+        Seed of the Generator.
+    Level : Float
+        Coverage of the interval.
+    Permutation : Bool
+        Also run the permutation tests (P column).
+    Chunk : Int or None
+        Replicates drawn at once.
+
+    Returns
+    -------
+    Pandas Dataframe
+        Index By, A and B. Columns NA, NB, Difference (A - B), SE, Lower,
+        Upper and P (two sided, (1 + more extreme) / (1 + Reps)).
+
+    """
+    if By is None:
+        By = []
+    elif isinstance(By, str):
+        By = [By]
+    else:
+        By = list(By)
+    statistic(np.zeros(1), Stat)
+    Rng = np.random.default_rng(Seed)
+    Values, Keep = prepareValues(Data, Column, Stat)
+    Factors = Data[Factor][Keep]
+    Families = Values.groupby([Data[x][Keep] for x in By], observed=True) if By else [((), Values)]
+    Rows = []
+    for Family, FamilyValues in Families:
+        Levels = {x: y.to_numpy() for x, y in FamilyValues.groupby(Factors[FamilyValues.index], observed=True)}
+        # Each level's replicates are drawn once and used for all its pairs
+        Boot = {x: replicates(y, Stat, Reps, Rng, Chunk) for x, y in Levels.items()}
+        Names = list(Levels)
+        for Pos, A in enumerate(Names):
+            for B in Names[Pos + 1:]:
+                Observed = statistic(Levels[A], Stat) - statistic(Levels[B], Stat)
+                Difference = Boot[A] - Boot[B]
+                P = np.nan
+                if Permutation:
+                    Null = permutationNull(Levels[A], Levels[B], Stat, Reps, Rng, Chunk)
+                    P = (1 + np.count_nonzero(np.abs(Null) >= abs(Observed) - 1e-12)) / (1 + Reps)
+                Rows.append((*Family, A, B, len(Levels[A]), len(Levels[B]), Observed,
+                             np.nanstd(Difference, ddof=1), *interval(Difference, Level), P))
+    Table = pd.DataFrame(Rows, columns=By + ["A", "B", "NA", "NB", "Difference", "SE", "Lower", "Upper", "P"])
+    return Table.set_index(By + ["A", "B"])
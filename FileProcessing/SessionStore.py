@@ -0,0 +1,240 @@
+# Session Store
+#
+# One SQLite database for all the tidy trial data, so analysis scripts can
+# pull what they need with a single indexed query instead of globbing and
+# concatenating hundreds of per-session csv files.
+#
+# Tables-
+#   sessions : one row per session (experiment, participant, date, name)
+#   trials   : one row per trial, linked to its session
+#
+# Sessions are only ever appended. Adding a session that is already in the
+# store does nothing unless Replace=True (used by MakeTidy when a workbook
+# has changed and been converted again).
+#
+# Fed by MakeTidy.py --store and by the experiment scripts after they save
+# their csv. Can also be used from the command line-
+#   python SessionStore.py Sessions.sqlite HF ./Data/HF_*.csv
+
+import os
+import sys
+import json
+import sqlite3
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+import TrialLayouts
+import TidyCategories
+
+Schema = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id   INTEGER PRIMARY KEY,
+    experiment   TEXT NOT NULL,
+    participant  TEXT NOT NULL,
+    session_name TEXT NOT NULL,
+    date         TEXT,
+    source       TEXT,
+    n_trials     INTEGER,
+    added        TEXT,
+    UNIQUE (experiment, session_name)
+);
+CREATE TABLE IF NOT EXISTS trials (
+    session_id    INTEGER NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+    trial_number  INTEGER NOT NULL,
+    condition,
+    direction     TEXT,
+    response_time REAL,
+    extra         TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_experiment_participant ON sessions (experiment, participant);
+CREATE INDEX IF NOT EXISTS sessions_participant ON sessions (participant);
+CREATE INDEX IF NOT EXISTS sessions_date ON sessions (date);
+CREATE INDEX IF NOT EXISTS trials_session ON trials (session_id);
+CREATE INDEX IF NOT EXISTS trials_condition ON trials (condition);
+"""
+
+def connect(DbName):
+    """
+    connect - opens (and if needed creates) the session store
+    """
+    Db = sqlite3.connect(DbName)
+    Db.execute("PRAGMA foreign_keys = ON")
+    Db.execute("PRAGMA journal_mode = WAL")  # readers don't block the writer
+    Db.executescript(Schema)
+    return Db
+
+def sessionDate(SessionName):
+    """
+    sessionDate - the date/time in a session name (..._DDMMYY_HHMM) as
+                  "YYYY-MM-DD HH:MM", None if it doesn't have one
+    """
+    Parts = SessionName.split("_")
+    try:
+        return datetime.strptime("_".join(Parts[-2:]), "%d%m%y_%H%M").strftime("%Y-%m-%d %H:%M")
+    except ValueError:
+        return None
+
+def addSession(Db, Data, Experiment, SessionName, Source=None, Replace=False):
+    """
+    addSession - adds one session's tidy data to the store
+
+    Parameters
+    ----------
+    Db : sqlite3 Connection
+        From connect.
+    Data : Pandas Dataframe
+        Tidy data for 1 session (ParticipantID, the layout's condition
+        column, Direction, ResponseTime). Any other columns are kept as json
+        in the extra column.
+    Experiment : String
+        Layout name (see TrialLayouts.py).
+    SessionName : String
+        Usually the file name without extension (TW_RH_060824_1536).
+    Source : String or None
+        File the data came from.
+    Replace : Bool
+        Replace the session if it is already in the store.
+
+    Returns
+    -------
+    session_id, or None if the session was already there
+
+    """
+    Layout = TrialLayouts.getLayout(Experiment)
+    Condition = Layout["Condition"]
+    Known = {"ParticipantID", "Direction", "ResponseTime", Condition}
+    Extra = [x for x in Data.columns if x not in Known]
+    Participant = str(Data["ParticipantID"].iloc[0]) if len(Data) else ""
+
+    with Db:  # one transaction per session
+        Existing = Db.execute("SELECT session_id FROM sessions WHERE experiment = ? AND session_name = ?",
+                              (Experiment, SessionName)).fetchone()
+        if Existing is not None:
+            if not Replace:
+                return None
+            Db.execute("DELETE FROM trials WHERE session_id = ?", Existing)
+            Db.execute("DELETE FROM sessions WHERE session_id = ?", Existing)
+        SessionId = Db.execute(
+            "INSERT INTO sessions (experiment, participant, session_name, date, source, n_trials, added)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (Experiment, Participant, SessionName, sessionDate(SessionName), Source, len(Data),
+             datetime.now().strftime("%Y-%m-%d %H:%M:%S"))).lastrowid
+
+        Columns = {"condition": Data[Condition] if Condition in Data else None,
+                   "direction": Data["Direction"] if "Direction" in Data else None,
+                   "response_time": Data["ResponseTime"] if "ResponseTime" in Data else None}
+        Rows = pd.DataFrame(Columns, index=Data.index)
+        Rows.insert(0, "trial_number", range(len(Data)))
+        Rows.insert(0, "session_id", SessionId)
+        Rows["extra"] = (Data[Extra].to_json(orient="records", lines=True).splitlines()
+                         if Extra and len(Data) else None)
+        # Plain python values so sqlite stores floats as REAL and NaN as NULL
+        Rows = Rows.astype(object).where(Rows.notna(), None)
+        Db.executemany("INSERT INTO trials VALUES (?, ?, ?, ?, ?, ?)",
+                       Rows.itertuples(index=False, name=None))
+    return SessionId
+
+def addCSV(DbName, FileName, Experiment, Replace=False):
+    """
+    addCSV - adds a tidy csv file to the store (used by the experiment
+             scripts after they save their data)
+    """
+    Data = pd.read_csv(FileName)
+    Db = connect(DbName)
+    try:
+        return addSession(Db, Data, Experiment, os.path.splitext(os.path.basename(FileName))[0],
+                          Source=os.path.abspath(FileName), Replace=Replace)
+    finally:
+        Db.close()
+
+def query(Db, Experiment, Participants=None, Conditions=None, After=None, Before=None):
+    """
+    query - pulls trials out of the store with one indexed query
+
+    Parameters
+    ----------
+    Db : sqlite3 Connection or String
+        Connection or database file name.
+    Experiment : String
+        Layout name.
+    Participants : List of strings or None
+        Only these participants (None = everyone).
+    Conditions : List or None
+        Only these conditions (None = all). Numbers (contrast levels) match
+        to 6 decimal places.
+    After, Before : String or None
+        Only sessions on/after or before these dates ("YYYY-MM-DD").
+
+    Returns
+    -------
+    AllData : Pandas Dataframe
+        ParticipantID, <condition column>, Direction, ResponseTime,
+        TrialNumber, Session and Date, plus any extra columns. Text and
+        condition columns are categorical (see TidyCategories.py).
+
+    """
+    Layout = TrialLayouts.getLayout(Experiment)
+    Where = ["s.experiment = ?"]
+    Params = [Experiment]
+    if Participants is not None:
+        Where.append(f"s.participant IN ({','.join('?' * len(Participants))})")
+        Params += list(Participants)
+    if Conditions is not None:
+        # Contrast levels are stored as they were saved (0.899999976...), so
+        # numbers are matched to 6 decimal places rather than exactly
+        Numbers, Others = [], []
+        for x in Conditions:
+            if isinstance(x, (int, float, np.number)) and not isinstance(x, bool):
+                Numbers.append(round(float(x), 6))
+            else:
+                Others.append(x)
+        Match = []
+        if Numbers:
+            Match.append("(typeof(t.condition) IN ('integer', 'real') AND"
+                         f" ROUND(t.condition, 6) IN ({','.join('?' * len(Numbers))}))")
+            Params += Numbers
+        if Others:
+            Match.append(f"t.condition IN ({','.join('?' * len(Others))})")
+            Params += Others
+        Where.append("(" + " OR ".join(Match) + ")" if Match else "0")
+    if After is not None:
+        Where.append("s.date >= ?")
+        Params.append(After)
+    if Before is not None:
+        Where.append("s.date < ?")
+        Params.append(Before)
+
+    # A connection opened here is closed here, one passed in is left open
+    Own = isinstance(Db, str)
+    if Own:
+        Db = connect(Db)
+    try:
+        AllData = pd.read_sql_query(
+            "SELECT s.participant AS ParticipantID, t.condition AS Condition,"
+            " t.direction AS Direction, t.response_time AS ResponseTime,"
+            " t.trial_number AS TrialNumber, s.session_name AS Session, s.date AS Date, t.extra"
+            " FROM trials t JOIN sessions s ON s.session_id = t.session_id"
+            " WHERE " + " AND ".join(Where) +
+            " ORDER BY s.date, s.session_name, t.trial_number", Db, params=Params)
+    finally:
+        if Own:
+            Db.close()
+
+    if AllData["extra"].notna().any():
+        Extra = pd.DataFrame([json.loads(x) if x else {} for x in AllData["extra"]], index=AllData.index)
+        AllData = AllData.join(Extra)
+    AllData = AllData.drop(columns="extra")
+    Condition = Layout["Condition"]
+    if Condition is None:
+        AllData = AllData.drop(columns="Condition")
+    else:
+        AllData = AllData.rename(columns={"Condition": Condition})
+    return TidyCategories.categorize(AllData, Layout)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        sys.exit("Usage: python SessionStore.py <database> <experiment> <csv files...>")
+    for File in sys.argv[3:]:
+        SessionId = addCSV(sys.argv[1], File, sys.argv[2])
+        print(f"{File}: {'added' if SessionId else 'already in store'}")
@@ -0,0 +1,205 @@
+# Synthetic Data
+#
+# Writes a fake but realistic data archive for N participants x M sessions,
+# laid out like the real ContrastTriggers/Hemifield data folders, so the
+# conversion and analysis code can be tested and benchmarked at any size-
+#   TW_XX_DDMMYY_HHMM.xlsx   : trial handeler export, 1 row per contrast level
+#                              of 17 trials (ContrastLevel, KeyPressed, TravelTime)
+#   RT_XX_R_DDMMYY_HHMM.xlsx : trial handeler export, 1 row of 30 reaction
+#                              times. RTRuns runs (R = 1, 2) half an hour
+#                              apart each session, named like the real RT files
+#   HF_XX_DDMMYY_HHMM.csv    : tidy csv as written by Hemifield.py (the hemifield
+#                              experiment never made workbooks)
+# plus the tidy csv of each workbook (made with MakeTidy.convertFile).
+#
+# Response times are lognormal around the values in the real data (~1.6s
+# wave travel times, ~0.3s reaction times) with a few slow outliers, and the
+# trigger rate drops with contrast. Every file has its own seed made from the
+# archive seed and the participant/session number, so the same settings always
+# give the same files.
+#
+# Run from the FileProcessing folder-
+#   python SyntheticData.py ./FakeData -n 10 -m 20 --seed 1
+
+import os
+import argparse
+import itertools
+import string
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import openpyxl
+
+import MakeTidy
+
+Experiments = ("TW", "RT", "HF")
+# RT runs per session (RT_RH_1_070824_1630, RT_RH_2_070824_1700 in the real data)
+RTRuns = 2
+
+# Contrast level -> chance of the wave reaching the end ("right")
+TWConditions = {0.899999976158: 0.75, 0.75: 0.63, 0.600000023842: 0.5}
+TWTrials = 17
+RTTrials = 30
+HFConditions = ["Right", "Left"]
+HFTrials = 25  # per hemifield
+
+def writeTrialHandler(FileName, Blocks, SheetName="rawData"):
+    """
+    writeTrialHandler - writes blocks of trials like psychopy's trial handeler
+                        saveAsExcel (n, then each block's _mean, _raw and _std
+                        columns, text blocks just get _raw)
+
+    Parameters
+    ----------
+    FileName : String
+        .xlsx file to write.
+    Blocks : Dict of {block name: 2d array}
+        Rows = trial handeler rows, columns = trials. All the same shape.
+    SheetName : String
+        Name of the sheet.
+
+    Returns
+    -------
+    None.
+
+    """
+    NumRows, NumTrials = next(iter(Blocks.values())).shape
+    Pad = [None] * (NumTrials - 1)
+    Header = ["n"]
+    Rows = [[NumTrials] for x in range(NumRows)]
+    for Name, Values in Blocks.items():
+        Numeric = np.issubdtype(np.asarray(Values).dtype, np.number)
+        Header += ([Name + "_mean"] if Numeric else []) + [Name + "_raw"] + Pad
+        Header += [Name + "_std"] if Numeric else []
+        for Row, Trials in zip(Rows, Values):
+            Trials = Trials.tolist()
+            Row += ([float(np.mean(Trials))] if Numeric else []) + Trials
+            Row += [float(np.std(Trials))] if Numeric else []
+    Workbook = openpyxl.Workbook(write_only=True)
+    Sheet = Workbook.create_sheet(SheetName)
+    Sheet.append(Header)
+    for Row in Rows:
+        Sheet.append(Row)
+    Workbook.save(FileName)
+
+def responseTimes(Rng, Median, Spread, Size, OutlierRate=0.02):
+    """
+    responseTimes - lognormal response times with a few slow outliers
+    """
+    Times = Rng.lognormal(np.log(Median), Spread, Size)
+    Slow = Rng.random(Size) < OutlierRate
+    Times[Slow] *= Rng.uniform(3, 10, Slow.sum())
+    return Times
+
+def twBlocks(Rng, Speed=1.0):
+    """
+    twBlocks - one TW session, 1 trial handeler row per contrast level
+    """
+    Levels = np.array(list(TWConditions))
+    Contrast = np.repeat(Levels[:, None], TWTrials, axis=1)
+    Hits = Rng.random(Contrast.shape) < np.array(list(TWConditions.values()))[:, None]
+    Keys = np.where(Hits, "['right']", "['left']")
+    Times = responseTimes(Rng, 1.55 * Speed, 0.3, Contrast.shape)
+    return {"ContrastLevel": Contrast, "KeyPressed": Keys, "TravelTime": Times}
+
+def rtBlocks(Rng, Speed=1.0):
+    """
+    rtBlocks - one RT session, a single row of reaction times
+    """
+    return {"RT": responseTimes(Rng, 0.3 * Speed, 0.3, (1, RTTrials))}
+
+def hfFrame(Rng, PartInitials, Speed=1.0):
+    """
+    hfFrame - one HF session as Hemifield.py saves it (hemifields shuffled)
+    """
+    Hemifield = Rng.permutation(np.repeat(HFConditions, HFTrials))
+    Hits = Rng.random(len(Hemifield)) < 0.7
+    return pd.DataFrame({"ParticipantID": PartInitials,
+                         "VisibleHemifield": Hemifield,
+                         "Direction": np.where(Hits, "right", "left"),
+                         "ResponseTime": responseTimes(Rng, 1.6 * Speed, 0.3, len(Hemifield))})
+
+def participantInitials(NumParticipants):
+    """
+    participantInitials - AA, AB, AC, ... for each participant
+    """
+    Pairs = itertools.product(string.ascii_uppercase, repeat=2)
+    return ["".join(x) for x in itertools.islice(Pairs, NumParticipants)]
+
+def sessionFiles(Which):
+    """
+    sessionFiles - (experiment, run) of each file a session writes, run is 0
+                   for experiments without run numbers in their file names
+    """
+    for ExperimentName in Which:
+        if ExperimentName == "RT":
+            yield from ((ExperimentName, x) for x in range(1, RTRuns + 1))
+        else:
+            yield ExperimentName, 0
+
+def makeArchive(Folder, NumParticipants=4, NumSessions=8, Seed=0, Which=Experiments, TidyCSV=True):
+    """
+    makeArchive - writes the synthetic data archive into Folder
+
+    Parameters
+    ----------
+    Folder : String
+        Where to write the files (made if needed).
+    NumParticipants : Int
+        Number of participants.
+    NumSessions : Int
+        Sessions per participant (each gets one file per experiment).
+    Seed : Int
+        Archive seed.
+    Which : Tuple of strings
+        Experiments to write, some of TW, RT and HF.
+    TidyCSV : Bool
+        Also write the tidy csv of each workbook.
+
+    Returns
+    -------
+    Files : List of strings
+        Every file written.
+
+    """
+    os.makedirs(Folder, exist_ok=True)
+    Files = []
+    Start = datetime(2024, 8, 6, 9, 0)
+    for PartNum, PartInitials in enumerate(participantInitials(NumParticipants)):
+        # Some participants are just slower than others
+        Speed = np.random.default_rng([Seed, PartNum]).lognormal(0, 0.15)
+        for SessionNum in range(NumSessions):
+            Time = Start + timedelta(days=SessionNum, minutes=10 * PartNum)
+            Date = Time.strftime("%d%m%y_%H%M")
+            for ExperimentName, Run in sessionFiles(Which):
+                Rng = np.random.default_rng([Seed, PartNum, SessionNum, Experiments.index(ExperimentName)]
+                                            + ([Run] if Run > 1 else []))
+                if Run:
+                    RunDate = (Time + timedelta(minutes=30 * (Run - 1))).strftime("%d%m%y_%H%M")
+                    Stem = os.path.join(Folder, f"{ExperimentName}_{PartInitials}_{Run}_{RunDate}")
+                else:
+                    Stem = os.path.join(Folder, f"{ExperimentName}_{PartInitials}_{Date}")
+                if ExperimentName == "HF":
+                    hfFrame(Rng, PartInitials, Speed).to_csv(Stem + ".csv", index=False)
+                    Files.append(Stem + ".csv")
+                    continue
+                Blocks = twBlocks(Rng, Speed) if ExperimentName == "TW" else rtBlocks(Rng, Speed)
+                writeTrialHandler(Stem + ".xlsx", Blocks)
+                Files.append(Stem + ".xlsx")
+                if TidyCSV:
+                    MakeTidy.convertFile(Stem + ".xlsx", ExperimentName, PartInitials)
+                    Files.append(Stem + ".csv")
+    return Files
+
+if __name__ == "__main__":
+    Parser = argparse.ArgumentParser(description="Write a synthetic TW/RT/HF data archive")
+    Parser.add_argument("folder", help="where to write the files")
+    Parser.add_argument("-n", "--participants", type=int, default=4)
+    Parser.add_argument("-m", "--sessions", type=int, default=8, help="sessions per participant")
+    Parser.add_argument("-e", "--experiments", nargs="+", choices=Experiments, default=list(Experiments))
+    Parser.add_argument("--seed", type=int, default=0)
+    Parser.add_argument("--no-csv", action="store_true", help="don't write the tidy csv of each workbook")
+    Args = Parser.parse_args()
+    Files = makeArchive(Args.folder, Args.participants, Args.sessions, Args.seed,
+                        tuple(Args.experiments), not Args.no_csv)
+    print(f"Wrote {len(Files)} files to {Args.folder}")
@@ -0,0 +1,91 @@
+# Tidy Categories
+#
+# Compact categorical encoding of the tidy data's text/condition columns.
+#
+# Key presses come out of psychopy as "['right']" style strings. decodeKeys
+# turns a whole column of them into a pandas Categorical in one go- the raw
+# strings are factorised (hashed) once and only the few distinct values are
+# cleaned, so it costs the same however many trials there are. The codes are
+# int8, so comparisons like AllData["Direction"] == "right" and groupbys run
+# on small integers instead of python strings.
+#
+# categorize does the same for a whole tidy dataframe (Direction, the
+# layout's condition column, ParticipantID and Session). Directions always
+# get the same categories (left, right, then anything else in the order it is
+# seen), so frames from different sessions concat without falling back to
+# object columns.
+
+import numpy as np
+import pandas as pd
+
+import TrialLayouts
+
+KeyCategories = ["left", "right"]
+CategoryColumns = ["ParticipantID", "Session"]
+
+def cleanKey(Key):
+    """
+    cleanKey - "['right']" -> "right" (already clean keys are left alone)
+    """
+    return str(Key).strip("[']")
+
+def decodeKeys(Keys, Categories=KeyCategories):
+    """
+    decodeKeys - cleans and encodes a column of key presses
+
+    Parameters
+    ----------
+    Keys : Array like
+        Raw ("['right']") or clean ("right") key names, missing values stay
+        missing.
+    Categories : List of strings
+        Categories that always come first, in this order. Any other keys are
+        added after them.
+
+    Returns
+    -------
+    pandas Categorical
+
+    """
+    Codes, Uniques = pd.factorize(np.asarray(Keys, dtype=object))
+    Clean = [cleanKey(x) for x in Uniques]
+    AllCategories = list(Categories) + [x for x in dict.fromkeys(Clean) if x not in Categories]
+    # Code of each distinct raw value, then look every trial up in that
+    Lookup = pd.Index(AllCategories).get_indexer(Clean)
+    Codes = np.where(Codes >= 0, Lookup[Codes] if len(Lookup) else Codes, -1)
+    return pd.Categorical.from_codes(Codes, AllCategories)
+
+def conditionColumns():
+    """
+    conditionColumns - condition column of every registered layout
+    """
+    return [x["Condition"] for x in TrialLayouts.Layouts.values() if x.get("Condition")]
+
+def categorize(Data, Layout=None):
+    """
+    categorize - makes the text and condition columns of a tidy dataframe
+                 categorical (in place, the frame is also returned)
+
+    Parameters
+    ----------
+    Data : Pandas Dataframe
+        Tidy data, columns that aren't there are skipped.
+    Layout : String, Dict or None
+        Layout the data came from, only its condition column is encoded.
+        None encodes the condition column of every registered layout.
+
+    Returns
+    -------
+    Data : Pandas Dataframe
+
+    """
+    if "Direction" in Data and not isinstance(Data["Direction"].dtype, pd.CategoricalDtype):
+        Data["Direction"] = decodeKeys(Data["Direction"])
+    if Layout is None:
+        Conditions = conditionColumns()
+    else:
+        Conditions = [TrialLayouts.getLayout(Layout)["Condition"]]
+    for Column in CategoryColumns + Conditions:
+        if Column in Data and not isinstance(Data[Column].dtype, pd.CategoricalDtype):
+            Data[Column] = Data[Column].astype("category")
+    return Data
@@ -0,0 +1,144 @@
+# Tidy Manifest
+#
+# Keeps a small json manifest next to the data (.tidy_manifest.json) that
+# records each converted workbook's size, mtime and content hash along with
+# the tidy file it produced. MakeTidy uses it to skip workbooks that have not
+# changed since they were last converted.
+#
+# Unchanged files are spotted from size + mtime alone so a rerun over a large
+# archive never has to read the workbooks. The hash is only checked when the
+# size matches but the mtime has moved (e.g. the file was copied or touched).
+# The tidy output is checked the same way, so a deleted or hand edited output
+# is converted again. Entries are kept per workbook and output format, so
+# converting a folder to csv and to parquet in turn doesn't redo either.
+
+import os
+import json
+import hashlib
+
+ManifestName = ".tidy_manifest.json"
+ManifestVersion = 3
+
+def fileHash(FileName, ChunkSize=1 << 20):
+    """
+    fileHash - sha256 of a file's contents, read in chunks
+    """
+    Hash = hashlib.sha256()
+    with open(FileName, "rb") as File:
+        for Chunk in iter(lambda: File.read(ChunkSize), b""):
+            Hash.update(Chunk)
+    return Hash.hexdigest()
+
+def relativeOutput(FileName, OutputName):
+    """
+    relativeOutput - output path relative to the workbook's folder, so the
+                     manifest still works if the whole archive is moved
+    """
+    return os.path.relpath(OutputName, os.path.dirname(os.path.abspath(FileName)))
+
+def entryName(FileName, OutputName):
+    """
+    entryName - manifest key of a workbook's conversion into one output format
+                (TW_RH_060824_1536.xlsx:csv)
+    """
+    return f"{os.path.basename(FileName)}:{os.path.splitext(OutputName)[1].lstrip('.')}"
+
+def loadManifest(DataLocation):
+    """
+    loadManifest - loads the manifest for one data folder. A missing or
+                   unreadable manifest gives an empty one (so everything is
+                   converted again).
+
+    Parameters
+    ----------
+    DataLocation : String
+        Folder that holds the workbooks.
+
+    Returns
+    -------
+    Manifest : Dict
+        {"version": int, "files": {workbook name:output format: entry}}
+
+    """
+    ManifestPath = os.path.join(DataLocation, ManifestName)
+    try:
+        with open(ManifestPath) as File:
+            Manifest = json.load(File)
+    except (OSError, ValueError):
+        return {"version": ManifestVersion, "files": {}}
+    if Manifest.get("version") != ManifestVersion:
+        return {"version": ManifestVersion, "files": {}}
+    return Manifest
+
+def saveManifest(DataLocation, Manifest):
+    """
+    saveManifest - writes the manifest for one data folder. Written to a temp
+                   file first so an interrupted run can't leave half a file.
+    """
+    ManifestPath = os.path.join(DataLocation, ManifestName)
+    TmpPath = ManifestPath + ".tmp"
+    with open(TmpPath, "w") as File:
+        json.dump(Manifest, File, indent=1, sort_keys=True)
+    os.replace(TmpPath, ManifestPath)
+
+def needsConversion(Manifest, FileName, OutputName):
+    """
+    needsConversion - checks a workbook against its manifest entry
+
+    Parameters
+    ----------
+    Manifest : Dict
+        As returned by loadManifest.
+    FileName : String
+        Source workbook.
+    OutputName : String
+        Tidy file the workbook is converted into.
+
+    Returns
+    -------
+    Bool
+        True if the workbook is new or changed, or its output has gone or
+        been changed.
+
+    """
+    Entry = Manifest["files"].get(entryName(FileName, OutputName))
+    if Entry is None or not os.path.exists(OutputName):
+        return True
+    if Entry["output"] != relativeOutput(FileName, OutputName):
+        return True
+    return (isChanged(FileName, Entry, "size", "mtime_ns", "sha256")
+            or isChanged(OutputName, Entry, "output_size", "output_mtime_ns", "output_sha256"))
+
+def isChanged(FileName, Entry, SizeKey, MtimeKey, HashKey):
+    """
+    isChanged - checks one file against the size, mtime and hash recorded
+                under the given keys of a manifest entry (updating the mtime
+                if only that moved)
+    """
+    Stat = os.stat(FileName)
+    if Stat.st_size != Entry[SizeKey]:
+        return True
+    if Stat.st_mtime_ns == Entry[MtimeKey]:
+        return False
+    # Same size but touched, only reconvert if the contents really changed
+    if fileHash(FileName) != Entry[HashKey]:
+        return True
+    Entry[MtimeKey] = Stat.st_mtime_ns
+    return False
+
+def recordConversion(Manifest, FileName, OutputName):
+    """
+    recordConversion - adds/updates the manifest entry for a workbook that has
+                       just been converted into OutputName
+    """
+    Stat = os.stat(FileName)
+    Output = os.stat(OutputName)
+    Manifest["files"][entryName(FileName, OutputName)] = {
+        "size": Stat.st_size,
+        "mtime_ns": Stat.st_mtime_ns,
+        "sha256": fileHash(FileName),
+        "output": relativeOutput(FileName, OutputName),
+        "output_size": Output.st_size,
+        "output_mtime_ns": Output.st_mtime_ns,
+        "output_sha256": fileHash(OutputName),
+    }
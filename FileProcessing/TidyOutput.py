@@ -0,0 +1,124 @@
+# Tidy Output
+#
+# Output backends for the tidy data made by MakeTidy. CSV is written next to
+# the source workbook (as before). Parquet and Feather are typed, columnar and
+# partitioned by experiment and participant-
+#
+#   <OutputRoot>/Experiment=TW/ParticipantID=RH/TW_RH_060824_1536.parquet
+#
+# with ParticipantID, Direction and the condition stored as categories (see
+# TidyCategories.py). loadTidy reads a
+# partitioned folder back into one dataframe.
+#
+# Parquet/Feather need pyarrow (conda install pyarrow), CSV does not.
+
+import os
+import glob
+import pandas as pd
+
+import TidyCategories
+
+Extensions = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+def outputPath(FileName, ExperimentName=None, PartInitials=None, Format="csv", OutputRoot=None):
+    """
+    outputPath - where the tidy version of a source file gets saved
+
+    Parameters
+    ----------
+    FileName : String
+        Source workbook.
+    ExperimentName : String
+        Experiment initials, used as a partition for parquet/feather.
+    PartInitials : String
+        Participant initials, used as a partition for parquet/feather.
+    Format : String
+        One of csv, parquet, feather.
+    OutputRoot : String or None
+        Folder to write into. Defaults to the workbook's folder for csv and
+        a "tidy" folder inside it for parquet/feather.
+
+    Returns
+    -------
+    String
+
+    """
+    Stem = os.path.splitext(os.path.basename(FileName))[0]
+    Folder = os.path.dirname(FileName)
+    if Format == "csv":
+        return os.path.join(OutputRoot or Folder, Stem + Extensions[Format])
+    Root = OutputRoot or os.path.join(Folder, "tidy")
+    return os.path.join(Root, "Experiment=" + ExperimentName,
+                        "ParticipantID=" + PartInitials, Stem + Extensions[Format])
+
+def toColumnar(Data):
+    """
+    toColumnar - gives the dataframe proper dtypes before a columnar write.
+                 Series (reaction time files) become a ResponseTime column.
+    """
+    if isinstance(Data, pd.Series):
+        Data = Data.astype(float).to_frame(name="ResponseTime")
+    return TidyCategories.categorize(Data.reset_index(drop=True))
+
+def writeCSV(Data, FileName):
+    Data.to_csv(FileName, index=False)
+
+def writeParquet(Data, FileName):
+    toColumnar(Data).to_parquet(FileName, index=False)
+
+def writeFeather(Data, FileName):
+    toColumnar(Data).to_feather(FileName)
+
+Writers = {"csv": writeCSV, "parquet": writeParquet, "feather": writeFeather}
+
+def saveOut(Data, FileName, Format="csv"):
+    """
+    saveOut - writes a dataframe (or series) with the chosen backend, making
+              the partition folders if needed
+    """
+    Folder = os.path.dirname(FileName)
+    if Folder:
+        os.makedirs(Folder, exist_ok=True)
+    Writers[Format](Data, FileName)
+
+def loadTidy(OutputRoot, ExperimentName, Participants=None, Format="parquet", Columns=None):
+    """
+    loadTidy - reads partitioned parquet/feather tidy files back in
+
+    Parameters
+    ----------
+    OutputRoot : String
+        Folder passed to (or defaulted by) outputPath.
+    ExperimentName : String
+        Experiment initials.
+    Participants : List of strings or None
+        Participant initials to load, None loads everyone.
+    Format : String
+        parquet or feather.
+    Columns : List of strings or None
+        Only read these columns (ParticipantID and Session are always added).
+
+    Returns
+    -------
+    AllData : Pandas Dataframe
+        One row per trial with ParticipantID, Direction, the condition and
+        Session as categories.
+
+    """
+    Reader = pd.read_parquet if Format == "parquet" else pd.read_feather
+    SearchTxt = os.path.join(OutputRoot, "Experiment=" + ExperimentName,
+                             "ParticipantID=*", "*" + Extensions[Format])
+    DataFrames = []
+    for File in sorted(glob.glob(SearchTxt)):
+        PartInitials = os.path.basename(os.path.dirname(File)).split("=", 1)[1]
+        if Participants is not None and PartInitials not in Participants:
+            continue
+        df = Reader(File, columns=Columns)
+        df["ParticipantID"] = PartInitials
+        df["Session"] = os.path.splitext(os.path.basename(File))[0]
+        DataFrames.append(df)
+
+    if not DataFrames:
+        return pd.DataFrame(columns=Columns or [])
+    # Categories differ between files so they are set again after the concat
+    return toColumnar(pd.concat(DataFrames, ignore_index=True))
@@ -0,0 +1,254 @@
+# Tidy Pipeline
+#
+# MakeTidy's conversion as a chain of generator stages-
+#   discover -> (skip unchanged) -> read -> reshape -> clean Direction -> write
+#   -> (session store)
+# Each stage takes and yields one session at a time (a dict holding the file,
+# its layout, output name, data and timings), so only a handful of sessions
+# are ever in memory no matter how big the archive is.
+#
+# Workbooks are read in a small pool (threads, or processes for big CPU bound
+# exports) that is only allowed a few reads ahead, and a bounded queue sits
+# between the reads and the rest of the stages, so reading the next workbooks
+# overlaps reshaping/writing the current one without reading the whole
+# archive ahead. A stage that fails on a session records the error in it and
+# passes it on, the later stages skip it.
+
+import os
+import glob
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import TidyManifest
+import TidyCategories
+import TidyOutput
+import ReadTrialHandler
+import TrialLayouts
+import SessionStore
+
+def discover(DataRoots, Experiments, Participants):
+    """
+    discover - yields every trial handeler workbook matching
+               ExperimentName_PartInitials* in each of the data roots
+
+    Parameters
+    ----------
+    DataRoots : List of strings
+        Folders to search.
+    Experiments : List of strings
+        Layout names (e.g. TW, RT, HF, see TrialLayouts.py).
+    Participants : List of strings
+        Participant initials, "*" matches everyone.
+
+    Yields
+    ------
+    Job : (filename, experiment initials, participant initials)
+
+    """
+    for DataLocation in DataRoots:
+        for ExperimentName in Experiments:
+            Prefix = TrialLayouts.getLayout(ExperimentName)["Prefix"]
+            for PartInitials in Participants:
+                FilePrefix = Prefix + "_" + PartInitials.upper() + "*"
+                for File in sorted(glob.glob(os.path.join(DataLocation, FilePrefix))):
+                    if os.path.splitext(File)[1] == ".csv":
+                        continue
+                    # Initials are always the 2nd part of the name (TW_RH_...)
+                    FileInitials = os.path.basename(File).split("_")[1]
+                    yield (File, ExperimentName, FileInitials)
+
+def changedOnly(Jobs, Manifests, Force=False, Format="csv", OutputRoot=None, Counts=None):
+    """
+    changedOnly - passes on only the jobs whose workbook has changed since it
+                  was last converted (see TidyManifest.py). Each data folder's
+                  manifest is loaded into Manifests the first time it is seen.
+                  If Counts is given, Counts["Found"] and Counts["Unchanged"]
+                  are kept up to date.
+    """
+    if Counts is not None:
+        Counts.setdefault("Found", 0)
+        Counts.setdefault("Unchanged", 0)
+    for Job in Jobs:
+        DataLocation = os.path.dirname(Job[0])
+        if DataLocation not in Manifests:
+            Manifests[DataLocation] = TidyManifest.loadManifest(DataLocation)
+        OutputFile = TidyOutput.outputPath(*Job, Format, OutputRoot)
+        Changed = Force or TidyManifest.needsConversion(Manifests[DataLocation], Job[0], OutputFile)
+        if Counts is not None:
+            Counts["Found"] += 1
+            Counts["Unchanged"] += not Changed
+        if Changed:
+            yield Job
+
+def newSession(Job, Format="csv", OutputRoot=None):
+    """
+    newSession - the dict that is passed down the stages for one job
+    """
+    CurFile, ExperimentName, PartInitials = Job
+    return {"Job": Job,
+            "File": CurFile,
+            "Layout": TrialLayouts.getLayout(ExperimentName),
+            "Output": TidyOutput.outputPath(CurFile, ExperimentName, PartInitials, Format, OutputRoot),
+            "Format": Format,
+            "Data": None,
+            "Tidy": None,
+            "Error": None,
+            "Time": 0.0}
+
+def readWorkbook(CurFile, Layout):
+    """
+    readWorkbook - reads one workbook's layout blocks (runs in the read pool,
+                   so the layout dict is passed in and the time comes back)
+    """
+    Start = time.perf_counter()
+    if Layout["Source"] != "TrialHandler":
+        raise ValueError(f"{Layout['Prefix']} data is already saved as tidy csv files")
+    Data, Plan = ReadTrialHandler.readLayout(CurFile, Layout)
+    return Data, time.perf_counter() - Start
+
+def reshapeStep(Session):
+    Session["Tidy"] = TrialLayouts.tidyFrame(Session["Layout"], Session["Data"], Session["Job"][2])
+    Session["Data"] = None
+
+def cleanStep(Session):
+    Tidy = Session["Tidy"]
+    if "Direction" in Tidy:
+        Tidy["Direction"] = TidyCategories.decodeKeys(Tidy["Direction"])
+
+def writeStep(Session):
+    TidyOutput.saveOut(Session["Tidy"], Session["Output"], Session["Format"])
+
+def storeStep(Session, Store, Replace=False):
+    SessionName = os.path.splitext(os.path.basename(Session["File"]))[0]
+    SessionStore.addSession(Store, Session["Tidy"], Session["Job"][1], SessionName,
+                            Source=os.path.abspath(Session["File"]), Replace=Replace)
+
+def runStep(Session, Step, *Args):
+    """
+    runStep - runs one step on a session unless an earlier one failed,
+              timing it and recording any error in the session
+    """
+    if Session["Error"] is not None:
+        return Session
+    Start = time.perf_counter()
+    try:
+        Step(Session, *Args)
+    except Exception as Error:
+        Session["Error"] = repr(Error)
+        Session["Tidy"] = None
+    Session["Time"] += time.perf_counter() - Start
+    return Session
+
+def stage(Sessions, Step, *Args):
+    """
+    stage - turns a step into a generator stage
+    """
+    for Session in Sessions:
+        yield runStep(Session, Step, *Args)
+
+def read(Jobs, Workers=2, Threads=True, Ahead=None, Format="csv", OutputRoot=None):
+    """
+    read - read stage, reads the workbooks in a pool and yields the sessions
+           in job order
+
+    Parameters
+    ----------
+    Jobs : Iterable of (filename, experiment initials, participant initials)
+    Workers : Int or None
+        Pool size (None = the executor's default).
+    Threads : Bool
+        Read in threads (True) or worker processes (False).
+    Ahead : Int or None
+        Most reads allowed to be in flight at once, default 2 per worker.
+    Format, OutputRoot :
+        Output settings (see TidyOutput.outputPath).
+
+    Yields
+    ------
+    Session : Dict with Data (the layout's blocks) filled in
+
+    """
+    Executor = ThreadPoolExecutor if Threads else ProcessPoolExecutor
+    Ahead = Ahead or 2 * (Workers or os.cpu_count() or 1)
+    with Executor(max_workers=Workers) as Pool:
+        Pending = deque()
+        for Job in Jobs:
+            Session = newSession(Job, Format, OutputRoot)
+            Pending.append((Session, Pool.submit(readWorkbook, Session["File"], Session["Layout"])))
+            if len(Pending) >= Ahead:
+                yield collect(*Pending.popleft())
+        while Pending:
+            yield collect(*Pending.popleft())
+
+def collect(Session, Future):
+    try:
+        Session["Data"], Session["Time"] = Future.result()
+    except Exception as Error:
+        Session["Error"] = repr(Error)
+    return Session
+
+def buffered(Sessions, MaxSize=4):
+    """
+    buffered - runs a stage in a background thread with a bounded queue after
+               it, so it can work ahead of the stages after it by at most
+               MaxSize sessions
+    """
+    Queue = queue.Queue(maxsize=MaxSize)
+    Done = object()
+
+    def fill():
+        try:
+            for Session in Sessions:
+                Queue.put(Session)
+        except BaseException as Error:
+            Queue.put(Error)
+        Queue.put(Done)
+
+    threading.Thread(target=fill, daemon=True).start()
+    while True:
+        Session = Queue.get()
+        if Session is Done:
+            return
+        if isinstance(Session, BaseException):
+            raise Session
+        yield Session
+
+def convert(Jobs, Workers=2, Threads=True, Format="csv", OutputRoot=None, Store=None, Replace=False,
+            QueueSize=4):
+    """
+    convert - the whole pipeline, yields each session once it has been
+              written (and stored)
+
+    Parameters
+    ----------
+    Jobs : Iterable of (filename, experiment initials, participant initials)
+        E.g. from discover/changedOnly.
+    Workers, Threads :
+        Read pool settings (see read).
+    Format, OutputRoot :
+        Output settings (see TidyOutput.outputPath).
+    Store : sqlite3 Connection or None
+        Session store to add each session to (see SessionStore.py).
+    Replace : Bool
+        Replace sessions that are already in the store.
+    QueueSize : Int
+        Sessions allowed to wait between the reads and the rest of the stages.
+
+    Yields
+    ------
+    Session : Dict
+        Job, File, Output, Time (s) and Error (None if it worked).
+
+    """
+    Sessions = buffered(read(Jobs, Workers, Threads, None, Format, OutputRoot), QueueSize)
+    Sessions = stage(Sessions, reshapeStep)
+    Sessions = stage(Sessions, cleanStep)
+    Sessions = stage(Sessions, writeStep)
+    if Store is not None:
+        Sessions = stage(Sessions, storeStep, Store, Replace)
+    for Session in Sessions:
+        Session["Tidy"] = None  # written out, don't hang on to it
+        yield Session
@@ -0,0 +1,219 @@
+# Trend Fitting
+#
+# Fits polynomial trends over trial number (e.g. mean response time or
+# trigger rate at each presentation) and picks each curve's degree by cross
+# validation, instead of hand picking a degree per condition.
+#
+# The candidate degrees are all scored at once for every curve. For each
+# degree the design matrix (x mapped onto [-1, 1], as numpy.polynomial does,
+# so high degrees stay well conditioned) is QR factorised once, and the
+# residuals of every curve come from one matrix product. The cross validation
+# errors are then closed form, with no refitting-
+#   "loo"   : leave one out, residual / (1 - leverage)
+#   "kfold" : k interleaved folds, (I - H_ff)^-1 residuals of each fold f
+# Degrees that leave too few points to fit (leverage 1) score inf.
+#
+# Curves with missing points (NaN) are fitted on the points they have,
+# curves with the same missing points together. The chosen fits are
+# numpy.polynomial.Polynomial objects and are evaluated on a dense grid for
+# plotting. MSE is each curve's own in-sample error.
+#
+# linearTrends fits a straight line (time on task) to every curve at once
+# with the closed form least squares sums taken down the trial axis, giving
+# the same slope, intercept, r, p and slope SE as scipy's linregress for each
+# curve, in a table with one row per curve. It only reads its input, so it is
+# safe to call from several threads or processes at once.
+#
+# From an analysis script-
+#   Curves = pd.DataFrame({"0.9": TW9AV, "0.75": TW75AV, "0.6": TW6AV}, index=Time)
+#   Fits, Grid = TrendFitting.fitTrends(Curves)
+#   plt.plot(Grid.index, Grid["0.9"])
+#   Trends = TrendFitting.linearTrends(Curves)
+#   plt.plot(Time, TrendFitting.trendLines(Trends, Time)["0.9"])
+
+import numpy as np
+import pandas as pd
+from numpy.polynomial import Polynomial
+
+Methods = ("loo", "kfold")
+
+def designMatrix(x, Degree, Domain):
+    """
+    designMatrix - powers of x (mapped from Domain onto [-1, 1]) up to Degree
+    """
+    Low, High = Domain
+    Mapped = (2 * np.asarray(x, dtype=float) - (Low + High)) / ((High - Low) or 1)
+    return np.polynomial.polynomial.polyvander(Mapped, Degree)
+
+def cvErrors(x, Y, Degrees, Method="loo", Folds=5, Domain=None):
+    """
+    cvErrors - cross validation MSE of every degree for every curve (all
+               curves share x and have no NaN)
+
+    Parameters
+    ----------
+    x : Numpy array
+        Points, length n.
+    Y : 2d numpy array
+        n x curves.
+    Degrees : List of ints
+        Candidate degrees.
+    Method : String
+        "loo" or "kfold".
+    Folds : Int
+        Number of folds for "kfold".
+    Domain : (Float, Float) or None
+        x range mapped onto [-1, 1] (default the range of x).
+
+    Returns
+    -------
+    Errors : 2d numpy array
+        Degrees x curves.
+
+    """
+    if Method not in Methods:
+        raise ValueError(f"Unknown cross validation {Method}, use one of {Methods}")
+    Domain = Domain or (np.min(x), np.max(x))
+    NumPoints = len(x)
+    Fold = np.arange(NumPoints) % Folds
+    Errors = np.full((len(Degrees), Y.shape[1]), np.inf)
+    for Pos, Degree in enumerate(Degrees):
+        if Degree + 1 >= NumPoints:
+            continue
+        Q, R = np.linalg.qr(designMatrix(x, Degree, Domain))
+        Residuals = Y - Q @ (Q.T @ Y)
+        if Method == "loo":
+            Leverage = np.einsum("ij,ij->i", Q, Q)
+            if (1 - Leverage).min() < 1e-10:
+                continue
+            Errors[Pos] = np.mean((Residuals / (1 - Leverage)[:, None]) ** 2, axis=0)
+            continue
+        Squared = np.zeros(Y.shape[1])
+        for Held in range(Folds):
+            Rows = np.flatnonzero(Fold == Held)
+            if NumPoints - len(Rows) <= Degree:
+                Squared = np.inf
+                break
+            Block = np.eye(len(Rows)) - Q[Rows] @ Q[Rows].T
+            if np.linalg.cond(Block) > 1e10:
+                Squared = np.inf
+                break
+            Squared = Squared + (np.linalg.solve(Block, Residuals[Rows]) ** 2).sum(axis=0)
+        Errors[Pos] = Squared / NumPoints
+    return Errors
+
+def fitTrends(Curves, Degrees=range(0, 11), Method="loo", Folds=5, GridPoints=200):
+    """
+    fitTrends - fits each curve with the degree that has the smallest cross
+                validation error
+
+    Parameters
+    ----------
+    Curves : Pandas Dataframe
+        Index = x (e.g. presentation number), one column per curve (e.g.
+        condition, or participant x condition). NaN points are left out.
+    Degrees : Iterable of ints
+        Candidate degrees.
+    Method : String
+        "loo" (leave one out) or "kfold".
+    Folds : Int
+        Number of folds for "kfold" (every Folds-th point in the same fold).
+    GridPoints : Int
+        Points in the dense grid.
+
+    Returns
+    -------
+    Fits : Pandas Dataframe
+        One row per curve, columns Degree, CVError, MSE, N and Polynomial
+        (numpy Polynomial in x).
+    Grid : Pandas Dataframe
+        Each fit evaluated on GridPoints points across the range of x.
+
+    """
+    Degrees = list(Degrees)
+    x = Curves.index.to_numpy(dtype=float)
+    Y = Curves.to_numpy(dtype=float)
+    Domain = (x.min(), x.max())
+    Fits = pd.DataFrame(index=Curves.columns, columns=["Degree", "CVError", "MSE", "N", "Polynomial"],
+                        dtype=object)
+
+    # Curves with the same points present are scored together
+    Patterns, Pattern = np.unique(~np.isnan(Y).T, axis=0, return_inverse=True)
+    for Number, Present in enumerate(Patterns):
+        Columns = np.flatnonzero(Pattern.ravel() == Number)
+        Points = Y[np.ix_(Present, Columns)]
+        Errors = cvErrors(x[Present], Points, Degrees, Method, Folds, Domain)
+        Best = np.argmin(Errors, axis=0)
+        for Degree in np.unique(Best):
+            Chosen = Best == Degree
+            # Every curve with this degree fitted in one lstsq
+            Coefs = np.linalg.lstsq(designMatrix(x[Present], Degrees[Degree], Domain), Points[:, Chosen],
+                                    rcond=None)[0]
+            for Column, Coef, Error, Fitted in zip(Columns[Chosen], Coefs.T, Errors[Degree, Chosen],
+                                                   Points[:, Chosen].T):
+                Fit = Polynomial(Coef, domain=Domain, window=[-1, 1])
+                Fits.iloc[Column] = [Degrees[Degree], Error, np.mean((Fit(x[Present]) - Fitted) ** 2),
+                                     int(Present.sum()), Fit]
+
+    GridX = np.linspace(Domain[0], Domain[1], GridPoints)
+    Grid = pd.DataFrame({Name: Fit(GridX) for Name, Fit in Fits["Polynomial"].items()}, index=GridX)
+    Fits = Fits.astype({"Degree": int, "CVError": float, "MSE": float, "N": int})
+    return Fits, Grid
+
+def linearTrends(Curves):
+    """
+    linearTrends - least squares line through each curve (as linregress)
+
+    Parameters
+    ----------
+    Curves : Pandas Dataframe
+        Index = x (e.g. presentation number), one column per curve (e.g.
+        participant x condition x measure, as a MultiIndex). NaN points are
+        left out.
+
+    Returns
+    -------
+    Pandas Dataframe
+        One row per curve (index Curves.columns), columns Slope, Intercept,
+        R, P (two sided, slope = 0), SE (of the slope), InterceptSE and N.
+
+    """
+    # scipy.stats is slow to import, so it is only loaded when a fit runs
+    from scipy import stats
+    x = Curves.index.to_numpy(dtype=float)[:, None]
+    Y = Curves.to_numpy(dtype=float)
+    Valid = ~np.isnan(Y)
+    N = Valid.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        MeanX = np.where(Valid, x, 0).sum(axis=0) / N
+        MeanY = np.where(Valid, Y, 0).sum(axis=0) / N
+        DevX = np.where(Valid, x - MeanX, 0)
+        DevY = np.where(Valid, Y - MeanY, 0)
+        SXX = (DevX ** 2).sum(axis=0)
+        SYY = (DevY ** 2).sum(axis=0)
+        SXY = (DevX * DevY).sum(axis=0)
+        Slope = SXY / SXX
+        Intercept = MeanY - Slope * MeanX
+        # A flat curve has no r (NaN), as in linregress
+        R = np.clip(SXY / np.sqrt(SXX * SYY), -1, 1)
+        DF = N - 2
+        T = R * np.sqrt(DF / ((1 - R) * (1 + R)))
+        SE = np.sqrt((1 - R ** 2) * SYY / SXX / DF)
+        InterceptSE = SE * np.sqrt(SXX / N + MeanX ** 2)
+    P = np.where(DF > 0, 2 * stats.t.sf(np.abs(T), np.maximum(DF, 1)), np.nan)
+    return pd.DataFrame({"Slope": Slope, "Intercept": Intercept, "R": R, "P": P, "SE": SE,
+                         "InterceptSE": InterceptSE, "N": N}, index=Curves.columns)
+
+def trendLines(Trends, x):
+    """
+    trendLines - each fitted line of linearTrends evaluated at x
+
+    Returns
+    -------
+    Pandas Dataframe
+        Index x, one column per row of Trends.
+
+    """
+    x = np.asarray(x, dtype=float)
+    Lines = Trends["Intercept"].to_numpy() + np.outer(x, Trends["Slope"].to_numpy())
+    return pd.DataFrame(Lines, index=x, columns=Trends.index)
@@ -0,0 +1,207 @@
+# Trial Layouts
+#
+# Registry of how each experiment's data is laid out, so MakeTidy (and the
+# analysis scripts) don't need hard coded iloc[1:18] style slices or
+# "if ExperimentInitials == 'TW'" branches.
+#
+# A layout is a dict-
+#   Prefix    : start of the file names (TW_RH_...)
+#   Source    : "TrialHandler" for psychopy trial handeler .xlsx exports,
+#               "csv" for experiments that already write tidy csv files
+#   Blocks    : (TrialHandler only) raw block in the export -> tidy column,
+#               in the order the tidy columns should come out
+#   Condition : tidy column that holds the condition (None if there isn't one)
+#   Columns   : tidy column -> dtype
+#   Schedule  : how the trials were run (None if it isn't known)-
+#               BlockLength = trials per block, Pauses = trials between
+#               pauses within a block (they add up to BlockLength). Used by
+#               TrialSchedule to annotate the block/pause of each trial
+#
+# For TrialHandler exports the layout is compiled against the sheet's header
+# row into a plan (the sheet columns to read, in order). Plans are cached, so
+# each header is only worked out once, and are applied to whole arrays with a
+# single reshape. The number of trials per row comes from the header, so
+# changing NumTrials or the condition list needs no edits here.
+#
+# New experiments can be added without code changes by putting their layouts
+# in a json file ({"Name": {layout}, ...}) and passing it to loadLayouts (or
+# MakeTidy.py --layouts).
+
+import json
+import numpy as np
+import pandas as pd
+
+Layouts = {
+    "TW": {"Prefix": "TW",
+           "Source": "TrialHandler",
+           "Blocks": {"ContrastLevel": "ContrastLevel",
+                      "KeyPressed": "Direction",
+                      "TravelTime": "ResponseTime"},
+           "Condition": "ContrastLevel",
+           "Columns": {"ParticipantID": "str", "ContrastLevel": "float64",
+                       "Direction": "str", "ResponseTime": "float64"},
+           "Schedule": {"BlockLength": 17, "Pauses": [5, 5, 5, 2]}},
+    "RT": {"Prefix": "RT",
+           "Source": "TrialHandler",
+           "Blocks": {"RT": "ResponseTime"},
+           "Condition": None,
+           "Columns": {"ParticipantID": "str", "ResponseTime": "float64"}},
+    "HF": {"Prefix": "HF",
+           "Source": "csv",
+           "Condition": "VisibleHemifield",
+           "Columns": {"ParticipantID": "str", "VisibleHemifield": "str",
+                       "Direction": "str", "ResponseTime": "float64"},
+           # Hemifield.py pauses every 10 trials
+           "Schedule": {"BlockLength": 10, "Pauses": [10]}},
+    "HFOD": {"Prefix": "HFOD",
+             "Source": "csv",
+             "Condition": "VisibleHemifield",
+             "Columns": {"ParticipantID": "str", "VisibleHemifield": "str",
+                         "Direction": "str", "ResponseTime": "float64"}},
+    # Orientation.py saves its files with the TW_ prefix
+    "Orientation": {"Prefix": "TW",
+                    "Source": "csv",
+                    "Condition": "StimOrientation",
+                    "Columns": {"ParticipantID": "str", "StimOrientation": "str",
+                                "Direction": "str", "ResponseTime": "float64",
+                                "IsOddBall": "str"}},
+}
+
+CompiledPlans = {}
+
+def getLayout(Layout):
+    """
+    getLayout - look up a layout by name (layout dicts are passed through)
+    """
+    if isinstance(Layout, dict):
+        return Layout
+    if Layout not in Layouts:
+        raise KeyError(f"No layout registered for {Layout!r}, known layouts: {sorted(Layouts)}")
+    return Layouts[Layout]
+
+def loadLayouts(FileName):
+    """
+    loadLayouts - add (or replace) layouts from a json file
+
+    Parameters
+    ----------
+    FileName : String
+        Json file of {"Name": {layout}, ...}.
+
+    Returns
+    -------
+    List of the layout names that were loaded.
+
+    """
+    with open(FileName) as File:
+        NewLayouts = json.load(File)
+    for Name, Layout in NewLayouts.items():
+        for Key in ("Prefix", "Source", "Columns"):
+            if Key not in Layout:
+                raise ValueError(f"Layout {Name!r} in {FileName} is missing {Key!r}")
+        if Layout["Source"] == "TrialHandler" and "Blocks" not in Layout:
+            raise ValueError(f"TrialHandler layout {Name!r} in {FileName} is missing 'Blocks'")
+        Layout.setdefault("Condition", None)
+        Layout.setdefault("Schedule", None)
+        Layouts[Name] = Layout
+    return list(NewLayouts)
+
+def rawBlocks(Header):
+    """
+    rawBlocks - where each *_raw block sits in a trial handeler header row.
+                A block runs from its "<Name>_raw" heading up to the next
+                named heading.
+
+    Parameters
+    ----------
+    Header : Tuple
+        First row of the sheet, unnamed cells are None.
+
+    Returns
+    -------
+    Dict of {block name: (first column, last column + 1)}, in sheet order
+
+    """
+    Named = [x for x in range(len(Header)) if Header[x] is not None]
+    Spans = {}
+    for Pos, Start in enumerate(Named):
+        if not str(Header[Start]).endswith("_raw"):
+            continue
+        Stop = Named[Pos + 1] if Pos + 1 < len(Named) else len(Header)
+        Spans[str(Header[Start])[:-len("_raw")]] = (Start, Stop)
+    return Spans
+
+def compilePlan(Layout, Header):
+    """
+    compilePlan - works out which sheet columns a layout needs, once per
+                  layout and header
+
+    Parameters
+    ----------
+    Layout : String or Dict
+        Layout name or layout dict (must be a TrialHandler layout).
+    Header : Tuple
+        First row of the sheet.
+
+    Returns
+    -------
+    Plan : Dict
+        SheetColumns : numpy array of sheet columns to read, block by block
+        Columns      : tidy column name for each block
+        NumTrials    : trials per trial handeler row
+
+    """
+    Layout = getLayout(Layout)
+    Header = tuple(Header)
+    Key = (Layout["Prefix"], tuple(Layout["Blocks"].items()), Header)
+    if Key in CompiledPlans:
+        return CompiledPlans[Key]
+
+    Spans = rawBlocks(Header)
+    Missing = [x for x in Layout["Blocks"] if x not in Spans]
+    if Missing:
+        raise ValueError(f"{Layout['Prefix']} layout expects raw blocks {Missing} "
+                         f"which are not in the header (found {list(Spans)})")
+    Widths = {x: Spans[x][1] - Spans[x][0] for x in Layout["Blocks"]}
+    if len(set(Widths.values())) != 1:
+        raise ValueError(f"{Layout['Prefix']} raw blocks have different numbers of trials: {Widths}")
+
+    Plan = {"SheetColumns": np.concatenate([np.arange(*Spans[x]) for x in Layout["Blocks"]]),
+            "Columns": list(Layout["Blocks"].values()),
+            "NumTrials": Widths[next(iter(Widths))]}
+    CompiledPlans[Key] = Plan
+    return Plan
+
+def tidyFrame(Layout, Data, PartInitials):
+    """
+    tidyFrame - reorganises trial handeler rows into a tidy table with
+                rows = trial, columns = variables
+
+    Parameters
+    ----------
+    Layout : String or Dict
+        Layout name or layout dict (must be a TrialHandler layout).
+    Data : 2d numpy array
+        One row per trial handeler row, columns = the layout's blocks one
+        after the other (as read with a compiled plan).
+    PartInitials : String
+        Participant initials.
+
+    Returns
+    -------
+    tidyData : Pandas Dataframe
+
+    """
+    Layout = getLayout(Layout)
+    Columns = list(Layout["Blocks"].values())
+    NumTrials = Data.shape[1] // len(Columns)
+    # (rows, blocks, trials) - one reshape for the whole array
+    Trials = Data.reshape(len(Data), len(Columns), NumTrials)
+
+    tidyData = {"ParticipantID": np.full(len(Data) * NumTrials, PartInitials)}
+    for Pos, Column in enumerate(Columns):
+        tidyData[Column] = Trials[:, Pos, :].ravel()
+    tidyData = pd.DataFrame(tidyData)
+
+    Dtypes = {x: Layout["Columns"][x] for x in tidyData if Layout["Columns"].get(x, "str") != "str"}
+    return tidyData.astype(Dtypes)
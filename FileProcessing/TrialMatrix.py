@@ -0,0 +1,136 @@
+# Trial Matrix
+#
+# Reads trial handeler exports straight into aligned (rows x trials) numpy
+# arrays, one per block of the layout (e.g. TW = contrast level, key press
+# and travel time, rows x 17), for the over time analyses that work on the
+# trial number rather than on tidy data.
+#
+# Every file's blocks are read (ReadTrialHandler.readLayout), stacked and
+# reshaped once. Key presses are decoded once per distinct value
+# (TidyCategories.decodeKeys) and turned into a boolean Pressed matrix with one
+# comparison of the codes (and a Responded matrix of the trials with any key
+# press recorded), and the response times of trials that weren't
+# triggered are masked to NaN with one np.where, so nothing loops over trials
+# in Python however many rows there are.
+#
+# dispersion gives the mean, SD, SEM and N of every trial position over the
+# rows in one nanmean/nanstd/count_nonzero pass, for any stack of matrices
+# (e.g. conditions x rows x trials, or participants x conditions x rows x
+# trials), and markerSizes turns the SDs into scatter dot sizes (smaller dots
+# for noisier trials).
+#
+# From an analysis script-
+#   Matrices = TrialMatrix.trialMatrices(AllFileNames, "TW")
+#   Matrices["ResponseTime"]  # NaN where no wave was triggered
+#   Matrices["Pressed"]       # True where the wave was triggered
+#   Spread = TrialMatrix.dispersion(np.stack([TW9, TW75, TW6]))
+#   plt.errorbar(Time, Spread["Mean"][0], Spread["SEM"][0])
+
+import warnings
+
+import numpy as np
+
+import ReadTrialHandler
+import TrialLayouts
+import TidyCategories
+
+def trialMatrices(FileNames, Layout="TW", Trigger="right", Masked=("ResponseTime",)):
+    """
+    trialMatrices - aligned rows x trials arrays of every block in the files
+
+    Parameters
+    ----------
+    FileNames : List of strings
+        Trial handeler .xlsx exports, rows are kept in this order.
+    Layout : String or Dict
+        Layout name or layout dict (must be a TrialHandler layout).
+    Trigger : String
+        Key press that means the wave was triggered.
+    Masked : Tuple of strings
+        Columns set to NaN where the trial wasn't triggered.
+
+    Returns
+    -------
+    Matrices : Dict of {tidy column: 2d numpy array}
+        Numeric columns as floats (missing cells NaN), the key press column
+        as Pressed (bools) instead, and Responded (bools, False where no key
+        press was recorded). Every array has the same shape.
+
+    """
+    Layout = TrialLayouts.getLayout(Layout)
+    if not FileNames:
+        raise ValueError(f"No {Layout['Prefix']} files to read")
+    Rows = []
+    for FileName in FileNames:
+        Data, Plan = ReadTrialHandler.readLayout(FileName, Layout)
+        Rows.append(Data)
+    Rows = np.concatenate(Rows)
+    # (rows, blocks, trials) - one reshape for every file
+    Blocks = Rows.reshape(len(Rows), len(Plan["Columns"]), Plan["NumTrials"])
+
+    Matrices = {}
+    Pressed = None
+    for Pos, Column in enumerate(Plan["Columns"]):
+        if Layout["Columns"].get(Column, "str") == "str":
+            Keys = TidyCategories.decodeKeys(Blocks[:, Pos, :].ravel())
+            Pressed = (Keys.codes == Keys.categories.get_loc(Trigger)).reshape(Blocks.shape[0], -1)
+            Matrices["Pressed"] = Pressed
+            Matrices["Responded"] = (Keys.codes >= 0).reshape(Blocks.shape[0], -1)
+        else:
+            Matrices[Column] = Blocks[:, Pos, :].astype(float)
+    if Pressed is not None:
+        for Column in Masked:
+            if Column in Matrices:
+                Matrices[Column] = np.where(Pressed, Matrices[Column], np.nan)
+    return Matrices
+
+def dispersion(Values, Axis=-2, DDof=0):
+    """
+    dispersion - mean, SD, SEM and N of each trial position, NaN left out
+
+    Parameters
+    ----------
+    Values : Numpy array
+        Rows x trials, or any stack of them (e.g. conditions x rows x
+        trials).
+    Axis : Int
+        Axis of the rows (the one summarised over).
+    DDof : Int
+        Delta degrees of freedom of the SD (0 as np.std, 1 for the sample SD).
+
+    Returns
+    -------
+    Spread : Dict of {"Mean", "SD", "SEM", "N": numpy array}
+        Values' shape without Axis. Trial positions with no values (or not
+        more than DDof) are NaN, N is 0 there.
+
+    """
+    Values = np.asarray(Values, dtype=float)
+    N = np.count_nonzero(~np.isnan(Values), axis=Axis)
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+        # All NaN trial positions just give NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        Mean = np.nanmean(Values, axis=Axis)
+        SD = np.nanstd(Values, axis=Axis, ddof=DDof)
+        SEM = SD / np.sqrt(N)
+    return {"Mean": Mean, "SD": SD, "SEM": SEM, "N": N}
+
+def markerSizes(Spread, Scale=1, Power=1, Base=10):
+    """
+    markerSizes - scatter dot sizes, Base / (Scale * Spread) ** Power
+
+    Parameters
+    ----------
+    Spread : Numpy array
+        SD (or SEM) of each point, e.g. dispersion(...)["SD"].
+    Scale, Power, Base : Floats or numpy arrays
+        Broadcast against Spread, so e.g. each condition (row) can have its
+        own Power.
+
+    Returns
+    -------
+    Numpy array of sizes, NaN where Spread is NaN (no dot)
+
+    """
+    with np.errstate(divide="ignore"):
+        return Base / np.power(Scale * np.asarray(Spread, dtype=float), Power)
@@ -0,0 +1,125 @@
+# Trial Schedule
+#
+# Annotates each trial with where it sat in the experiment's schedule- its
+# block, its position within the block and how many trials since the last
+# pause. The schedule is declared in the experiment's layout (TrialLayouts,
+# e.g. TW = blocks of 17 trials with pauses after 5, 5, 5 and 2), rather than
+# rebuilt in each analysis script with np.append once per block.
+#
+# The pause pattern of one block is built once with np.repeat and tiled over
+# every block with np.tile, so the whole column is made in O(n). Before that
+# the data is checked against the session boundaries- each session's rows
+# have to be together and a whole number of blocks long, and its TrialNumber
+# has to run 0, 1, 2... So a session with missing or extra trials raises an
+# error instead of shifting the pattern for every session after it.
+#
+# Annotate straight after loading, before any rows are filtered out-
+#   AllData = LoadSessions.loadSessions(DataLocation, "TW", PartInitials)
+#   AllData = TrialSchedule.annotate(AllData, "TW")
+
+import numpy as np
+import pandas as pd
+
+import TrialLayouts
+
+def getSchedule(Schedule):
+    """
+    getSchedule - look up an experiment's schedule (schedule dicts are
+                  passed through) and check it
+    """
+    if not isinstance(Schedule, dict):
+        Name = Schedule
+        Schedule = TrialLayouts.getLayout(Name).get("Schedule")
+        if Schedule is None:
+            raise KeyError(f"The {Name} layout has no schedule")
+    if sum(Schedule["Pauses"]) != Schedule["BlockLength"]:
+        raise ValueError(f"Pauses {Schedule['Pauses']} don't add up to the block length "
+                         f"({Schedule['BlockLength']})")
+    return Schedule
+
+def blockPattern(Schedule):
+    """
+    blockPattern - trials since the last pause (1 = first trial after a
+                   pause) for each trial of one block
+
+    Parameters
+    ----------
+    Schedule : String or Dict
+        Layout name or schedule dict.
+
+    Returns
+    -------
+    Numpy array of ints, BlockLength long. E.g. pauses [5, 5, 5, 2] give
+    1 2 3 4 5 1 2 3 4 5 1 2 3 4 5 1 2
+
+    """
+    Pauses = np.asarray(getSchedule(Schedule)["Pauses"])
+    Starts = np.cumsum(Pauses) - Pauses
+    return np.arange(Pauses.sum()) - np.repeat(Starts, Pauses) + 1
+
+def sessionLengths(Sessions):
+    """
+    sessionLengths - number of rows in each session, checking every
+                     session's rows are together
+
+    Parameters
+    ----------
+    Sessions : Pandas Series
+        Session of each row.
+
+    Returns
+    -------
+    Names : Numpy array
+        Sessions in the order they come.
+    Lengths : Numpy array of ints
+
+    """
+    Codes, Names = pd.factorize(Sessions, sort=False)
+    if (Codes < 0).any():
+        raise ValueError("Some rows have no session")
+    Starts = np.flatnonzero(np.diff(Codes, prepend=-1))
+    if len(Starts) != len(Names):
+        Split = Names[np.flatnonzero(np.bincount(Codes[Starts]) > 1)]
+        raise ValueError(f"Rows of sessions {list(Split)} aren't together, annotate before sorting the data")
+    return np.asarray(Names), np.diff(np.append(Starts, len(Codes)))
+
+def annotate(Data, Schedule, By="Session"):
+    """
+    annotate - adds the block and pause position of every trial
+
+    Parameters
+    ----------
+    Data : Pandas Dataframe
+        Tidy data as loaded (every trial of each session, in order).
+    Schedule : String or Dict
+        Layout name (e.g. "TW") or schedule dict.
+    By : String
+        Column holding the session.
+
+    Returns
+    -------
+    Data : Pandas Dataframe
+        With Block (block within the session, from 0), BlockTrial (trial
+        within the block, from 0) and PauseInt (trials since the last pause,
+        from 1) columns.
+
+    """
+    Schedule = getSchedule(Schedule)
+    BlockLength = Schedule["BlockLength"]
+    Names, Lengths = sessionLengths(Data[By])
+    Uneven = Lengths % BlockLength != 0
+    if Uneven.any():
+        Bad = ", ".join(f"{x} ({y} trials)" for x, y in zip(Names[Uneven], Lengths[Uneven]))
+        raise ValueError(f"Sessions that aren't whole blocks of {BlockLength} trials: {Bad}")
+
+    # Position in the session, restarting at each session boundary
+    Position = np.arange(len(Data)) - np.repeat(np.cumsum(Lengths) - Lengths, Lengths)
+    if "TrialNumber" in Data and not np.array_equal(Data["TrialNumber"].to_numpy(), Position):
+        raise ValueError("TrialNumber doesn't run 0, 1, 2... within each session, annotate before "
+                         "filtering or sorting the data")
+
+    Data["Block"] = Position // BlockLength
+    Data["BlockTrial"] = Position % BlockLength
+    # Every session is whole blocks, so one pattern per block end to end
+    Data["PauseInt"] = np.tile(blockPattern(Schedule), len(Data) // BlockLength)
+    return Data
@@ -0,0 +1,136 @@
+# Trigger Rates
+#
+# Trigger rate at each trial position (presentation number) with a
+# confidence interval, for the over time analyses. The denominator is the
+# number of rows (runs) that actually have a response at that position, so
+# there's nothing to edit when a participant has more or fewer sessions, and
+# the rates are proportions (floats) rather than truncated integer percents.
+#
+# Rows are put into groups (e.g. contrast level, or participant x contrast
+# level as tuples) by a label per row, and every group's counts come from one
+# product of a group indicator matrix with the pressed and valid matrices, so
+# all conditions and participants are done at once whatever the group sizes.
+#
+# Intervals-
+#   "wilson"          : Wilson score interval (closed form)
+#   "clopper-pearson" : exact binomial interval (needs scipy)
+#
+# From an analysis script-
+#   Matrices = TrialMatrix.trialMatrices(AllFileNames, "TW")
+#   Rates = TriggerRates.triggerRates(Matrices["Pressed"], Matrices["Responded"],
+#                                     Matrices["ContrastLevel"][:, 0])
+#   Rates["Rate"]  # groups x trials, Rates["Groups"] gives the group of each row
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+Methods = ("wilson", "clopper-pearson")
+
+def interval(Triggered, N, Method="wilson", Level=0.95):
+    """
+    interval - confidence interval of Triggered / N
+
+    Parameters
+    ----------
+    Triggered, N : Numpy arrays
+        Number of triggers and of valid trials (broadcast together).
+    Method : String
+        "wilson" or "clopper-pearson".
+    Level : Float
+        Coverage of the interval.
+
+    Returns
+    -------
+    Lower, Upper : Numpy arrays
+        NaN where N is 0.
+
+    """
+    if Method not in Methods:
+        raise ValueError(f"Unknown interval {Method}, use one of {Methods}")
+    Triggered = np.asarray(Triggered, dtype=float)
+    N = np.asarray(N, dtype=float)
+    Alpha = 1 - Level
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if Method == "wilson":
+            Z = NormalDist().inv_cdf(1 - Alpha / 2)
+            Centre = (Triggered + Z ** 2 / 2) / (N + Z ** 2)
+            Half = Z / (N + Z ** 2) * np.sqrt(Triggered * (N - Triggered) / N + Z ** 2 / 4)
+            Lower, Upper = Centre - Half, Centre + Half
+        else:
+            # scipy.stats is slow to import, so it is only loaded when it's used
+            from scipy import stats
+            Lower = np.where(Triggered > 0, stats.beta.ppf(Alpha / 2, Triggered, N - Triggered + 1), 0)
+            Upper = np.where(Triggered < N, stats.beta.ppf(1 - Alpha / 2, Triggered + 1, N - Triggered), 1)
+    Empty = N == 0
+    return np.where(Empty, np.nan, np.clip(Lower, 0, 1)), np.where(Empty, np.nan, np.clip(Upper, 0, 1))
+
+def groupCodes(Groups):
+    """
+    groupCodes - group code of each row and the group labels, sorted. A label
+                 per row can be a value (e.g. contrast level) or a tuple (e.g.
+                 participant x contrast level), a dataframe gives a tuple of
+                 its columns per row.
+
+    Returns
+    -------
+    Codes : Numpy array of ints
+    Labels : List, tuples for several key columns
+
+    """
+    if isinstance(Groups, pd.DataFrame):
+        Index = pd.MultiIndex.from_frame(Groups)
+    else:
+        Groups = list(Groups)
+        if Groups and isinstance(Groups[0], tuple):
+            Index = pd.MultiIndex.from_tuples(Groups)
+        else:
+            Index = pd.Index(Groups)
+    Codes, Labels = Index.factorize(sort=True)
+    return Codes, list(Labels)
+
+def triggerRates(Pressed, Valid=None, Groups=None, Method="wilson", Level=0.95):
+    """
+    triggerRates - trigger rate and interval at each trial position of each
+                   group of rows
+
+    Parameters
+    ----------
+    Pressed : 2d numpy array of bools
+        Rows x trials, True where the wave was triggered.
+    Valid : 2d numpy array of bools or None
+        Rows x trials, True where there's a response to count (e.g.
+        TrialMatrix's Responded). None counts every trial.
+    Groups : Array like, list of tuples, Pandas Dataframe or None
+        Group label of each row, e.g. its contrast level, or (participant,
+        contrast level) tuples. None puts every row in one group.
+    Method : String
+        "wilson" or "clopper-pearson".
+    Level : Float
+        Coverage of the interval.
+
+    Returns
+    -------
+    Rates : Dict
+        "Groups" : list of the group labels, sorted, tuples for several key
+                   columns (one row of each array per group)
+        "Triggered", "N" : counts of triggers and valid trials, groups x trials
+        "Rate", "Lower", "Upper" : proportion and its interval (NaN where N
+                                   is 0), groups x trials
+
+    """
+    Pressed = np.asarray(Pressed, dtype=bool)
+    Valid = np.ones(Pressed.shape, dtype=bool) if Valid is None else np.asarray(Valid, dtype=bool)
+    if Groups is None:
+        Codes, Labels = np.zeros(len(Pressed), dtype=np.intp), [None]
+    else:
+        Codes, Labels = groupCodes(Groups)
+    # Groups x rows, so the counts of every group are one matrix product
+    Indicator = (Codes == np.arange(len(Labels))[:, None]).astype(np.int64)
+    Triggered = Indicator @ (Pressed & Valid).astype(np.int64)
+    N = Indicator @ Valid.astype(np.int64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Rate = np.where(N > 0, Triggered / N, np.nan)
+    Lower, Upper = interval(Triggered, N, Method, Level)
+    return {"Groups": Labels, "Triggered": Triggered, "N": N, "Rate": Rate, "Lower": Lower, "Upper": Upper}
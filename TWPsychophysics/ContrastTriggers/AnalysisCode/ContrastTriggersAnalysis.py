@@ -13,47 +13,36 @@
 
 # %% Initialisation
 
-import glob
-import pandas as pd
+import os
+import sys
 import numpy as np
 import seaborn as sns
-from scipy.stats import f_oneway
-from scipy.stats import ttest_ind
+
+# Shared file processing functions (FileProcessing folder at the top of the repo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../FileProcessing"))
+import LoadSessions
+import RTBaseline
+import BaselineCorrection
+import OutlierRejection
+import TrialSchedule
+import HypothesisTests
 
 # Get participant details and parameters
 PartInitials = "MS"
 Conditions = [0.9, 0.75, 0.6]
 
-FilePrefix = "TW_" + PartInitials + "*"
-
 DataLocation = '/home/rowanhuxley/Documents/Data_Various/BinRiv/Psychophysics/Data/ContrastTriggers/'
-SearchTxt = DataLocation + FilePrefix
 
 # %% Convert dataset to tidy data
 
-# Create list of all file names
-AllFileNames =  []
-for File in glob.glob(SearchTxt):
-    print(File)
-    CSVCheck = File.split(".")
-    if CSVCheck[1] == "csv":
-        AllFileNames.append(File)
-
-
-# Move dataframe into list to then concat together
-DataFrames = []
-for File in AllFileNames:
-    df = pd.read_csv(File)
-    df = df.reset_index()  # make sure indexes pair with number of rows
-    DataFrames.append(df)
-    
-AllData = pd.concat(DataFrames)
-
-AllData = AllData.rename(columns={"index": "TrialNumber", "Participant_Id": "ParticipantID", "Contrast_Level": "ContrastLevel", "Button_Pressed":"Direction","Response_Time":"ResponseTime"})
+# Read every session's csv into one dataframe (TrialNumber = trial within the
+# session, see FileProcessing/LoadSessions.py). Direction and ContrastLevel
+# come back as categories, so filtering/grouping compares codes
+AllData = LoadSessions.loadSessions(DataLocation, "TW", PartInitials)
 
-# Change the contrast levels to correct values
-AllData.loc[AllData["ContrastLevel"] == 0.899999976158, "ContrastLevel"] = 0.9
-AllData.loc[AllData["ContrastLevel"] == 0.600000023842, "ContrastLevel"] = 0.6
+# Change the contrast levels to correct values (just relabels the categories)
+AllData["ContrastLevel"] = AllData["ContrastLevel"].cat.rename_categories(
+    {0.899999976158: 0.9, 0.600000023842: 0.6})
 
 #cols = ['Participant]
 
@@ -61,77 +50,41 @@ AllData.loc[AllData["ContrastLevel"] == 0.600000023842, "ContrastLevel"] = 0.6
 
 # %% Subtract reaction time from response time
 
-RTPrefix = "RT_" + PartInitials + "*" 
-
 DataLocation = '/home/rowanhuxley/Documents/Data_Various/BinRiv/Psychophysics/Data/ContrastTriggers/'
-RTSearchTxt = DataLocation + RTPrefix
-
-
-# Create list of all file names
-RTAllFileNames =  []
-for File in glob.glob(RTSearchTxt):
-    CSVCheck = File.split(".")
-    if CSVCheck[1] == "csv":
-        RTAllFileNames.append(File)
-
-# Create list of all reaction times
-RTList = []
-for File in RTAllFileNames:
-    df = pd.read_csv(File)
-    df = df.reset_index()  # make sure indexes pair with number of rows
-    RTList.append(df)
 
-RTAll = pd.concat(RTList)
-RTAll = RTAll.rename(columns={"0": "ResponseTime"})
-# Generate mean reaction time
-RTMean = RTAll["ResponseTime"].mean()
+# Mean reaction time (worked out once from all the RT files and cached until
+# they change, see FileProcessing/RTBaseline.py)
+RTBaselines = RTBaseline.baselineTable(DataLocation, [PartInitials])
 
-# Subtract reaction time mean from all response time values
-PreResponseTime = AllData["ResponseTime"]
-
-def SubRT(x):
-    return x - RTMean
-    
-PostResponseTime = PreResponseTime.apply(SubRT)
-
-AllData["ResponseTime"] = PostResponseTime
-# Calculating propagated error (STILL TO DO)
+# Subtract reaction time mean from all response time values (whole column at
+# once, the RT SEM goes in BaselineSEM)
+AllData = BaselineCorrection.correct(AllData, RTBaselines)
 
 
 # %% Removing outliers (Also descriptives at each contrast level)
 
-# Get descriptives for each contrast level
-AllCorrect = (AllData[AllData['Direction'] == "right"])
-Descriptives = AllCorrect.groupby(["ContrastLevel"])["ResponseTime"].describe()
-
-# # Change all above 3sd into nan
-# print("\n")
-# print("Outliers Removed")
-# print("----------------")
-
- #0.9
-# print("0.9=")
-print(AllData.loc[(AllData["ContrastLevel"] == 0.9) & (AllData["ResponseTime"] > (Descriptives["mean"].iloc[0] + (Descriptives["std"].iloc[0] *2)))])
-AllData.loc[(AllData["ContrastLevel"] == 0.9) & (AllData["ResponseTime"] > (Descriptives["mean"].iloc[0] + (Descriptives["std"].iloc[0] *2)))] = np.nan
-# print("\n")
-
- #0.75
-# print("0.75=")
-print(AllData.loc[(AllData["ContrastLevel"] == 0.75) & (AllData["ResponseTime"] > (Descriptives["mean"].iloc[0] + (Descriptives["std"].iloc[0] *2)))])
-AllData.loc[(AllData["ContrastLevel"] == 0.75) & (AllData["ResponseTime"] > (Descriptives["mean"].iloc[0] + (Descriptives["std"].iloc[0] *2)))] = np.nan
-# print("\n")
-
- #0.6
-# print("0.6=")
-print(AllData.loc[(AllData["ContrastLevel"] == 0.6) & (AllData["ResponseTime"] > (Descriptives["mean"].iloc[0] + (Descriptives["std"].iloc[0] *2)))])
-AllData.loc[(AllData["ContrastLevel"] == 0.6) & (AllData["ResponseTime"] > (Descriptives["mean"].iloc[0] + (Descriptives["std"].iloc[0] *2)))] = np.nan
-# print("\n")
+# Change response times more than 2sd above the mean of their contrast level
+# into nan (mean/sd of the participant's "right" presses at that level, see
+# FileProcessing/OutlierRejection.py). The rest of the row is kept, Outlier and
+# OutlierReason say which trials went and why
+AllData = OutlierRejection.reject(AllData, ["ParticipantID", "ContrastLevel"], "sd", 2,
+                                  Reference=AllData["Direction"] == "right")
+
+print("Outliers Removed")
+print("----------------")
+print(OutlierRejection.summary(AllData, "ContrastLevel"))
+print(AllData[AllData["Outlier"]])
 
 # Get descriptives for each contrast level
 AllCorrect = (AllData[AllData['Direction'] == "right"])
-Descriptives = AllCorrect.groupby(["ContrastLevel"])["ResponseTime"].describe()
+Descriptives = AllCorrect.groupby(["ContrastLevel"], observed=True)["ResponseTime"].describe()
 Median = AllCorrect["ResponseTime"].median()
 
+# Propagated error once the outliers are out (SEM at each contrast level and
+# RT SEM in quadrature, PropagatedSEM)
+Errors = BaselineCorrection.propagatedError(AllCorrect, "ContrastLevel", RTBaselines)
+print(Errors)
+
 # %% Visualisation
 sns.set_theme()
 AllData = AllData.reset_index(drop=True)
@@ -169,17 +122,10 @@ Plot.set_axis_labels("Trial Number", "Response Time (s)")
 
 # Plot over time from pauses 
 
-a = np.linspace(1,5,5)
-b = np.linspace(1,5,5)
-c = np.linspace(1,5,5)
-d = np.linspace(1,2,2)
-LinPause = np.concatenate((a, b,c ,d), axis=None)
-
-PauseInt = np.array([])
-for x in range(int(len(AllData)/17)):
-    PauseInt = np.append(PauseInt,LinPause)
-
-AllData["PauseInt"] = PauseInt
+# Block, BlockTrial and PauseInt (trials since the last pause, 1-5) from the TW
+# schedule (blocks of 17 with pauses after 5, 5, 5 and 2, see
+# FileProcessing/TrialSchedule.py). Errors if a session isn't whole blocks
+AllData = TrialSchedule.annotate(AllData, "TW")
 
 PausesPlot = sns.catplot(data=AllData, x="PauseInt",
                    y="ResponseTime", kind="violin", height=8.27, aspect=15/8.27, col="ContrastLevel")
@@ -187,31 +133,23 @@ PausesPlot.set_axis_labels("Trial Number", "Response Time (s)")
 
 
 # Count the occurrences of values in column A
-counts = AllData.groupby(['Direction'])
+counts = AllData.groupby(['Direction'], observed=True)
 
-AllData.groupby('Direction').ContrastLevel.count()
-AllData.groupby(["ContrastLevel",'Direction']).ContrastLevel.agg([len])
+AllData.groupby('Direction', observed=True).ContrastLevel.count()
+AllData.groupby(["ContrastLevel",'Direction'], observed=True).ContrastLevel.agg([len])
 
-TriggerRatePlot = sns.catplot(data=AllData.groupby(["ContrastLevel",'Direction']).ContrastLevel.agg([len]), x="ContrastLevel", y= "len", kind="bar",hue='Direction')
+TriggerRatePlot = sns.catplot(data=AllData.groupby(["ContrastLevel",'Direction'], observed=True).ContrastLevel.agg([len]), x="ContrastLevel", y= "len", kind="bar",hue='Direction')
 TriggerRatePlot.set(ylim=(0, 180))
 TriggerRatePlot.set_axis_labels("Contrast Level", "Number of occurrances")
 
 
 
-# Group the data by contrast level and get response times
-group1 = AllData[AllData['ContrastLevel'] == 0.6]["ResponseTime"]
-group2 = AllData[AllData['ContrastLevel'] == 0.75]["ResponseTime"]
-group3 = AllData[AllData['ContrastLevel'] == 0.9]["ResponseTime"]
-
-# Perform ANOVA to test for significant differences between group means
-f, p = f_oneway(group1, group2, group3)
+# ANOVA across the contrast levels and a t-test between each pair of them
+# (Holm corrected), all in one table (see FileProcessing/HypothesisTests.py)
+Tests = HypothesisTests.compare(AllData, "ContrastLevel")
+print(Tests)
 
-if p < 0.05:
+if Tests.xs("anova", level="Test")["P"].iloc[0] < 0.05:
     print('Reject null hypothesis: at least one group mean is different')
 else:
     print('Fail to reject null hypothesis: all group means are the same')
-    
-    
-ttest_ind(group1, group2)
-ttest_ind(group2, group3)
-ttest_ind(group3, group1)
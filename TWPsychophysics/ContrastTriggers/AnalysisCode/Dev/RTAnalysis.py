@@ -1,57 +1,39 @@
-import glob
+import os
+import sys
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy import stats
 import math as math
 
+# Shared file processing functions (FileProcessing folder at the top of the repo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../FileProcessing"))
+import LoadSessions
+import RTBaseline
+import BaselineCorrection
+
 # Get participant details and parameters
 PartInitials = "RH"
 Conditions = [0.9, 0.75, 0.6]
 
-FilePrefix = "TW_" + PartInitials + "*"
-
 DataLocation = '/home/rowanhuxley/Documents/Data_Various/BinRiv/Psychophysics/Contrast-Triggers/Data/'
-SearchTxt = DataLocation + FilePrefix
 
 # %%
 # Travel time analysis
 
-# Create list of all file names
-AllFileNames =  []
-for File in glob.glob(SearchTxt):
-    AllFileNames.append(File)
-    
-# Create list of all data rows
-SepSeries = []
-
-for File in AllFileNames:
-    df = pd.read_excel(File)
-    df = df.reset_index()  # make sure indexes pair with number of rows
-    for index, row in df.iterrows():
-        row.pop("index")
-        row.pop("ContrastLevel_mean")
-        row.pop("ContrastLevel_std")
-        TravelTimeMean = row.pop("TravelTime_mean")
-        TravelTimeSd = row.pop("TravelTime_std")
-        SepSeries.append(row)
-
-
-# Seperate each real column to seperate series
-ContLevel = pd.Series()
-ButtonPress = pd.Series()
-ReactionTime = pd.Series()
-for x in SepSeries:
-    ContLevel = pd.concat([ContLevel, x.iloc[1:18]])
-    ButtonPress = pd.concat([ButtonPress, x.iloc[18:35]])
-    ReactionTime = pd.concat([ReactionTime, x.iloc[35:52]])
+# Read every session's workbook into one tidy dataframe (see
+# FileProcessing/LoadSessions.py) and pull out each column
+AllData = LoadSessions.loadSessions(DataLocation, "TW", PartInitials, Source="xlsx")
+ContLevel = AllData["ContrastLevel"].astype(float)
+ButtonPress = AllData["Direction"]
+ReactionTime = AllData["ResponseTime"]
 
 
 # Create list of response times that were true 
 ReactionTimeTrue = []
 ContLevelsTrue = []
 for x in range(ReactionTime.size):
-    if ButtonPress.iloc[x] == "['right']":
+    if ButtonPress.iloc[x] == "right":
         ReactionTimeTrue.append(ReactionTime.iloc[x])
         ContLevelsTrue.append(round(ContLevel.iloc[x], 1))
         
@@ -71,42 +53,20 @@ for x in range(len(ReactionTimeTrue)):
 # %%
 # Reaction time anaysis
 
-RTPrefix = "RT_" + PartInitials + "*"
-
 DataLocation = '/home/rowanhuxley/Documents/Data_Various/BinRiv/Psychophysics/Contrast-Triggers/Data/'
-RTSearchTxt = DataLocation + RTPrefix
-
-
-# Create list of all file names
-RTAllFileNames =  []
-for File in glob.glob(RTSearchTxt):
-    RTAllFileNames.append(File)
-
-# Create list of all reaction times
-RTAll = []
-for File in RTAllFileNames:
-    df = pd.read_excel(File)
-    df = df.reset_index()  # make sure indexes pair with number of rows
-    for index, row in df.iterrows():
-        row.pop("index")
-        row.pop("n")
-        row.pop("RT_mean")
-        row.pop("RT_std")
-        for x in range(row.size):
-            RTAll.append(float(row.iloc[x]))
-
-# Get mean and std 
-RTMean = float(np.nanmean(RTAll))
-RTSE = stats.sem(RTAll)
-
-# Calculating propagated error
-TW9SE = stats.sem(TW9)
-TW75SE = stats.sem(TW75)
-TW6SE = stats.sem(TW6)
-
-TW9SEP = math.sqrt((TW9SE ** 2) + (RTSE ** 2))
-TW75SEP = math.sqrt((TW75SE ** 2) + (RTSE ** 2))
-TW6SEP = math.sqrt((TW6SE ** 2) + (RTSE ** 2))
+
+# Reaction time mean and standard error from the workbooks (cached until the
+# RT files change, see FileProcessing/RTBaseline.py)
+RTBaselines = RTBaseline.rtBaseline(DataLocation, PartInitials, Source="xlsx")
+RTMean = RTBaselines["Mean"]
+RTSE = RTBaselines["SEM"]
+
+# Calculating propagated error, SEM at each contrast level and RT SEM in
+# quadrature for all the levels at once (see FileProcessing/BaselineCorrection.py).
+# Contrast levels come out low to high
+RTTable = RTBaseline.baselineTable(DataLocation, [PartInitials], "xlsx")
+Errors = BaselineCorrection.propagatedError(AllData[AllData["Direction"] == "right"], "ContrastLevel", RTTable)
+TW6SEP, TW75SEP, TW9SEP = Errors["PropagatedSEM"]
 
 # Subtract RT from all TW values
 TW9 = [x - RTMean for x in TW9]
@@ -138,7 +98,7 @@ Time = np.linspace(1, 158, 158)
 # Count number of trigger waves (.count isnt working so had to do this...)
 ButtonPressTrue=[]
 for x in range(ButtonPress.size):
-    if ButtonPress.iloc[x] == "['right']":
+    if ButtonPress.iloc[x] == "right":
         ButtonPressTrue.append(1)
     else:
         ButtonPressTrue.append(0)
@@ -273,6 +233,8 @@ f.text(0, 0.83, 'B', fontsize=15, fontweight='bold', va='top', ha='right')
 # Test for normality
 print(stats.shapiro(TW9))
 print(stats.shapiro(TW75))
+RTAll = LoadSessions.loadSessions(DataLocation, "RT", PartInitials, Columns=["ResponseTime"],
+                                  Source="xlsx")["ResponseTime"]
 print(stats.shapiro(RTAll))
 
 
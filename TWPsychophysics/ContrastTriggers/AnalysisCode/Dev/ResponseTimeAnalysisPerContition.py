@@ -13,128 +13,66 @@
 
 # %% Initialisation
 
-import glob
+import os
+import sys
 import pandas as pd
 import numpy as np
 from scipy import stats
 import seaborn as sns
 
+# Shared file processing functions (FileProcessing folder at the top of the repo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../FileProcessing"))
+import LoadSessions
+import RTBaseline
+import BaselineCorrection
+
 # Get participant details and parameters
 PartInitials = "RH"
 Conditions = [0.9, 0.75, 0.6]
 
-FilePrefix = "TW_" + PartInitials + "*"
-
 DataLocation = '/home/rowanhuxley/Documents/Data_Various/BinRiv/Psychophysics/Contrast-Triggers/Data/'
-SearchTxt = DataLocation + FilePrefix
 
 # %% Convert dataset to tidy data
 
-# Create list of all file names
-AllFileNames =  []
-for File in glob.glob(SearchTxt):
-    AllFileNames.append(File)
-    
-# Create list of all data rows
-SepSeries = []
-
-for File in AllFileNames:
-    df = pd.read_excel(File)
-    df = df.reset_index()  # make sure indexes pair with number of rows
-    for index, row in df.iterrows():
-        row.pop("index")
-        row.pop("ContrastLevel_mean")
-        row.pop("ContrastLevel_std")
-        TravelTimeMean = row.pop("TravelTime_mean")
-        TravelTimeSd = row.pop("TravelTime_std")
-        SepSeries.append(row)
-
-
-# Seperate each real column to seperate series
-ContLevel = pd.Series(name = "Contrast Level")
-ButtonPress = pd.Series(name = "Button_Pressed")
-ResponseTime = pd.Series(name = "Response_Time")
-for x in SepSeries:
-    ContLevel = pd.concat([ContLevel, x.iloc[1:18]])
-    ButtonPress = pd.concat([ButtonPress, x.iloc[18:35]])
-    ResponseTime = pd.concat([ResponseTime, x.iloc[35:52]])
-
-## Create dataframe with each row being a trial
-# Issues with duplicate labels so have to change series to np array
-ContLevel = ContLevel.to_numpy()
-ButtonPress = ButtonPress.to_numpy()
-ResponseTime = ResponseTime.to_numpy()
-
-# Create 1d Numpy array of participant intials
-PartInits = np.full(len(ContLevel), PartInitials)
-
-# Recombine data into tidy format
-ColumnLabels = ["Participant_Id", "Contrast_Level", "Button_Pressed", "Response_Time"]
-AllData = pd.DataFrame([PartInits, ContLevel, ButtonPress, ResponseTime], index = ColumnLabels)
-AllData = AllData.transpose()
-
-# Change the contrast levels to correct values
-AllData.loc[AllData["Contrast_Level"] == 0.899999976158, "Contrast_Level"] = 0.9
-AllData.loc[AllData["Contrast_Level"] == 0.600000023842, "Contrast_Level"] = 0.6
-
-# Add column for trial number
-
-LinTrials = np.linspace(1,17,17)
-TrialNumbers = np.array([])
-for x in range(int(len(AllData)/17)):
-    TrialNumbers = np.append(TrialNumbers,LinTrials)
-
-AllData["Trial_Number"] = TrialNumbers
+# Read every session's workbook into one tidy dataframe (see
+# FileProcessing/LoadSessions.py)
+AllData = LoadSessions.loadSessions(DataLocation, "TW", PartInitials, Source="xlsx")
 
-# %% Subtract reaction time from response time
+# Change the contrast levels to correct values (just relabels the categories)
+AllData["ContrastLevel"] = AllData["ContrastLevel"].cat.rename_categories(
+    {0.899999976158: 0.9, 0.600000023842: 0.6})
+
+# Add column for trial number (1-17 within each block)
+AllData["Trial_Number"] = AllData["TrialNumber"] % 17 + 1
 
-RTPrefix = "RT_" + PartInitials + "*"
+AllData = AllData.rename(columns={"ParticipantID": "Participant_Id", "ContrastLevel": "Contrast_Level",
+                                  "Direction": "Button_Pressed", "ResponseTime": "Response_Time"})
+
+# %% Subtract reaction time from response time
 
 DataLocation = '/home/rowanhuxley/Documents/Data_Various/BinRiv/Psychophysics/Contrast-Triggers/Data/'
-RTSearchTxt = DataLocation + RTPrefix
-
-
-# Create list of all file names
-RTAllFileNames =  []
-for File in glob.glob(RTSearchTxt):
-    RTAllFileNames.append(File)
-
-# Create list of all reaction times
-RTAll = []
-for File in RTAllFileNames:
-    df = pd.read_excel(File)
-    df = df.reset_index()  # make sure indexes pair with number of rows
-    for index, row in df.iterrows():
-        row.pop("index")
-        row.pop("n")
-        row.pop("RT_mean")
-        row.pop("RT_std")
-        for x in range(row.size):
-            RTAll.append(float(row.iloc[x]))
-
-# Get mean and std 
-RTMean = float(np.nanmean(RTAll))
-RTSE = stats.sem(RTAll)
-
-# Subtract reaction time mean from all response time values
-PreResponseTime = AllData["Response_Time"]
-
-def SubRT(x):
-    return x - RTMean
-    
-PostResponseTime = PreResponseTime.apply(SubRT)
 
-AllData["Response_Time"] = PostResponseTime
+# Reaction time mean and standard error from the workbooks (cached until the
+# RT files change, see FileProcessing/RTBaseline.py)
+RTBaselines = RTBaseline.baselineTable(DataLocation, [PartInitials], Source="xlsx")
+RTBaselines = RTBaselines.rename_axis("Participant_Id")
+
+# Subtract reaction time mean from all response time values (whole column at
+# once)
+AllData = BaselineCorrection.correct(AllData, RTBaselines, Column="Response_Time")
 
-# Calculating propagated error (STILL TO DO)
+# Calculating propagated error (SEM at each contrast level and RT SEM in
+# quadrature, PropagatedSEM)
+Errors = BaselineCorrection.propagatedError(AllData[AllData["Button_Pressed"] == "right"], "Contrast_Level",
+                                            RTBaselines, Column="Response_Time")
 
 
 
 # %% Removing outliers (Also descriptives at each contrast level)
 
 # Get descriptives for each contrast level
-AllCorrect = (AllData[AllData['Button_Pressed'] == "['right']"])
-Descriptives = AllCorrect.groupby(["Contrast_Level"])["Response_Time"].describe()
+AllCorrect = (AllData[AllData['Button_Pressed'] == "right"])
+Descriptives = AllCorrect.groupby(["Contrast_Level"], observed=True)["Response_Time"].describe()
 
 # Change all above 3sd into nan
 print("\n")
@@ -163,15 +101,15 @@ print("\n")
 # %% Visualisation
 sns.set_theme()
 # KDE plot
-sns.displot(data=AllData[AllData.Button_Pressed == "['right']"], x="Response_Time", 
+sns.displot(data=AllData[AllData.Button_Pressed == "right"], x="Response_Time", 
             hue='Contrast_Level', kind='kde', palette="pastel")
 
 # Violin plot
-sns.catplot(data=AllData[AllData.Button_Pressed == "['right']"], kind="violin", 
+sns.catplot(data=AllData[AllData.Button_Pressed == "right"], kind="violin", 
             x="Contrast_Level", y="Response_Time", palette="pastel")
 
 # Box plot
-sns.catplot(data=AllData[AllData.Button_Pressed == "['right']"], kind="box", 
+sns.catplot(data=AllData[AllData.Button_Pressed == "right"], kind="box", 
             x="Contrast_Level", y="Response_Time", palette="pastel")
 
 
@@ -1,5 +1,6 @@
 # A temp file where I move the data into a tidy format
-import glob
+import os
+import sys
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -10,59 +11,29 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import PolynomialFeatures
 from sklearn.linear_model import LinearRegression
 
+# Shared file processing functions (FileProcessing folder at the top of the repo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../../FileProcessing"))
+import LoadSessions
+import RTBaseline
+import BaselineCorrection
+
 # Get participant details and parameters
 PartInitials = "RH"
 Conditions = [0.9, 0.75, 0.6]
 
-FilePrefix = "TW_" + PartInitials + "*"
-
 DataLocation = '/home/rowanhuxley/Documents/Data_Various/BinRiv/Psychophysics/Contrast-Triggers/Data/'
-SearchTxt = DataLocation + FilePrefix
 
 # %% Travel time analysis
 
-# Create list of all file names
-AllFileNames =  []
-for File in glob.glob(SearchTxt):
-    AllFileNames.append(File)
-    
-# Create list of all data rows
-SepSeries = []
-
-for File in AllFileNames:
-    df = pd.read_excel(File)
-    df = df.reset_index()  # make sure indexes pair with number of rows
-    for index, row in df.iterrows():
-        row.pop("index")
-        row.pop("ContrastLevel_mean")
-        row.pop("ContrastLevel_std")
-        TravelTimeMean = row.pop("TravelTime_mean")
-        TravelTimeSd = row.pop("TravelTime_std")
-        SepSeries.append(row)
-
-
-# Seperate each real column to seperate series
-ContLevel = pd.Series(name = "Contrast Level")
-ButtonPress = pd.Series(name = "Button_Pressed")
-ResponseTime = pd.Series(name = "Response_Time")
-for x in SepSeries:
-    ContLevel = pd.concat([ContLevel, x.iloc[1:18]])
-    ButtonPress = pd.concat([ButtonPress, x.iloc[18:35]])
-    ResponseTime = pd.concat([ResponseTime, x.iloc[35:52]])
-
-## Create dataframe with each row being a trial
-# Issues with duplicate labels so have to change series to np array
-ContLevel = ContLevel.to_numpy()
-ButtonPress = ButtonPress.to_numpy()
-ResponseTime = ResponseTime.to_numpy()
-
-# Create 1d Numpy array of participant intials
-PartInits = np.full(len(ContLevel), PartInitials)
-
-# Recombine data into tidy format
-ColumnLabels = ["Participant_Id", "Contrast_Level", "Button_Pressed", "Response_Time"]
-AllData = pd.DataFrame([PartInits, ContLevel, ButtonPress, ResponseTime], index = ColumnLabels)
-AllData = AllData.transpose()
+# Read every session's workbook into one tidy dataframe (see
+# FileProcessing/LoadSessions.py) and pull out each column
+AllData = LoadSessions.loadSessions(DataLocation, "TW", PartInitials, Source="xlsx")
+ContLevel = AllData["ContrastLevel"].astype(float)
+ButtonPress = AllData["Direction"]
+ResponseTime = AllData["ResponseTime"]
+
+AllData = AllData.rename(columns={"ParticipantID": "Participant_Id", "ContrastLevel": "Contrast_Level",
+                                  "Direction": "Button_Pressed", "ResponseTime": "Response_Time"})
 
 
 # Create list of response times that were true at each contrast level
@@ -76,7 +47,7 @@ TW6 = []
 ReactionTimeTrue = []
 ContLevelsTrue = []
 for x in range(ResponseTime.size):
-    if ButtonPress.iloc[x] == "['right']":
+    if ButtonPress.iloc[x] == "right":
         ReactionTimeTrue.append(ResponseTime.iloc[x])
         ContLevelsTrue.append(round(ContLevel.iloc[x], 1))
         
@@ -96,42 +67,22 @@ for x in range(len(ReactionTimeTrue)):
 # %%
 # Reaction time anaysis
 
-RTPrefix = "RT_" + PartInitials + "*"
-
 DataLocation = '/home/rowanhuxley/Documents/Data_Various/BinRiv/PsychophysicsGeneral/data/'
-RTSearchTxt = DataLocation + RTPrefix
-
-
-# Create list of all file names
-RTAllFileNames =  []
-for File in glob.glob(RTSearchTxt):
-    RTAllFileNames.append(File)
-
-# Create list of all reaction times
-RTAll = []
-for File in RTAllFileNames:
-    df = pd.read_excel(File)
-    df = df.reset_index()  # make sure indexes pair with number of rows
-    for index, row in df.iterrows():
-        row.pop("index")
-        row.pop("n")
-        row.pop("RT_mean")
-        row.pop("RT_std")
-        for x in range(row.size):
-            RTAll.append(float(row.iloc[x]))
-
-# Get mean and std 
-RTMean = float(np.nanmean(RTAll))
-RTSE = stats.sem(RTAll)
-
-# Calculating propagated error
-TW9SE = stats.sem(TW9)
-TW75SE = stats.sem(TW75)
-TW6SE = stats.sem(TW6)
-
-TW9SEP = math.sqrt((TW9SE ** 2) + (RTSE ** 2))
-TW75SEP = math.sqrt((TW75SE ** 2) + (RTSE ** 2))
-TW6SEP = math.sqrt((TW6SE ** 2) + (RTSE ** 2))
+
+
+# Reaction time mean and standard error from the workbooks (cached until the
+# RT files change, see FileProcessing/RTBaseline.py)
+RTBaselines = RTBaseline.rtBaseline(DataLocation, PartInitials, Source="xlsx")
+RTMean = RTBaselines["Mean"]
+RTSE = RTBaselines["SEM"]
+
+# Calculating propagated error, SEM at each contrast level and RT SEM in
+# quadrature for all the levels at once (see FileProcessing/BaselineCorrection.py).
+# Contrast levels come out low to high
+RTTable = RTBaseline.baselineTable(DataLocation, [PartInitials], "xlsx").rename_axis("Participant_Id")
+Errors = BaselineCorrection.propagatedError(AllData[AllData["Button_Pressed"] == "right"], "Contrast_Level",
+                                            RTTable, Column="Response_Time")
+TW6SEP, TW75SEP, TW9SEP = Errors["PropagatedSEM"]
 
 # Subtract RT from all TW values
 TW9 = [x - RTMean for x in TW9]
@@ -141,7 +92,7 @@ TW6 = [x - RTMean for x in TW6]
 AllDataTrue = [TW9, TW75, TW6]
 
 
-print(np.std(RTAll))
+print(RTBaselines["SD"])
 
 # %%
 
@@ -162,7 +113,7 @@ Time = np.linspace(1, 158, 158)
 # Count number of trigger waves (.count isnt working so had to do this...)
 ButtonPressTrue=[]
 for x in range(ButtonPress.size):
-    if ButtonPress.iloc[x] == "['right']":
+    if ButtonPress.iloc[x] == "right":
         ButtonPressTrue.append(1)
     else:
         ButtonPressTrue.append(0)
@@ -297,6 +248,8 @@ f.text(0, 0.83, 'B', fontsize=15, fontweight='bold', va='top', ha='right')
 # Test for normality
 print(stats.shapiro(TW9))
 print(stats.shapiro(TW75))
+RTAll = LoadSessions.loadSessions(DataLocation, "RT", PartInitials, Columns=["ResponseTime"],
+                                  Source="xlsx")["ResponseTime"]
 print(stats.shapiro(RTAll))
 
 
@@ -268,6 +268,19 @@ else:
         Writer.writerow(["ParticipantID", "ContrastLevel", "Direction", "ResponseTime"])
         for x in range(len(ResponseTime)):
             Writer.writerow([params['Observer'], ContrastLevel[x], Direction[x], ResponseTime[x]])
+    # Add the session to the lab session store (FileProcessing/SessionStore.py,
+    # found from this file's folder so it works from any working directory).
+    # If it can't be added the session is still in the csv, and why is printed
+    import os
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../FileProcessing'))
+    try:
+        import SessionStore
+        SessionStore.addCSV('./data/Sessions.sqlite', FileName, 'TW')
+    except Exception:
+        import traceback
+        print('Session not added to the session store (it is saved in ' + FileName + '):')
+        traceback.print_exc()
 #Close screen
 winL.close()
 winR.close()
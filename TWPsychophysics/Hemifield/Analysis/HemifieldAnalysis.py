@@ -12,79 +12,47 @@
 
 # %% Initialisation
 
-import glob
+import os
+import sys
 import pandas as pd
 import numpy as np
 from scipy import stats
 import seaborn as sns
 from scipy.stats import f_oneway
-from scipy.stats import ttest_ind
+
+# Shared file processing functions (FileProcessing folder at the top of the repo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../../FileProcessing"))
+import LoadSessions
+import RTBaseline
+import BaselineCorrection
+import OutlierRejection
+import HypothesisTests
 
 # Participant details and parameters(Maybe change to input fields with default)
 PartInitials = "RH"
 Conditions = ['Left', 'Right']
 
-FilePrefix = "HF_" + PartInitials + "*"
-
 DataLocation = '/home/rowanhuxley/Documents/Data_Various/BinRiv/Psychophysics/Hemifield/Data/'
-SearchTxt = DataLocation + FilePrefix
 
 # %% Read in data and make one dataframe called "AllData" to work off
 
-# Create list of all file names
-AllFileNames =  []
-for File in glob.glob(SearchTxt):
-    CSVCheck = File.split(".")
-    if CSVCheck[1] == "csv":
-        AllFileNames.append(File)
-        
-DataFrames = []
-for File in AllFileNames:
-    df = pd.read_csv(File)
-    df = df.reset_index()  # make sure indexes pair with number of rows
-    DataFrames.append(df)
-    
-AllData = pd.concat(DataFrames)
+# Every session's csv in one dataframe (see FileProcessing/LoadSessions.py).
+# Direction and VisibleHemifield come back as categories, so filtering/grouping
+# compares codes
+AllData = LoadSessions.loadSessions(DataLocation, "HF", PartInitials)
 
 # %% Subtract reaction time from response time to give an estimate of true
 #    wave travel time 
 
-RTPrefix = "RT_" + PartInitials + "*"
-
 DataLocation = '/home/rowanhuxley/Documents/Data_Various/BinRiv/Psychophysics/Contrast-Triggers/Data/'
-RTSearchTxt = DataLocation + RTPrefix
-
-
-# Pull all reaction time files and concat into a main dataframe "RTAll"
-RTAllFileNames =  []
-for File in glob.glob(RTSearchTxt):
-    CSVCheck = File.split(".")
-    if CSVCheck[1] == "csv":
-        RTAllFileNames.append(File)
-
-RTAll = []
-for File in RTAllFileNames:
-    df = pd.read_csv(File)
-    df = df.reset_index()  # make sure indexes pair with number of rows
-    RTAll.append(df)
-    
-RTAll = pd.concat(RTAll)
 
-# Had an issue with a column name being 0 so this fixes that
-RTAll = RTAll.rename(columns={"0": "ResponseTime"})
+# Mean reaction time to subtract from main trial response times (worked out
+# once from all the RT files and cached until they change, see
+# FileProcessing/RTBaseline.py)
+RTBaselines = RTBaseline.baselineTable(DataLocation, [PartInitials])
 
-# Calculate mean reaction time to subtract from main trial response times
-RTMean = RTAll["ResponseTime"].mean()
-PreResponseTime = AllData["ResponseTime"]
-
-# There might be a more eligant way than a function but it works
-def SubRT(x):
-    return x - RTMean
-PostResponseTime = PreResponseTime.apply(SubRT)
-
-AllData["ResponseTime"] = PostResponseTime
-
-# Calculating propagated error (STILL TO DO)
+# Subtracted from the whole column at once, the RT SEM goes in BaselineSEM
+AllData = BaselineCorrection.correct(AllData, RTBaselines)
 
 
 
@@ -92,33 +60,35 @@ AllData["ResponseTime"] = PostResponseTime
 
 # Get descriptives for each contrast level
 AllCorrect = (AllData[AllData['Direction'] == "right"])
-Descriptives = AllCorrect.groupby(["VisibleHemifield"])["ResponseTime"].describe()
-
-# Change all response times above 3sd into nan
-# Right
-AllData.loc[(AllData["VisibleHemifield"] == "Right") & (AllData["ResponseTime"] > (Descriptives["mean"].iloc[0] + (Descriptives["std"].iloc[0] *3)))] = np.nan
+Descriptives = AllCorrect.groupby(["VisibleHemifield"], observed=True)["ResponseTime"].describe()
 
-# Left
-AllData.loc[(AllData["VisibleHemifield"] == "Left") & (AllData["ResponseTime"] > (Descriptives["mean"].iloc[0] + (Descriptives["std"].iloc[0] *3)))] = np.nan
+# Change response times more than 3sd above the mean of their hemifield into
+# nan (mean/sd of the participant's "right" presses in that hemifield, see
+# FileProcessing/OutlierRejection.py). The rest of the row is kept, Outlier and
+# OutlierReason say which trials went and why
+AllData = OutlierRejection.reject(AllData, ["ParticipantID", "VisibleHemifield"], "sd", 3,
+                                  Reference=AllData["Direction"] == "right")
 
 # For sanity checking 
 print("\n")
 print("Outliers Removed")
 print("----------------")
-print("Right=")
-print(AllData.loc[(AllData["VisibleHemifield"] == "Right") & (AllData["ResponseTime"] > (Descriptives["mean"].iloc[0] + (Descriptives["std"].iloc[0] *3)))])
-print("\n")
-print("Left=")
-print(AllData.loc[(AllData["VisibleHemifield"] == "Left") & (AllData["ResponseTime"] > (Descriptives["mean"].iloc[0] + (Descriptives["std"].iloc[0] *3)))])
+print(OutlierRejection.summary(AllData, "VisibleHemifield"))
+print(AllData[AllData["Outlier"]])
 print("\n")
 
-# %% Stats
+# Propagated error once the outliers are out (SEM for each hemifield and RT
+# SEM in quadrature, PropagatedSEM)
+Errors = BaselineCorrection.propagatedError(AllData[AllData["Direction"] == "right"], "VisibleHemifield",
+                                            RTBaselines)
+print(Errors)
 
-# T-test comparing response times between hemifields
-RightResp = AllData[AllData['VisibleHemifield'] == "Right"]["ResponseTime"]
-LeftResp = AllData[AllData['VisibleHemifield'] == "Left"]["ResponseTime"]
+# %% Stats
 
-ttest_ind(RightResp, LeftResp)
+# T-test comparing response times between hemifields (see
+# FileProcessing/HypothesisTests.py)
+Tests = HypothesisTests.compare(AllData, "VisibleHemifield")
+print(Tests)
 
 # %% Visualisation
 sns.set_theme() # Resets from other projects previously ran
@@ -141,7 +111,7 @@ sns.catplot(data=AllData[AllData.Direction == "right"], kind="box",
 # Wave speed over time-
 # Line Graph
 for Cond in Conditions:
-    Plot = sns.lmplot(data=AllData[AllData.VisibleHemifield == Cond], x="index", 
+    Plot = sns.lmplot(data=AllData[AllData.VisibleHemifield == Cond], x="TrialNumber", 
                       y="ResponseTime",x_estimator=np.mean, height=8.27, aspect=15/8.27)
     #Plot = sns.catplot(data=AllData[AllData.Contrast_Level == Cond], x="Trial_Number",
     #                   y="Response_Time", kind="point", height=8.27, aspect=15/8.27)
@@ -152,8 +122,7 @@ for Cond in Conditions:
     Plot.tick_params(axis='both', which='major', labelsize=14)
     
 
-AllData = AllData.reset_index()
-Plot = sns.catplot(data=AllData, x="index", y="ResponseTime", kind="violin", 
+Plot = sns.catplot(data=AllData, x="TrialNumber", y="ResponseTime", kind="violin", 
                    height=8.27, aspect=15/8.27, col="VisibleHemifield")
 Plot.set_axis_labels("Trial Number", "Response Time (s)")
 